@@ -0,0 +1,343 @@
+"""
+Benchmark suite timing each stage of the config pipeline on synthetic configs.
+
+Usage:
+    python -m benchmarks.bench --save baseline.json
+    python -m benchmarks.bench --compare baseline.json --tolerance 0.2
+    python -m benchmarks.bench --sizes 10 1000 --depths 1 100 --stages parse_dict
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from pydantic import ConfigDict
+
+import cfg_tools
+from benchmarks.configs import (
+    leaf_paths,
+    make_config,
+    make_list_config,
+    nesting_depth,
+    templated_values,
+    yaml_text,
+)
+from cfg_tools import (
+    ParsedModel,
+    load_config_files,
+    merge_dicts,
+    parse_dict,
+    parse_list,
+    parse_str,
+)
+from cfg_tools.graph import copy_tree
+from cfg_tools.plugins import interpolate_plugin
+
+DEFAULT_SIZES = [10, 1_000, 100_000, 1_000_000]
+DEFAULT_DEPTHS = [1, 10, 100, 1000, 100_000]
+DEFAULT_TEMPLATED = [0.0, 0.1, 0.5]
+# libyaml's composer recurses in C and crashes the interpreter on deeper files
+YAML_MAX_DEPTH = 10_000
+
+
+class BenchModel(ParsedModel):
+    model_config = ConfigDict(extra="allow")
+
+
+@dataclass
+class Case:
+    leaves: int
+    depth: int
+    templated: float
+
+
+@dataclass
+class Result:
+    stage: str
+    leaves: int
+    depth: int
+    templated: float
+    best: float | None
+    median: float | None
+    error: str | None = None
+
+    @property
+    def setup_failed(self) -> bool:
+        return self.error is not None and self.error.startswith("setup failed")
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}/{self.leaves}/{self.depth}/{self.templated}"
+
+
+# A stage prepares its inputs from the generated config (untimed) and returns
+# the function to time.
+Stage = Callable[[dict[str, Any], Path], Callable[[], Any]]
+
+
+def stage_parse_str(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    queries = templated_values(config)
+
+    def run():
+        for query in queries:
+            parse_str(query, config)
+
+    return run
+
+
+def stage_parse_dict(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    return lambda: parse_dict(config, config)
+
+
+def stage_parse_list(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    # the same shape as the config, with nested lists instead of dicts
+    paths = leaf_paths(config)
+    depth = max(path.count(".") for path in paths) + 1 if paths else 1
+    templated = len(templated_values(config)) / len(paths) if paths else 0.0
+    data = make_list_config(len(paths), depth, templated)
+    return lambda: parse_list(data, data)
+
+
+def stage_interpolate(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    paths = leaf_paths(config)
+
+    def run():
+        for path in paths:
+            interpolate_plugin(path, config)
+
+    return run
+
+
+def stage_merge_dicts(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    paths = leaf_paths(config)
+    depth = max(path.count(".") for path in paths) + 1 if paths else 1
+    other = make_config(len(paths), depth=depth, seed=1)
+    # merging the same dict again does the same traversal, so a single copy
+    # can be reused across runs. copy_tree copies configs of any depth.
+    target = copy_tree(config)
+    return lambda: merge_dicts(target, other)
+
+
+def stage_load_config_files(config: dict[str, Any], tmp: Path) -> Callable[[], Any]:
+    paths = leaf_paths(config)
+    depth = nesting_depth(config)
+    (tmp / "base.yaml").write_text(yaml_text(config))
+    override = make_config(max(len(paths) // 10, 1), seed=1)
+    (tmp / "override.yaml").write_text(yaml_text(override))
+
+    def run():
+        if depth > YAML_MAX_DEPTH:
+            raise ValueError(f"yaml files nested deeper than {YAML_MAX_DEPTH}")
+        load_config_files(tmp, ["base.yaml", "override.yaml"], use_cli=False)
+
+    return run
+
+
+def stage_model_validate(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    return lambda: BenchModel.model_validate(config)
+
+
+def stage_import(config: dict[str, Any], _: Path) -> Callable[[], Any]:
+    # a fresh interpreter each time, the timing includes its startup
+    command = [sys.executable, "-c", "import cfg_tools"]
+    return lambda: subprocess.run(command, check=True)
+
+
+STAGES: dict[str, Stage] = {
+    "parse_str": stage_parse_str,
+    "parse_dict": stage_parse_dict,
+    "parse_list": stage_parse_list,
+    "interpolate_plugin": stage_interpolate,
+    "merge_dicts": stage_merge_dicts,
+    "load_config_files": stage_load_config_files,
+    "model_validate": stage_model_validate,
+    "import": stage_import,
+}
+# stages that do not depend on the config, timed once instead of for each case
+CASELESS_STAGES = {"import"}
+
+
+def cases(
+    sizes: Iterable[int], depths: Iterable[int], templated: Iterable[float]
+) -> list[Case]:
+    """
+    Sizes are crossed with templated ratios at the smallest depth, and depths
+    are crossed with the templated ratios at the smallest size above 1000 to
+    keep the matrix tractable.
+    """
+    sizes, depths, templated = sorted(sizes), sorted(depths), sorted(templated)
+    depth_size = next((size for size in sizes if size >= 1000), sizes[-1])
+    all_cases: list[Case] = []
+    for ratio in templated:
+        all_cases.extend(Case(size, depths[0], ratio) for size in sizes)
+        all_cases.extend(Case(depth_size, depth, ratio) for depth in depths[1:])
+    return all_cases
+
+
+def time_stage(run: Callable[[], Any], repeat: int) -> list[float]:
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_stage(
+    stage: str, case: Case, config: dict[str, Any], tmp: Path, repeat: int
+) -> Result:
+    """
+    Time `stage` on `config`. Errors of the preparation of the inputs are
+    reported as setup errors, not as failures of the stage.
+    """
+    try:
+        run = STAGES[stage](config, tmp)
+    except Exception as e:
+        error = f"setup failed: {type(e).__name__}: {e}"[:200]
+        return Result(stage, case.leaves, case.depth, case.templated, None, None, error)
+    try:
+        timings = time_stage(run, repeat)
+    except (RecursionError, KeyError, ValueError) as e:
+        error = f"{type(e).__name__}: {e}"[:200]
+        return Result(stage, case.leaves, case.depth, case.templated, None, None, error)
+    return Result(
+        stage,
+        case.leaves,
+        case.depth,
+        case.templated,
+        min(timings),
+        statistics.median(timings),
+    )
+
+
+def run_benchmarks(
+    all_cases: list[Case], stages: list[str], repeat: int, verbose: bool = True
+) -> list[Result]:
+    results: list[Result] = []
+    for stage in stages:
+        if stage in CASELESS_STAGES:
+            timings = time_stage(STAGES[stage]({}, Path()), repeat)
+            result = Result(stage, 0, 0, 0.0, min(timings), statistics.median(timings))
+            results.append(result)
+            if verbose:
+                print(format_result(result), file=sys.stderr)
+    for case in all_cases:
+        stages_of_case = [stage for stage in stages if stage not in CASELESS_STAGES]
+        if not stages_of_case:
+            break
+        config = make_config(case.leaves, case.depth, case.templated)
+        for stage in stages_of_case:
+            with tempfile.TemporaryDirectory() as tmp:
+                result = run_stage(stage, case, config, Path(tmp), repeat)
+            results.append(result)
+            if verbose:
+                print(format_result(result), file=sys.stderr)
+    return results
+
+
+def format_result(result: Result) -> str:
+    timing = f"{result.best:.6f}s" if result.best is not None else result.error
+    return f"{result.key:<48} {timing}"
+
+
+def save_results(results: list[Result], path: Path):
+    payload = {
+        "meta": {
+            "cfg_tools": cfg_tools.__version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "results": [asdict(result) for result in results],
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_results(path: Path) -> list[Result]:
+    with open(path) as f:
+        return [Result(**result) for result in json.load(f)["results"]]
+
+
+def compare_results(
+    baseline: list[Result], current: list[Result], tolerance: float
+) -> list[str]:
+    """
+    Compare the current results with a baseline. Returns the keys of the
+    cases that are more than `tolerance` slower than the baseline or that
+    started failing.
+    """
+    reference = {result.key: result for result in baseline}
+    regressions: list[str] = []
+    for result in current:
+        base = reference.get(result.key)
+        if base is None:
+            continue
+        if result.setup_failed:
+            # the stage could not be measured, whatever the baseline
+            print(f"{result.key:<48} SETUP FAIL")
+            regressions.append(result.key)
+            continue
+        if base.best is None or result.best is None:
+            status = "ok" if result.best is not None or base.best is None else "FAIL"
+            print(f"{result.key:<48} {status}")
+            if status == "FAIL":
+                regressions.append(result.key)
+            continue
+        ratio = result.best / base.best if base.best else float("inf")
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(
+            f"{result.key:<48} {base.best:.6f}s -> {result.best:.6f}s "
+            f"(x{ratio:.2f}) {status}"
+        )
+        if status == "REGRESSION":
+            regressions.append(result.key)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--depths", type=int, nargs="+", default=DEFAULT_DEPTHS)
+    parser.add_argument("--templated", type=float, nargs="+", default=DEFAULT_TEMPLATED)
+    parser.add_argument(
+        "--stages", nargs="+", choices=list(STAGES), default=list(STAGES)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="save results as json")
+    parser.add_argument("--compare", type=Path, help="baseline json to compare to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed slowdown relative to the baseline before failing",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        cases(args.sizes, args.depths, args.templated), args.stages, args.repeat
+    )
+    if args.save is not None:
+        save_results(results, args.save)
+    if args.compare is not None:
+        regressions = compare_results(
+            load_results(args.compare), results, args.tolerance
+        )
+        if regressions:
+            print(f"{len(regressions)} regression(s) found", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import json
+import random
+from collections.abc import Iterable
+from typing import Any
+
+
+def make_config(
+    leaves: int,
+    depth: int = 1,
+    templated: float = 0.0,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Generate a synthetic config with `leaves` values spread over a spine of
+    `depth` nested dicts. A `templated` fraction of the values are templates
+    referencing other (plain) values of the config.
+    Example:
+        make_config(4, depth=2, templated=0.5)
+        # {"k0": 0, "k2": "#{k0}/v2", "n1": {"k1": 1, "k3": "#{k0}/v3"}}
+    """
+    rng = random.Random(seed)
+    depth = max(depth, 1)
+    levels: list[dict[str, Any]] = [{}]
+    for level in range(1, depth):
+        node: dict[str, Any] = {}
+        levels[-1][f"n{level}"] = node
+        levels.append(node)
+
+    plain_paths: list[str] = []
+    # only the levels holding leaves need their dotted prefix
+    prefixes = [""]
+    for level in range(1, min(depth, leaves)):
+        prefixes.append(f"{prefixes[-1]}.n{level}" if level > 1 else "n1")
+    for i in range(leaves):
+        level = i % depth
+        key = f"k{i}"
+        if plain_paths and rng.random() < templated:
+            target = plain_paths[rng.randrange(len(plain_paths))]
+            levels[level][key] = f"#{{{target}}}/v{i}"
+        else:
+            levels[level][key] = i
+            prefix = prefixes[level]
+            plain_paths.append(f"{prefix}.{key}" if prefix else key)
+    return levels[0]
+
+
+def make_list_config(
+    leaves: int,
+    depth: int = 1,
+    templated: float = 0.0,
+    seed: int = 0,
+) -> list[Any]:
+    """
+    Same as `make_config`, with nested lists instead of dicts: the first item of
+    each list is the next list of the spine, so values are reached through
+    list indices only.
+    Example:
+        make_list_config(4, depth=2, templated=0.5)
+        # [[1, "#{0.0}/v3"], 0, 2]
+    """
+    rng = random.Random(seed)
+    depth = max(depth, 1)
+    levels: list[list[Any]] = [[]]
+    for _ in range(1, depth):
+        node: list[Any] = []
+        levels[-1].append(node)
+        levels.append(node)
+
+    plain_paths: list[str] = []
+    prefixes = [""]
+    for level in range(1, min(depth, leaves)):
+        prefixes.append(f"{prefixes[-1]}.0" if level > 1 else "0")
+    for i in range(leaves):
+        level = i % depth
+        key = str(len(levels[level]))
+        if plain_paths and rng.random() < templated:
+            target = plain_paths[rng.randrange(len(plain_paths))]
+            levels[level].append(f"#{{{target}}}/v{i}")
+        else:
+            levels[level].append(i)
+            prefix = prefixes[level]
+            plain_paths.append(f"{prefix}.{key}" if prefix else key)
+    return levels[0]
+
+
+def _yaml_scalar(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int | float):
+        return repr(value)
+    # json strings are valid double-quoted yaml scalars
+    return json.dumps(str(value))
+
+
+def yaml_text(config: Any, block_depth: int = 64) -> str:
+    """
+    Yaml text of `config`, built without recursion (unlike `yaml.safe_dump`).
+    Dicts of the first `block_depth` levels use the block style, deeper values
+    and lists the flow style, so that the indentation of very deep configs does
+    not grow quadratically.
+    """
+    lines: list[str] = []
+    # (indentation level, key, value) of the entries left to write in block style
+    stack: list[tuple[int, Any, Any]] = [
+        (0, key, val) for key, val in reversed(list(config.items()))
+    ]
+    while stack:
+        level, key, val = stack.pop()
+        indent = "  " * level
+        if isinstance(val, dict) and val and level + 1 < block_depth:
+            lines.append(f"{indent}{_yaml_scalar(key)}:")
+            stack.extend(
+                (level + 1, child_key, child)
+                for child_key, child in reversed(list(val.items()))
+            )
+        else:
+            lines.append(f"{indent}{_yaml_scalar(key)}: {_flow_text(val)}")
+    return "\n".join(lines) + "\n"
+
+
+class _Text(str):
+    """
+    Text written as is by `_flow_text`, unlike the string values.
+    """
+
+
+def _flow_text(value: Any) -> str:
+    parts: list[str] = []
+    stack: list[Any] = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _Text):
+            parts.append(node)
+            continue
+        if isinstance(node, dict):
+            items: list[Any] = [_Text("{")]
+            for idx, (key, val) in enumerate(node.items()):
+                sep = ", " if idx else ""
+                items.extend([_Text(f"{sep}{_yaml_scalar(key)}: "), val])
+            items.append(_Text("}"))
+        elif isinstance(node, list):
+            items = [_Text("[")]
+            for idx, val in enumerate(node):
+                items.extend([_Text(", ")] if idx else [])
+                items.append(val)
+            items.append(_Text("]"))
+        else:
+            parts.append(_yaml_scalar(node))
+            continue
+        stack.extend(reversed(items))
+    return "".join(parts)
+
+
+def leaf_paths(config: Any, prefix: str = "") -> list[str]:
+    paths: list[str] = []
+    # (parent index, key) of the visited nodes, so that the dotted paths are
+    # only built for the leaves, even on very deep configs
+    nodes: list[tuple[int, str]] = [(-1, prefix)]
+    stack: list[tuple[int, Any]] = [(0, config)]
+    while stack:
+        node_idx, node = stack.pop()
+        items: Iterable[tuple[Any, Any]]
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            parts: list[str] = []
+            while node_idx > 0:
+                node_idx, part = nodes[node_idx]
+                parts.append(part)
+            if prefix:
+                parts.append(prefix)
+            paths.append(".".join(reversed(parts)))
+            continue
+        for key, val in items:
+            nodes.append((node_idx, str(key)))
+            stack.append((len(nodes) - 1, val))
+    return paths
+
+
+def templated_values(config: Any) -> list[str]:
+    values: list[str] = []
+    stack = [config]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, str) and "#{" in node:
+            values.append(node)
+    return values
+
+
+def nesting_depth(config: Any) -> int:
+    """
+    Number of nested dicts and lists on the longest path of `config`.
+    """
+    deepest = 0
+    stack: list[tuple[int, Any]] = [(0, config)]
+    while stack:
+        depth, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((depth + 1, val) for val in node.values())
+        elif isinstance(node, list):
+            stack.extend((depth + 1, val) for val in node)
+        else:
+            deepest = max(deepest, depth)
+            continue
+        deepest = max(deepest, depth + 1)
+    return deepest
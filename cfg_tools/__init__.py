@@ -1,20 +1,147 @@
-import importlib.metadata
+from typing import TYPE_CHECKING
 
 from cfg_tools import plugins
 
-from .data_parser import ParsedModel, parse_dict, parse_list, parse_str, register_plugin
-from .utils import load_config_files, merge_dicts, parse_args
+from .cache import LRUCache, ParseCache, PluginCache, PureCache, TTLCache
+from .data_parser import (
+    ParsedModel,
+    Resolver,
+    current_resolver,
+    invalidate_plugin_cache,
+    parse_dict,
+    parse_dict_async,
+    parse_lazy,
+    parse_list,
+    parse_list_async,
+    parse_str,
+    parse_str_async,
+    register_plugin,
+    render_batch,
+    render_each,
+    set_plugin_cache,
+    validate_interpolated,
+)
+from .graph import InterpolationCycleError
+from .instrumentation import (
+    Event,
+    ResolutionStats,
+    add_hook,
+    collect_stats,
+    remove_hook,
+)
+from .lazy import LazyConfig, LazyList
+from .template import Template, compile_template
+from .utils import load_config_files, merge_dicts, merge_layers, parse_args
+
+if TYPE_CHECKING:
+    from .fingerprint import ConfigFingerprint, fingerprint_config
+    from .frozen import FrozenConfig, FrozenList, freeze, thaw
+    from .layers import LayeredConfig, load_config_layers
+    from .reload import ConfigDiff, ConfigReloader
+    from .shared import SharedConfig, SharedList, SharedMapping
+    from .snapshot import load_config_snapshot
+    from .sweep import Sweep, grid, sweep
+
+# modules of the optional features, only imported when one of their names is used
+_lazy_names = {
+    "ConfigFingerprint": "fingerprint",
+    "fingerprint_config": "fingerprint",
+    "FrozenConfig": "frozen",
+    "FrozenList": "frozen",
+    "freeze": "frozen",
+    "thaw": "frozen",
+    "LayeredConfig": "layers",
+    "load_config_layers": "layers",
+    "ConfigDiff": "reload",
+    "ConfigReloader": "reload",
+    "SharedConfig": "shared",
+    "SharedList": "shared",
+    "SharedMapping": "shared",
+    "load_config_snapshot": "snapshot",
+    "Sweep": "sweep",
+    "grid": "sweep",
+    "sweep": "sweep",
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_names:
+        import importlib
+
+        module_name = _lazy_names[name]
+        module = importlib.import_module(f".{module_name}", __name__)
+        # importing the module set it as an attribute of the package, which
+        # the function `sweep` must replace
+        for other, other_module in _lazy_names.items():
+            if other_module == module_name:
+                globals()[other] = getattr(module, other)
+        return globals()[name]
+    # importlib.metadata is slow to import, the version is only read on demand
+    if name == "__version__":
+        import importlib.metadata
+
+        version = importlib.metadata.version("cfg-tools")
+        globals()["__version__"] = version
+        return version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__version__ = importlib.metadata.version("cfg-tools")
 
 __all__ = [
     "parse_str",
     "parse_list",
     "parse_dict",
+    "parse_lazy",
+    "parse_str_async",
+    "parse_list_async",
+    "parse_dict_async",
+    "render_batch",
+    "render_each",
+    "LazyConfig",
+    "LazyList",
+    "compile_template",
+    "Template",
+    "InterpolationCycleError",
     "ParsedModel",
     "plugins",
     "register_plugin",
+    "set_plugin_cache",
+    "invalidate_plugin_cache",
+    "Resolver",
+    "current_resolver",
+    "PluginCache",
+    "PureCache",
+    "ParseCache",
+    "TTLCache",
+    "LRUCache",
     "parse_args",
     "merge_dicts",
     "load_config_files",
+    "merge_layers",
+    "LayeredConfig",
+    "load_config_layers",
+    "load_config_snapshot",
+    "ConfigFingerprint",
+    "fingerprint_config",
+    "FrozenConfig",
+    "FrozenList",
+    "freeze",
+    "thaw",
+    "SharedConfig",
+    "SharedMapping",
+    "SharedList",
+    "validate_interpolated",
+    "ConfigReloader",
+    "ConfigDiff",
+    "Sweep",
+    "sweep",
+    "grid",
+    "collect_stats",
+    "ResolutionStats",
+    "Event",
+    "add_hook",
+    "remove_hook",
 ]
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
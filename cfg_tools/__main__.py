@@ -0,0 +1,78 @@
+import argparse
+import importlib
+from pathlib import Path
+
+from cfg_tools.data_parser import parse_dict, validate_interpolated
+from cfg_tools.instrumentation import collect_stats
+from cfg_tools.utils import load_config_files
+
+
+def _import_model(path: str) -> type:
+    module, _, name = path.partition(":")
+    if not name:
+        raise ValueError(f'{path} should be of the form "module:Model"')
+    return getattr(importlib.import_module(module), name)
+
+
+def profile(
+    path: Path,
+    files: list[str],
+    repeat: int = 1,
+    top: int = 10,
+    model: str | None = None,
+    cache_dir: Path | None = None,
+    max_workers: int | None = None,
+):
+    """
+    Load, merge and resolve the config `repeat` times and print where the time
+    went.
+    """
+    model_cls = None if model is None else _import_model(model)
+    with collect_stats() as stats:
+        for _ in range(repeat):
+            config, _ = load_config_files(
+                path,
+                files,
+                use_cli=False,
+                cache_dir=cache_dir,
+                max_workers=max_workers,
+            )
+            resolved = parse_dict(config, config, copy=False)
+            if model_cls is not None:
+                validate_interpolated(model_cls, resolved)
+    stats.print_report(top)
+    return stats
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m cfg_tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    profile_parser = commands.add_parser(
+        "profile", help="Profile the loading and resolution of config files."
+    )
+    profile_parser.add_argument("path", type=Path, help="Folder of the config files.")
+    profile_parser.add_argument("files", nargs="+", help="Files to load, in order.")
+    profile_parser.add_argument("--repeat", type=int, default=1)
+    profile_parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest keys to show."
+    )
+    profile_parser.add_argument(
+        "--model", help='Also validate with a pydantic model, as "module:Model".'
+    )
+    profile_parser.add_argument("--cache-dir", type=Path)
+    profile_parser.add_argument("--max-workers", type=int)
+    args = parser.parse_args(argv)
+    if args.command == "profile":
+        profile(
+            args.path,
+            args.files,
+            args.repeat,
+            args.top,
+            args.model,
+            args.cache_dir,
+            args.max_workers,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+_missing: Any = object()
+
+
+class PluginCache:
+    """
+    Caching policy of a plugin, given to `register_plugin`. Values are cached by
+    key only, so only cache plugins whose result does not depend on `data`.
+    Cached values are shared by all the parse calls, and failed calls are never
+    cached.
+    """
+
+    # False if the values are only kept for one parse call
+    shared = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:
+        """
+        Returns the cached value of `key`, or `_missing`.
+        """
+        with self._lock:
+            return self._values.get(key, _missing)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def empty(self) -> "PluginCache":
+        """
+        New empty cache with the same policy.
+        """
+        return type(self)()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class PureCache(PluginCache):
+    """
+    Memoize the values forever (until invalidated).
+    """
+
+
+class ParseCache(PluginCache):
+    """
+    Memoize the values during a single parse call, for one `data` object. Every
+    parse call sees the current values, but a key used several times in a config
+    is only computed once.
+    """
+
+    shared = False
+
+
+class TTLCache(PluginCache):
+    """
+    Memoize the values for `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.ttl = ttl
+        self.clock = clock
+        self._expires: dict[str, float] = {}
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._values:
+                return _missing
+            if self._expires[key] <= self.clock():
+                del self._values[key]
+                del self._expires[key]
+                return _missing
+            return self._values[key]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._values[key] = value
+            self._expires[key] = self.clock() + self.ttl
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._expires.clear()
+
+    def empty(self) -> "TTLCache":
+        return TTLCache(self.ttl, self.clock)
+
+    def __repr__(self) -> str:
+        return f"TTLCache(ttl={self.ttl})"
+
+
+class LRUCache(PluginCache):
+    """
+    Memoize the `maxsize` most recently used values.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        super().__init__()
+        self.maxsize = maxsize
+        self._values: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._values:
+                return _missing
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def empty(self) -> "LRUCache":
+        return LRUCache(self.maxsize)
+
+    def __repr__(self) -> str:
+        return f"LRUCache(maxsize={self.maxsize})"
@@ -1,250 +1,907 @@
-from collections.abc import Callable, Mapping, Sequence
-from dataclasses import dataclass
-from typing import Any
+import inspect
+import threading
+import time
+from collections.abc import (
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Any, TypeVar
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, ValidatorFunctionWrapHandler, model_validator
 
+from cfg_tools.cache import ParseCache, PluginCache, _missing
+from cfg_tools.graph import DependencyGraph, Execute, copy_tree, is_template
+from cfg_tools.instrumentation import _hooks, record_cache, record_plugin, stage
+from cfg_tools.lazy import LazyConfig, LazyList, LazyResolver
 from cfg_tools.plugins import env_plugin, interpolate_plugin
+from cfg_tools.schema import (
+    interpolation_plan,
+    templated_paths,
+    with_referenced_paths,
+)
+from cfg_tools.template import Template, compile_template
 
-__plugins: dict[str, Callable[[str, Any], Any]] = {
-    "interpolate": interpolate_plugin,
-    "env": env_plugin,
-}
+if TYPE_CHECKING:
+    import asyncio
 
+BatchCallback = Callable[
+    [list[str], Any],
+    Sequence[Any] | Mapping[str, Any] | Awaitable[Sequence[Any] | Mapping[str, Any]],
+]
 
-def execute_parser_plugin(plugin: str, key: str, data: Any):
-    callback = __plugins[plugin]
-    return callback(key, data)
+T = TypeVar("T")
+Model = TypeVar("Model", bound=BaseModel)
 
+# lists of strings at least this long are parsed with `render_batch`
+BATCH_RENDER_THRESHOLD = 32
+BATCH_RENDER_CHUNK = 1024
+
+
+@dataclass(frozen=True)
+class Plugin:
+    """
+    A registered plugin. `batch`, when given, resolves several keys in one call
+    and returns their values in the same order (or as a mapping key -> value).
+    Both can be coroutine functions. `cache` is the caching policy of the values.
+    """
+
+    func: Callable[[str, Any], Any]
+    batch: BatchCallback | None = None
+    cache: PluginCache | None = None
+    is_async: bool = field(init=False)
+
+    @property
+    def shared_cache(self) -> PluginCache | None:
+        if self.cache is not None and self.cache.shared:
+            return self.cache
+        return None
+
+    def __post_init__(self):
+        is_async = inspect.iscoroutinefunction(self.func) or (
+            inspect.iscoroutinefunction(self.batch)
+        )
+        object.__setattr__(self, "is_async", is_async)
+
+
+def _builtin_plugins() -> dict[str, Plugin]:
+    return {
+        # the values of these plugins can change between two calls, so they are
+        # only cached during a parse
+        "interpolate": Plugin(interpolate_plugin, cache=ParseCache()),
+        "env": Plugin(env_plugin, cache=ParseCache()),
+    }
 
-def register_plugin(name):
-    def decorator(func):
-        if name not in __plugins:
-            __plugins[name] = func
-        else:
-            raise ValueError(f"plugin {name} already registered")
-        return func
 
-    return decorator
+def _run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine from synchronous code, in another thread when an event loop
+    is already running in this one.
+    """
+    # asyncio is only imported by the parse calls using async plugins
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
 
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
-_default_plugin = "interpolate"
+
+async def _awaited(value: Awaitable[T]) -> T:
+    return await value
+
+
+def _batch_values(
+    plugin: str, keys: list[str], values: Sequence[Any] | Mapping[str, Any]
+) -> list[Any]:
+    if isinstance(values, Mapping):
+        return [values[key] for key in keys]
+    if len(values) != len(keys):
+        raise ValueError(
+            f"batch plugin {plugin} returned {len(values)} values for {len(keys)} keys"
+        )
+    return list(values)
+
+
+def _batch_key(keys: list[str]) -> str:
+    # key of the measurements of batch calls
+    return f"[batch of {len(keys)}]"
 
 
 @dataclass
-class ParsingContext:
-    in_interpolation: bool = False
-    is_escaped: bool = False
-    interpolation_prefix: bool = False
-    interpolation_key: str = ""
-    interpolation_plugin: str = _default_plugin
+class _TreeParse:
+    """
+    Templates of a tree to parse, collected before any plugin is called so
+    that the batch and async plugins can be prefetched.
+    """
 
+    graph: DependencyGraph
+    parsed: Any = None
+    rendered: list[tuple[Any, Any, Template]] = field(default_factory=list)
 
-def parse_str(
-    query: str,
-    data: Any,
-    context: ParsingContext | None = None,
-) -> Any:
-    if not len(query):
-        return ""
-
-    if context is None:
-        context = ParsingContext()
-
-    letter, rest = query[0], query[1:]
-    match letter:
-        case "\\" if not context.is_escaped:
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    context.in_interpolation,
-                    is_escaped=True,
-                    interpolation_key=context.interpolation_key,
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
-            )
-        case "\\" if context.is_escaped:
-            return letter + parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=context.in_interpolation,
-                    is_escaped=False,
-                    interpolation_key=context.interpolation_key,
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
-            )
+    @classmethod
+    def collect(
+        cls, queries: Any, data: Any, copy: bool, execute: Execute
+    ) -> "_TreeParse":
+        if queries is data:
+            return cls(DependencyGraph(queries, execute, copy=copy))
+
+        tree = cls(DependencyGraph(data, execute, copy=False))
+
+        def collect(container: Any, key: Any, _):
+            tree.rendered.append((container, key, compile_template(container[key])))
+
+        tree.parsed = copy_tree(queries, collect, share=not copy)
+        return tree
+
+    def templates(self) -> Iterable[Template]:
+        return chain(
+            (template for _, _, template in self.graph.templates.values()),
+            (template for _, _, template in self.rendered),
+        )
+
+    def render(self, execute: Execute) -> Any:
+        self.graph.execute = execute
+        if self.parsed is None:
+            return self.graph.resolve_all()
+        for container, key, template in self.rendered:
+            container[key] = self.graph.render(template)
+        return self.parsed
+
+
+def _as_list(queries: Sequence[Any], data: Any) -> tuple[list[Any], Any]:
+    if isinstance(queries, list):
+        return queries, data
+    converted = list(queries)
+    return converted, converted if queries is data else data
+
+
+def _as_dict(queries: Mapping[str, Any], data: Any) -> tuple[dict[str, Any], Any]:
+    if isinstance(queries, dict):
+        return queries, data
+    converted = dict(queries)
+    return converted, converted if queries is data else data
+
+
+class Resolver:
+    """
+    Resolves templates with its own plugins, caches and default plugin. A
+    resolver can be used from many threads at once: the plugin table is never
+    modified in place (registering a plugin swaps in a new table) and the
+    caches are locked. The free functions (`parse_dict`, `register_plugin`...)
+    use the current resolver: the default one, or the one of `use()`.
+    Example:
+        resolver = Resolver()
+        resolver.register_plugin("secret")(tenant_secret)
+        with ThreadPoolExecutor(32) as pool:
+            configs = list(pool.map(lambda raw: resolver.parse_dict(raw, raw), raws))
+    """
+
+    def __init__(
+        self,
+        plugins: Mapping[str, Plugin] | None = None,
+        default_plugin: str = "interpolate",
+    ):
+        self._lock = threading.Lock()
+        self._plugins = _builtin_plugins() if plugins is None else dict(plugins)
+        self.default_plugin = default_plugin
+
+    def copy(self) -> "Resolver":
+        """
+        New resolver with the same plugins and settings, and empty caches of its
+        own.
+        """
+        plugins = {
+            name: replace(plugin, cache=plugin.cache and plugin.cache.empty())
+            for name, plugin in self._plugins.items()
+        }
+        return Resolver(plugins, self.default_plugin)
 
-        case "#" if not context.in_interpolation and not context.is_escaped:
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    interpolation_prefix=True,
-                    in_interpolation=False,
-                    is_escaped=False,
-                    interpolation_key=context.interpolation_key,
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
+    @contextmanager
+    def use(self) -> Iterator["Resolver"]:
+        """
+        Make this resolver the current one in this context (thread or task): the
+        free functions and `ParsedModel` validation then use it. Worker threads
+        (e.g. of a `ThreadPoolExecutor`) do not inherit it, so they must call
+        `resolver.parse_*` or `resolver.use()` themselves.
+        """
+        token = _current_resolver.set(self)
+        try:
+            yield self
+        finally:
+            _current_resolver.reset(token)
+
+    def register_plugin(
+        self, name, batch: BatchCallback | None = None, cache: PluginCache | None = None
+    ):
+        """
+        Same as the `register_plugin` function, for this resolver only.
+        """
+
+        def decorator(func):
+            with self._lock:
+                if name in self._plugins:
+                    raise ValueError(f"plugin {name} already registered")
+                self._plugins = {**self._plugins, name: Plugin(func, batch, cache)}
+            return func
+
+        return decorator
+
+    def registered_plugins(self) -> dict[str, Plugin]:
+        return dict(self._plugins)
+
+    def set_plugin_cache(self, name: str, cache: PluginCache | None):
+        """
+        Change the caching policy of a registered plugin (including the built-in
+        `interpolate` and `env` plugins).
+        """
+        with self._lock:
+            if name not in self._plugins:
+                raise KeyError(f"plugin {name} is not registered")
+            plugin = replace(self._plugins[name], cache=cache)
+            self._plugins = {**self._plugins, name: plugin}
+
+    def invalidate_plugin_cache(self, name: str | None = None):
+        """
+        Clear the cached values of the plugin `name`, or of all plugins.
+        """
+        plugins = self._plugins
+        if name is not None and name not in plugins:
+            raise KeyError(f"plugin {name} is not registered")
+        for plugin_name, plugin in plugins.items():
+            if plugin.cache is not None and name in (None, plugin_name):
+                plugin.cache.clear()
+
+    def execute_plugin(self, plugin: str, key: str, data: Any):
+        callbacks = self._plugins[plugin]
+        cache = callbacks.shared_cache
+        if cache is not None:
+            value = cache.get(key)
+            if _hooks:
+                record_cache(plugin, value is not _missing, key)
+            if value is not _missing:
+                return value
+        start = time.perf_counter() if _hooks else 0.0
+        value = callbacks.func(key, data)
+        if inspect.isawaitable(value):
+            value = _run_sync(_awaited(value))
+        if _hooks:
+            record_plugin(plugin, key, start)
+        if cache is not None:
+            cache.set(key, value)
+        return value
+
+    def _cache_lookup(
+        self, plugin: str, keys: list[str]
+    ) -> tuple[dict[str, Any], list[str]]:
+        """
+        Cached values of `keys`, and the keys that are not cached.
+        """
+        cache = self._plugins[plugin].shared_cache
+        if cache is None:
+            return {}, keys
+        hits: dict[str, Any] = {}
+        for key in keys:
+            value = cache.get(key)
+            if value is not _missing:
+                hits[key] = value
+            if _hooks:
+                record_cache(plugin, value is not _missing, key)
+        return hits, [key for key in keys if key not in hits]
+
+    def _cache_store(
+        self,
+        plugin: str,
+        keys: list[str],
+        hits: dict[str, Any],
+        missing: list[str],
+        values: list[Any],
+    ) -> list[Any]:
+        cache = self._plugins[plugin].shared_cache
+        if cache is not None:
+            for key, value in zip(missing, values, strict=True):
+                cache.set(key, value)
+        if not hits:
+            return values
+        hits.update(zip(missing, values, strict=True))
+        return [hits[key] for key in keys]
+
+    def execute_plugin_batch(
+        self, plugin: str, keys: list[str], data: Any
+    ) -> list[Any]:
+        """
+        Resolve all `keys` with `plugin`, in one call when the plugin has a batch
+        implementation.
+        """
+        callbacks = self._plugins[plugin]
+        if callbacks.is_async:
+            return _run_sync(self._execute_batch_async(plugin, keys, data, None, None))
+        hits, missing = self._cache_lookup(plugin, keys)
+        if not missing:
+            values: Any = []
+        elif callbacks.batch is None:
+            values = [callbacks.func(key, data) for key in missing]
+        else:
+            start = time.perf_counter() if _hooks else 0.0
+            batch_values: Any = callbacks.batch(missing, data)
+            if _hooks:
+                record_plugin(plugin, _batch_key(missing), start)
+            values = _batch_values(plugin, missing, batch_values)
+        return self._cache_store(plugin, keys, hits, missing, values)
+
+    async def _execute_batch_async(
+        self,
+        plugin: str,
+        keys: list[str],
+        data: Any,
+        semaphore: "asyncio.Semaphore | None",
+        timeout: float | None,
+    ) -> list[Any]:
+        import asyncio
+
+        callbacks = self._plugins[plugin]
+
+        async def run(callback: Callable[..., Any], key: Any) -> Any:
+            async with semaphore or nullcontext():
+                start = time.perf_counter() if _hooks else 0.0
+                value = callback(key, data)
+                if inspect.isawaitable(value):
+                    value = await asyncio.wait_for(value, timeout)
+                if _hooks:
+                    record_plugin(
+                        plugin, key if isinstance(key, str) else _batch_key(key), start
+                    )
+                return value
+
+        hits, missing = self._cache_lookup(plugin, keys)
+        if not missing:
+            values: list[Any] = []
+        elif callbacks.batch is not None:
+            values = _batch_values(plugin, missing, await run(callbacks.batch, missing))
+        else:
+            values = list(
+                await asyncio.gather(*(run(callbacks.func, key) for key in missing))
             )
-        case "#" if not context.in_interpolation and context.is_escaped:
-            return letter + parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=context.in_interpolation,
-                    is_escaped=False,
-                    interpolation_key=context.interpolation_key,
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
+        return self._cache_store(plugin, keys, hits, missing, values)
+
+    def _execute_template_call(self, plugin: str | None, key: str, data: Any) -> Any:
+        if plugin is None:
+            plugin = self.default_plugin
+        return self.execute_plugin(plugin, key, data)
+
+    def _collect_calls(self, templates: Iterable[Template]) -> dict[str, list[str]]:
+        """
+        Keys of the calls to batch or async plugins of `templates`, deduplicated.
+        """
+        plugins = self._plugins
+        keys: dict[str, dict[str, None]] = {}
+        for template in templates:
+            for call in template.calls:
+                plugin = self.default_plugin if call.plugin is None else call.plugin
+                callbacks = plugins[plugin]
+                if callbacks.batch is not None or callbacks.is_async:
+                    keys.setdefault(plugin, {})[call.key] = None
+        return {plugin: list(plugin_keys) for plugin, plugin_keys in keys.items()}
+
+    def _prefetched_executor(self, prefetched: dict[tuple[str, str], Any]) -> Execute:
+        """
+        Executes the plugin calls of one parse call, with the `prefetched` values.
+        The values of plugins with a `ParseCache` are memoized for the parse call.
+        """
+        memo: dict[tuple[str, str, int], Any] = {}
+        plugins = self._plugins
+        default_plugin = self.default_plugin
+
+        def execute(plugin: str | None, key: str, data: Any) -> Any:
+            if plugin is None:
+                plugin = default_plugin
+            value = prefetched.get((plugin, key), _missing)
+            if value is not _missing:
+                return value
+            cache = plugins[plugin].cache
+            if cache is None or cache.shared:
+                return self.execute_plugin(plugin, key, data)
+            memo_key = (plugin, key, id(data))
+            value = memo.get(memo_key, _missing)
+            if _hooks:
+                record_cache(plugin, value is not _missing, key)
+            if value is _missing:
+                value = self.execute_plugin(plugin, key, data)
+                memo[memo_key] = value
+            return value
+
+        return execute
+
+    async def _fetch_async(
+        self,
+        calls: dict[str, list[str]],
+        data: Any,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ) -> dict[tuple[str, str], Any]:
+        import asyncio
+
+        semaphore = None if concurrency is None else asyncio.Semaphore(concurrency)
+        results = await asyncio.gather(
+            *(
+                self._execute_batch_async(plugin, keys, data, semaphore, timeout)
+                for plugin, keys in calls.items()
             )
+        )
+        prefetched: dict[tuple[str, str], Any] = {}
+        for (plugin, keys), values in zip(calls.items(), results, strict=True):
+            prefetched.update(zip(((plugin, key) for key in keys), values, strict=True))
+        return prefetched
+
+    async def _prefetch_async(
+        self,
+        templates: Iterable[Template],
+        data: Any,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ) -> Execute:
+        """
+        Resolve the calls to batch and async plugins of all `templates` at once,
+        deduplicated by (plugin, key). Async calls run concurrently, at most
+        `concurrency` at a time, and each call fails after `timeout` seconds.
+        Returns the function executing the plugin calls, that uses the
+        prefetched values.
+        """
+        calls = self._collect_calls(templates)
+        prefetched = await self._fetch_async(calls, data, concurrency, timeout)
+        return self._prefetched_executor(prefetched)
+
+    def _fetch(
+        self, calls: dict[str, list[str]], data: Any
+    ) -> dict[tuple[str, str], Any]:
+        # the event loop is only started if some plugins are async
+        if any(self._plugins[plugin].is_async for plugin in calls):
+            return _run_sync(self._fetch_async(calls, data))
 
-        case "{" if context.interpolation_prefix:
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=True,
-                    is_escaped=False,
-                    interpolation_key="",
-                    interpolation_plugin=_default_plugin,
-                ),
+        prefetched: dict[tuple[str, str], Any] = {}
+        for plugin, keys in calls.items():
+            values = self.execute_plugin_batch(plugin, keys, data)
+            prefetched.update(zip(((plugin, key) for key in keys), values, strict=True))
+        return prefetched
+
+    def _prefetch(self, templates: Iterable[Template], data: Any) -> Execute:
+        """
+        Synchronous version of `_prefetch_async`.
+        """
+        return self._prefetched_executor(
+            self._fetch(self._collect_calls(templates), data)
+        )
+
+    def parse_str(self, query: str, data: Any) -> Any:
+        with stage("render"):
+            template = compile_template(query)
+            return template.render(data, self._prefetch([template], data))
+
+    async def parse_str_async(
+        self,
+        query: str,
+        data: Any,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        """
+        Same as `parse_str`, but all the calls to async plugins run concurrently
+        (at most `concurrency` at a time, each failing after `timeout` seconds).
+        """
+        template = compile_template(query)
+        execute = await self._prefetch_async([template], data, concurrency, timeout)
+        return template.render(data, execute)
+
+    def _parse_tree(self, queries: Any, data: Any, copy: bool) -> Any:
+        with stage("templates"):
+            tree = _TreeParse.collect(queries, data, copy, self._execute_template_call)
+        with stage("render"):
+            return tree.render(self._prefetch(tree.templates(), tree.graph.root))
+
+    async def _parse_tree_async(
+        self,
+        queries: Any,
+        data: Any,
+        copy: bool,
+        concurrency: int | None,
+        timeout: float | None,
+    ) -> Any:
+        with stage("templates"):
+            tree = _TreeParse.collect(queries, data, copy, self._execute_template_call)
+        with stage("render"):
+            execute = await self._prefetch_async(
+                tree.templates(), tree.graph.root, concurrency, timeout
             )
-        case ":" if (
-            context.in_interpolation and context.interpolation_plugin == _default_plugin
+            return tree.render(execute)
+
+    def render_batch(
+        self, queries: Iterable[Any], data: Any, chunk_size: int = BATCH_RENDER_CHUNK
+    ) -> Iterator[Any]:
+        """
+        Lazily render many templated strings against `data`, in order. The
+        templated values of `data` and the plugin values are resolved once for
+        all queries, and the calls to batch and async plugins are prefetched
+        `chunk_size` queries at a time. Other values are yielded as is.
+        Example:
+            paths = render_batch((f"#{{root}}/part-{i}" for i in range(10**6)), config)
+        """
+        graph = DependencyGraph(data, self._execute_template_call, copy=False)
+        prefetched: dict[tuple[str, str], Any] = {}
+        graph.execute = self._prefetched_executor(prefetched)
+        # the templates of the data are prefetched with the first chunk
+        pending = [template for _, _, template in graph.templates.values()]
+        queries = iter(queries)
+        while chunk := list(islice(queries, chunk_size)):
+            with stage("render"):
+                templates = {
+                    idx: compile_template(query)
+                    for idx, query in enumerate(chunk)
+                    if is_template(query)
+                }
+                calls: dict[str, list[str]] = {}
+                for plugin, keys in self._collect_calls(
+                    chain(pending, templates.values())
+                ).items():
+                    new_keys = [key for key in keys if (plugin, key) not in prefetched]
+                    if new_keys:
+                        calls[plugin] = new_keys
+                pending = []
+                prefetched.update(self._fetch(calls, graph.root))
+                rendered = graph.render_many(templates.values())
+                for idx, value in zip(templates, rendered, strict=True):
+                    chunk[idx] = value
+            # yielded outside of the stage, that would otherwise time the caller
+            yield from chunk
+
+    def render_each(self, query: str, contexts: Iterable[Any]) -> Iterator[Any]:
+        """
+        Lazily render `query` against each of `contexts`, like `parse_str`, but
+        the query is only parsed once.
+        Example:
+            contexts = ({"split": "train", "idx": idx} for idx in range(10))
+            names = list(render_each("#{split}-#{idx}", contexts))
+        """
+        template = compile_template(query)
+        calls = self._collect_calls([template])
+        for context in contexts:
+            execute = self._prefetched_executor(self._fetch(calls, context))
+            yield template.render(context, execute)
+
+    def parse_list(
+        self, queries: Sequence[Any], data: Any, copy: bool = True
+    ) -> list[Any]:
+        """
+        Parse all templated strings of `queries`. Without `copy`, the sub-lists
+        and sub-dicts without any template are returned by reference instead of
+        being copied. Long lists of strings are rendered with `render_batch`.
+        """
+        if (
+            queries is not data
+            and len(queries) >= BATCH_RENDER_THRESHOLD
+            and all(isinstance(query, str) for query in queries)
         ):
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=True,
-                    is_escaped=False,
-                    interpolation_plugin=context.interpolation_key,
-                    interpolation_key="",
-                ),
-            )
-        case "}" if context.in_interpolation and not context.is_escaped:
-            interpolated = execute_parser_plugin(
-                context.interpolation_plugin, context.interpolation_key, data
-            )
-            if len(rest):
-                interpolated = str(interpolated) + parse_str(
-                    rest,
-                    data,
-                    ParsingContext(
-                        in_interpolation=False,
-                        is_escaped=False,
-                        interpolation_key="",
-                        interpolation_plugin=_default_plugin,
-                    ),
-                )
-
-            return interpolated
-        case "}" if context.in_interpolation and context.is_escaped:
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=True,
-                    is_escaped=False,
-                    interpolation_key=context.interpolation_key + "}",
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
-            )
-        case _ if context.interpolation_prefix:
-            return (
-                "#"
-                + letter
-                + parse_str(
-                    rest,
-                    data,
-                    ParsingContext(
-                        in_interpolation=False,
-                        is_escaped=False,
-                        interpolation_key="",
-                        interpolation_plugin=context.interpolation_plugin,
-                    ),
-                )
-            )
+            return list(self.render_batch(queries, data, chunk_size=len(queries)))
+        return self._parse_tree(*_as_list(queries, data), copy)
 
-        case x if context.in_interpolation:
-            key = context.interpolation_key
-            if context.is_escaped:
-                key += "\\"
-            return parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=True,
-                    is_escaped=False,
-                    interpolation_key=key + x,
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
-            )
-        case _ if context.is_escaped:
-            return (
-                "\\"
-                + letter
-                + parse_str(
-                    rest,
-                    data,
-                    ParsingContext(
-                        in_interpolation=context.in_interpolation,
-                        is_escaped=False,
-                        interpolation_key=context.interpolation_key,
-                        interpolation_plugin=context.interpolation_plugin,
-                    ),
-                )
-            )
-        case _:
-            return letter + parse_str(
-                rest,
-                data,
-                ParsingContext(
-                    in_interpolation=False,
-                    is_escaped=False,
-                    interpolation_key="",
-                    interpolation_plugin=context.interpolation_plugin,
-                ),
-            )
+    def parse_dict(
+        self, queries: Mapping[str, Any], data: Any, copy: bool = True
+    ) -> dict[str, Any]:
+        """
+        Parse all templated strings of `queries`. Without `copy`, the sub-dicts
+        and sub-lists without any template are returned by reference instead of
+        being copied.
+        """
+        return self._parse_tree(*_as_dict(queries, data), copy)
 
+    async def parse_list_async(
+        self,
+        queries: Sequence[Any],
+        data: Any,
+        copy: bool = True,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ) -> list[Any]:
+        """
+        Same as `parse_list`, see `parse_str_async` for `concurrency` and
+        `timeout`.
+        """
+        return await self._parse_tree_async(
+            *_as_list(queries, data), copy, concurrency, timeout
+        )
 
-def parse_list(queries: Sequence[Any], data: Any) -> list[Any]:
-    new_data: list[Any] = []
-    for val in queries:
-        if isinstance(val, str) and "{" in val and "}" in val:
-            new_data.append(parse_str(val, data))
-        elif isinstance(val, dict):
-            new_data.append(parse_dict(val, data))
-        elif isinstance(val, list):
-            new_data.append(parse_list(val, data))
-        else:
-            new_data.append(val)
-    return new_data
-
-
-def parse_dict(queries: Mapping[str, Any], data: Any) -> dict[str, Any]:
-    new_data: dict[str, Any] = {}
-    for key, val in queries.items():
-        if isinstance(val, str) and "{" in val and "}" in val:
-            new_data[key] = parse_str(val, data)
-        elif isinstance(val, dict):
-            new_data[key] = parse_dict(val, data)
-        elif isinstance(val, list):
-            new_data[key] = parse_list(val, data)
-        else:
-            new_data[key] = val
-    return new_data
+    async def parse_dict_async(
+        self,
+        queries: Mapping[str, Any],
+        data: Any,
+        copy: bool = True,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, Any]:
+        """
+        Same as `parse_dict`, see `parse_str_async` for `concurrency` and
+        `timeout`.
+        """
+        return await self._parse_tree_async(
+            *_as_dict(queries, data), copy, concurrency, timeout
+        )
+
+    def parse_lazy(self, data: Any) -> Any:
+        """
+        Returns a read-only view over `data` (a `LazyConfig` for dicts, a
+        `LazyList` for lists) that resolves templated values on first access.
+        """
+        resolver = LazyResolver(data, self._execute_template_call)
+        if isinstance(data, dict):
+            return LazyConfig(data, resolver)
+        if isinstance(data, list):
+            return LazyList(data, resolver)
+        raise TypeError(f"Cannot build a lazy view over {type(data).__name__}")
+
+    def _parse_model_data(self, model: type[BaseModel], data: dict[str, Any]) -> Any:
+        """
+        Resolve the templated values of `data` that can end up in a field of
+        `model`, with their dependencies.
+        """
+        plan = interpolation_plan(model)
+        if plan.scans_all:
+            return self.parse_dict(data, data, copy=False)
+        paths = templated_paths(data, plan)
+        if not paths:
+            return data
+        graph = DependencyGraph(
+            data,
+            self._execute_template_call,
+            paths=with_referenced_paths(data, plan, paths),
+        )
+        graph.execute = self._prefetch(
+            (graph.templates[dotted][2] for dotted in paths), graph.root
+        )
+        graph.resolve_many(paths)
+        return graph.root
+
+    def validate(self, model: type[Model], data: Any) -> Model:
+        """
+        Validate `data` with `model`, whose `ParsedModel`s are interpolated with
+        this resolver.
+        """
+        with self.use():
+            return model.model_validate(data)
+
+
+default_resolver = Resolver()
+_current_resolver: ContextVar[Resolver | None] = ContextVar(
+    "current_resolver", default=None
+)
+
+
+def current_resolver() -> Resolver:
+    """
+    The resolver of `Resolver.use()` in this context, or the default one.
+    """
+    resolver = _current_resolver.get()
+    return default_resolver if resolver is None else resolver
+
+
+def execute_parser_plugin(plugin: str, key: str, data: Any):
+    return current_resolver().execute_plugin(plugin, key, data)
+
+
+def execute_parser_plugin_batch(plugin: str, keys: list[str], data: Any) -> list[Any]:
+    """
+    Resolve all `keys` with `plugin`, in one call when the plugin has a batch
+    implementation.
+    """
+    return current_resolver().execute_plugin_batch(plugin, keys, data)
+
+
+def register_plugin(
+    name, batch: BatchCallback | None = None, cache: PluginCache | None = None
+):
+    """
+    Register a plugin `func(key, data)`. If `batch(keys, data)` is given, it is
+    used to resolve all the keys of the plugin found in a query, list or dict in a
+    single call. `func` and `batch` can be coroutine functions, in which case all
+    their calls are made concurrently. `cache` is the caching policy of the
+    values (`PureCache`, `TTLCache`, `LRUCache` or `ParseCache`), nothing is
+    cached by default.
+    """
+    return current_resolver().register_plugin(name, batch, cache)
+
+
+def registered_plugins() -> dict[str, Plugin]:
+    return current_resolver().registered_plugins()
+
+
+def set_plugin_cache(name: str, cache: PluginCache | None):
+    """
+    Change the caching policy of a registered plugin (including the built-in
+    `interpolate` and `env` plugins).
+    """
+    current_resolver().set_plugin_cache(name, cache)
+
+
+def invalidate_plugin_cache(name: str | None = None):
+    """
+    Clear the cached values of the plugin `name`, or of all plugins.
+    """
+    current_resolver().invalidate_plugin_cache(name)
+
+
+def parse_str(query: str, data: Any) -> Any:
+    return current_resolver().parse_str(query, data)
+
+
+async def parse_str_async(
+    query: str,
+    data: Any,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+) -> Any:
+    """
+    Same as `parse_str`, but all the calls to async plugins run concurrently (at
+    most `concurrency` at a time, each failing after `timeout` seconds).
+    """
+    return await current_resolver().parse_str_async(query, data, concurrency, timeout)
+
+
+def render_batch(
+    queries: Iterable[Any], data: Any, chunk_size: int = BATCH_RENDER_CHUNK
+) -> Iterator[Any]:
+    """
+    Lazily render many templated strings against `data`, in order. The
+    templated values of `data` and the plugin values are resolved once for all
+    queries, and the calls to batch and async plugins are prefetched
+    `chunk_size` queries at a time. Other values are yielded as is.
+    Example:
+        paths = render_batch((f"#{{root}}/part-{i}" for i in range(10**6)), config)
+    """
+    return current_resolver().render_batch(queries, data, chunk_size)
+
+
+def render_each(query: str, contexts: Iterable[Any]) -> Iterator[Any]:
+    """
+    Lazily render `query` against each of `contexts`, like `parse_str`, but the
+    query is only parsed once.
+    Example:
+        contexts = ({"split": "train", "idx": idx} for idx in range(10))
+        names = list(render_each("#{split}-#{idx}", contexts))
+    """
+    return current_resolver().render_each(query, contexts)
+
+
+def parse_list(queries: Sequence[Any], data: Any, copy: bool = True) -> list[Any]:
+    """
+    Parse all templated strings of `queries`. Without `copy`, the sub-lists and
+    sub-dicts without any template are returned by reference instead of being
+    copied. Long lists of strings are rendered with `render_batch`.
+    """
+    return current_resolver().parse_list(queries, data, copy)
+
+
+def parse_dict(
+    queries: Mapping[str, Any], data: Any, copy: bool = True
+) -> dict[str, Any]:
+    """
+    Parse all templated strings of `queries`. Without `copy`, the sub-dicts and
+    sub-lists without any template are returned by reference instead of being
+    copied.
+    """
+    return current_resolver().parse_dict(queries, data, copy)
+
+
+async def parse_list_async(
+    queries: Sequence[Any],
+    data: Any,
+    copy: bool = True,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+) -> list[Any]:
+    """
+    Same as `parse_list`, see `parse_str_async` for `concurrency` and `timeout`.
+    """
+    return await current_resolver().parse_list_async(
+        queries, data, copy, concurrency, timeout
+    )
+
+
+async def parse_dict_async(
+    queries: Mapping[str, Any],
+    data: Any,
+    copy: bool = True,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    """
+    Same as `parse_dict`, see `parse_str_async` for `concurrency` and `timeout`.
+    """
+    return await current_resolver().parse_dict_async(
+        queries, data, copy, concurrency, timeout
+    )
+
+
+def parse_lazy(data: Any) -> Any:
+    """
+    Returns a read-only view over `data` (a `LazyConfig` for dicts, a `LazyList`
+    for lists) that resolves templated values on first access.
+    """
+    return current_resolver().parse_lazy(data)
+
+
+class _Interpolated:
+    """
+    Data that was already interpolated: `root` and the dicts and lists below
+    it, whose ids are only collected when a nested model asks for them.
+    """
+
+    def __init__(self, root: Any):
+        self.root = root
+        self._ids: set[int] | None = None
+
+    def __contains__(self, data: Any) -> bool:
+        if data is self.root:
+            return True
+        if self._ids is None:
+            self._ids = set()
+            stack = [self.root]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict | list) and id(node) not in self._ids:
+                    self._ids.add(id(node))
+                    stack.extend(node.values() if isinstance(node, dict) else node)
+        return id(data) in self._ids
+
+
+_interpolated: ContextVar[_Interpolated | None] = ContextVar(
+    "interpolated", default=None
+)
 
 
 class ParsedModel(BaseModel):
-    @model_validator(mode="before")
+    """
+    Model interpolating its data before validating it, with the current
+    resolver. Only the values that can end up in a field are resolved (see
+    `interpolation_plan`), and nested `ParsedModel`s are not interpolated again
+    when their data is part of the interpolated data of their parent. Models
+    validated by a validator from other data are interpolated.
+    """
+
+    @model_validator(mode="wrap")
     @classmethod
-    def interpolate_variables(cls, data: Any) -> Any:
+    def interpolate_variables(cls, data: Any, handler: ValidatorFunctionWrapHandler):
+        interpolated = _interpolated.get()
+        if interpolated is not None and data in interpolated:
+            return handler(data)
         if isinstance(data, dict):
-            return parse_dict(data, data)
+            with stage("interpolate", cls.__name__):
+                data = current_resolver()._parse_model_data(cls, data)
         elif isinstance(data, list):
-            return parse_list(data, data)
-        else:
-            return data
+            data = current_resolver().parse_list(data, data, copy=False)
+        token = _interpolated.set(_Interpolated(data))
+        try:
+            return handler(data)
+        finally:
+            _interpolated.reset(token)
+
+
+def validate_interpolated(model: type[Model], data: Any) -> Model:
+    """
+    Validate `data` that was already interpolated (e.g. with `parse_dict`)
+    without interpolating it again in `ParsedModel`s.
+    """
+    token = _interpolated.set(_Interpolated(data))
+    try:
+        with stage("validate", model.__name__):
+            return model.model_validate(data)
+    finally:
+        _interpolated.reset(token)
@@ -0,0 +1,307 @@
+import hashlib
+from collections.abc import Iterable, Mapping, Sequence
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+
+from cfg_tools.graph import _join, split_path
+from cfg_tools.reload import ConfigDiff
+
+# scalars are hashed as part of their container, the other values are nodes
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _encode(value: Any) -> bytes:
+    """
+    Canonical bytes of a scalar. Encodings are self-delimiting, so they can be
+    concatenated without ambiguity.
+    """
+    kind = type(value)
+    if kind is str:
+        data = value.encode("utf-8", "surrogatepass")
+        return b"s%d:" % len(data) + data
+    if value is None:
+        return b"n"
+    if kind is bool:
+        return b"t" if value else b"f"
+    if kind is int:
+        return b"i%d;" % value
+    if kind is float:
+        return b"d" + value.hex().encode() + b";"
+    if isinstance(value, set | frozenset):
+        items = sorted(_encode(item) for item in value)
+        return b"S%d:" % len(items) + b"".join(items)
+    if isinstance(value, bytes):
+        return b"y%d:" % len(value) + value
+    if isinstance(value, Enum):
+        return b"e" + _encode(type(value).__qualname__) + _encode(value.value)
+    # other values must have a stable str()
+    return b"o" + _encode(type(value).__qualname__) + _encode(str(value))
+
+
+def _is_node(value: Any) -> bool:
+    if isinstance(value, Mapping | BaseModel):
+        return True
+    return isinstance(value, Sequence) and not isinstance(value, str | bytes)
+
+
+class ConfigFingerprint:
+    """
+    Hash of a config that does not depend on the order of the keys, with the
+    hash of every subtree (a Merkle tree). `fingerprint["a"]` or
+    `fingerprint.get_path("a.b")` is the fingerprint of a subtree, `update`
+    hashes a changed value without hashing the rest of the config again, and
+    `diff` only visits the subtrees whose hashes differ.
+    Example:
+        fingerprint = fingerprint_config(config)
+        results_key = fingerprint["model"].hexdigest
+    """
+
+    __slots__ = ("digest", "_entries", "_children")
+
+    def __init__(
+        self,
+        digest: bytes,
+        entries: dict[Any, bytes] | list[bytes] | None = None,
+        children: dict[Any, "ConfigFingerprint"] | None = None,
+    ):
+        self.digest = digest
+        # encoded values of a dict or list: the scalars, or b"h" and the digest
+        # of the child node
+        self._entries = entries
+        self._children = children or {}
+
+    @classmethod
+    def _node(
+        cls,
+        entries: dict[Any, bytes] | list[bytes],
+        children: dict[Any, "ConfigFingerprint"],
+    ) -> "ConfigFingerprint":
+        if isinstance(entries, dict):
+            items = sorted(_encode(key) + val for key, val in entries.items())
+            digest = _hash(b"d%d:" % len(items) + b"".join(items))
+        else:
+            digest = _hash(b"l%d:" % len(entries) + b"".join(entries))
+        return cls(digest, entries, children)
+
+    @classmethod
+    def _leaf(cls, encoded: bytes) -> "ConfigFingerprint":
+        return cls(_hash(b"v" + encoded))
+
+    @property
+    def hexdigest(self) -> str:
+        return self.digest.hex()
+
+    def _entry(self) -> bytes:
+        return b"h" + self.digest
+
+    def _key(self, part: str) -> Any:
+        # keys of the dotted paths are strings, list indices are ints
+        if isinstance(self._entries, list):
+            return int(part)
+        if self._entries is not None and part not in self._entries:
+            return next((key for key in self._entries if str(key) == part), part)
+        return part
+
+    def __getitem__(self, key: Any) -> "ConfigFingerprint":
+        if self._entries is None:
+            raise KeyError(key)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        entry = self._entries[key]
+        return ConfigFingerprint._leaf(entry)
+
+    def get_path(self, dotted: str) -> "ConfigFingerprint":
+        """
+        Fingerprint of the value at the dotted path `dotted` (e.g. "a.b.0").
+        """
+        node = self
+        for part in split_path(dotted):
+            node = node[node._key(part)]
+        return node
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConfigFingerprint):
+            return NotImplemented
+        return self.digest == other.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __repr__(self) -> str:
+        return f"ConfigFingerprint({self.hexdigest})"
+
+    def _set(
+        self, key: Any, entry: bytes | None, child: "ConfigFingerprint | None"
+    ) -> "ConfigFingerprint":
+        # copy of this node where `key` is set to `entry`, or removed if None
+        entries = self._entries
+        children = dict(self._children)
+        children.pop(key, None)
+        if isinstance(entries, list):
+            entries = list(entries)
+            if entry is None:
+                del entries[key]
+                # the indices after `key` are shifted
+                children = {
+                    idx if idx < key else idx - 1: node
+                    for idx, node in children.items()
+                }
+            elif key == len(entries):
+                entries.append(entry)
+            else:
+                entries[key] = entry
+        elif entries is not None:
+            entries = dict(entries)
+            if entry is None:
+                del entries[key]
+            else:
+                entries[key] = entry
+        else:
+            raise KeyError(key)
+        if child is not None:
+            children[key] = child
+        return ConfigFingerprint._node(entries, children)
+
+    def _replace(self, dotted: str, value: Any, remove: bool) -> "ConfigFingerprint":
+        parts = split_path(dotted)
+        path: list[tuple[ConfigFingerprint, Any]] = []
+        node = self
+        for part in parts[:-1]:
+            key = node._key(part)
+            path.append((node, key))
+            node = node[key]
+        key = node._key(parts[-1])
+        if remove:
+            node = node._set(key, None, None)
+        else:
+            new = fingerprint_config(value)
+            if new._entries is None:
+                node = node._set(key, _encode(value), None)
+            else:
+                node = node._set(key, new._entry(), new)
+        # hash the ancestors again, from the changed node up
+        for parent, parent_key in reversed(path):
+            node = parent._set(parent_key, node._entry(), node)
+        return node
+
+    def update(self, dotted: str, value: Any) -> "ConfigFingerprint":
+        """
+        Fingerprint of the config where the value at `dotted` is set to `value`
+        (added to its dict, or appended if it is the next index of its list).
+        Only `value` and the ancestors of `dotted` are hashed.
+        """
+        return self._replace(dotted, value, remove=False)
+
+    def remove(self, dotted: str) -> "ConfigFingerprint":
+        """
+        Fingerprint of the config without the value at `dotted`.
+        """
+        return self._replace(dotted, None, remove=True)
+
+    def diff(self, other: "ConfigFingerprint") -> ConfigDiff:
+        """
+        Dotted paths that were added, removed or changed from this fingerprint to
+        `other`. Subtrees with the same hash are not visited.
+        """
+        diff = ConfigDiff()
+        stack: list[tuple[str, ConfigFingerprint, ConfigFingerprint]] = [
+            ("", self, other)
+        ]
+        while stack:
+            prefix, a, b = stack.pop()
+            if a.digest == b.digest:
+                continue
+            old, new = a._entries, b._entries
+            if isinstance(old, dict) and isinstance(new, dict):
+                diff.removed.extend(_join(prefix, k) for k in old if k not in new)
+                for k, entry in new.items():
+                    if k not in old:
+                        diff.added.append(_join(prefix, k))
+                    elif old[k] != entry:
+                        _diff_entry(diff, stack, _join(prefix, k), a, b, k)
+            elif isinstance(old, list) and isinstance(new, list):
+                for idx in range(len(new), len(old)):
+                    diff.removed.append(_join(prefix, idx))
+                for idx in range(len(old), len(new)):
+                    diff.added.append(_join(prefix, idx))
+                for idx in range(min(len(old), len(new))):
+                    if old[idx] != new[idx]:
+                        _diff_entry(diff, stack, _join(prefix, idx), a, b, idx)
+            else:
+                diff.changed.append(prefix)
+        diff.added.sort()
+        diff.removed.sort()
+        diff.changed.sort()
+        return diff
+
+
+def _diff_entry(
+    diff: ConfigDiff,
+    stack: list[tuple[str, ConfigFingerprint, ConfigFingerprint]],
+    dotted: str,
+    a: ConfigFingerprint,
+    b: ConfigFingerprint,
+    key: Any,
+):
+    old, new = a._children.get(key), b._children.get(key)
+    if old is not None and new is not None:
+        stack.append((dotted, old, new))
+    else:
+        diff.changed.append(dotted)
+
+
+def fingerprint_config(data: Any) -> ConfigFingerprint:
+    """
+    Fingerprint of a config: dicts (and other mappings), lists (and tuples),
+    scalars, or a pydantic model (e.g. a `ParsedModel`) hashed through its
+    `model_dump`. Two configs with the same values have the same fingerprint,
+    whatever the order of their keys.
+    """
+    if isinstance(data, BaseModel):
+        data = data.model_dump()
+    if not _is_node(data):
+        return ConfigFingerprint._leaf(_encode(data))
+    # post-order traversal: a node is hashed once all its children are. Shared
+    # subtrees are hashed once. `done` keeps the hashed nodes alive, so that the
+    # views created on access (e.g. of a `SharedConfig`) and the dumps of nested
+    # models cannot be freed and their ids reused by other nodes.
+    done: dict[int, tuple[Any, ConfigFingerprint]] = {}
+    stack: list[tuple[Any, Any, list[tuple[Any, Any]]]] = [(data, None, [])]
+    while stack:
+        node, entries, nodes = stack.pop()
+        if entries is None:
+            if id(node) in done:
+                continue
+            pairs: Iterable[tuple[Any, Any]]
+            if isinstance(node, Mapping):
+                entries = {}
+                pairs = node.items()
+            else:
+                entries = [b""] * len(node)
+                pairs = enumerate(node)
+            for key, val in pairs:
+                if type(val) in _SCALARS or not _is_node(val):
+                    entries[key] = _encode(val)
+                else:
+                    if isinstance(val, BaseModel):
+                        val = val.model_dump()
+                    # filled with the digest of the child
+                    entries[key] = b""
+                    nodes.append((key, val))
+            stack.append((node, entries, nodes))
+            stack.extend((val, None, []) for _, val in nodes)
+            continue
+        children: dict[Any, ConfigFingerprint] = {}
+        for key, val in nodes:
+            child = done[id(val)][1]
+            children[key] = child
+            entries[key] = child._entry()
+        done[id(node)] = (node, ConfigFingerprint._node(entries, children))
+    return done[id(data)][1]
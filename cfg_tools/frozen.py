@@ -0,0 +1,261 @@
+import sys
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+
+class _Layout:
+    """
+    Interned keys of a `FrozenConfig`, shared by all the nodes with the same
+    keys in the same order.
+    """
+
+    __slots__ = ("keys", "index")
+
+    def __init__(self, keys: tuple[Any, ...]):
+        self.keys = keys
+        self.index = {key: idx for idx, key in enumerate(keys)}
+
+
+# layouts are never freed: configs of a process use few distinct key sets
+_layouts: dict[tuple[Any, ...], _Layout] = {}
+
+
+def _layout(keys: tuple[Any, ...]) -> _Layout:
+    layout = _layouts.get(keys)
+    if layout is None:
+        keys = tuple(sys.intern(key) if type(key) is str else key for key in keys)
+        # setdefault is atomic: concurrent threads end up with the same layout
+        layout = _layouts.setdefault(keys, _Layout(keys))
+    return layout
+
+
+class FrozenConfig(Mapping[Any, Any]):
+    """
+    Immutable and hashable config node. Keys are stored once per distinct key
+    set, values in a tuple, so equal configs are cheap to compare and can be
+    used as dict keys. Values are read with `config["a"]`, `config.a` or
+    `config.get_path("a.b.0")`.
+    Example:
+        config = freeze(parse_dict(data, data))
+        results[config] = train(config)
+    """
+
+    __slots__ = ("_layout", "_values", "_hash")
+
+    def __init__(self, layout: _Layout, values: tuple[Any, ...]):
+        object.__setattr__(self, "_layout", layout)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_hash", None)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._values[self._layout.index[key]]
+
+    def __getattr__(self, name: str) -> Any:
+        index = self._layout.index.get(name)
+        if index is None:
+            raise AttributeError(name)
+        return self._values[index]
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("FrozenConfig is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("FrozenConfig is immutable")
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout.index
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._layout.keys)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get_path(self, dotted: str) -> Any:
+        """
+        Value at the dotted path `dotted` (e.g. "a.b.0").
+        """
+        node: Any = self
+        for part in dotted.split("."):
+            node = node[int(part)] if isinstance(node, FrozenList) else node[part]
+        return node
+
+    def __hash__(self) -> int:
+        # computed by `freeze`, unless a value is not hashable
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(frozenset(self.items())))
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        return _equal(self, other)
+
+    def __reduce__(self):
+        return freeze, (thaw(self),)
+
+    def __repr__(self) -> str:
+        return f"FrozenConfig({thaw(self)!r})"
+
+    def to_dict(self) -> dict[Any, Any]:
+        """
+        Mutable copy made of dicts and lists.
+        """
+        return thaw(self)
+
+
+class FrozenList(tuple[Any, ...]):
+    """
+    Immutable list of a `FrozenConfig`.
+    """
+
+    # tuple subclasses cannot have slots: the hash is kept in the __dict__
+    _hash: int
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, list | tuple):
+            return NotImplemented
+        return _equal(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self) -> int:
+        # computed by `freeze`, unless a value is not hashable
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = tuple.__hash__(self)
+            return self._hash
+
+    def __reduce__(self):
+        # the cached hash is not pickled: str hashes differ between processes
+        return freeze, (thaw(self),)
+
+    def __repr__(self) -> str:
+        return f"FrozenList({thaw(self)!r})"
+
+    def to_list(self) -> list[Any]:
+        """
+        Mutable copy made of dicts and lists.
+        """
+        return thaw(self)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """
+    Whether the frozen config `a` equals `b` (frozen or not), compared with an
+    explicit stack so that deep configs do not hit the recursion limit.
+    """
+    stack: list[tuple[Any, Any]] = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if a is b:
+            continue
+        if not isinstance(a, FrozenConfig | FrozenList):
+            if not isinstance(b, FrozenConfig | FrozenList):
+                if a != b:
+                    return False
+                continue
+            a, b = b, a
+        if isinstance(a, FrozenConfig):
+            if not isinstance(b, Mapping) or len(a) != len(b):
+                return False
+            if isinstance(b, FrozenConfig):
+                if None not in (a._hash, b._hash) and a._hash != b._hash:
+                    return False
+                if a._layout is b._layout:
+                    stack.extend(zip(a._values, b._values, strict=True))
+                    continue
+            for key, val in zip(a._layout.keys, a._values, strict=True):
+                if key not in b:
+                    return False
+                stack.append((val, b[key]))
+        else:
+            if not isinstance(b, list | tuple) or len(a) != len(b):
+                return False
+            hashes = (a.__dict__.get("_hash"), getattr(b, "__dict__", {}).get("_hash"))
+            if None not in hashes and hashes[0] != hashes[1]:
+                return False
+            stack.extend(zip(a, b, strict=True))
+    return True
+
+
+def _cache_hash(value: "FrozenConfig | FrozenList"):
+    # the values are already frozen with their hash, so this does not recurse
+    try:
+        hash_ = (
+            hash(frozenset(value.items()))
+            if isinstance(value, FrozenConfig)
+            else tuple.__hash__(value)
+        )
+    except TypeError:
+        # not hashable: `__hash__` raises when it is called
+        return
+    if isinstance(value, FrozenConfig):
+        object.__setattr__(value, "_hash", hash_)
+    else:
+        value._hash = hash_
+
+
+def freeze(data: Any, pool: dict[Any, Any] | None = None) -> Any:
+    """
+    Immutable copy of `data`: dicts become `FrozenConfig`s, lists and tuples
+    `FrozenList`s and sets frozensets. With `pool`, a dict kept across calls,
+    equal subtrees of all the frozen configs are stored once. Hashes are
+    computed while freezing, from the leaves up.
+    """
+    if isinstance(data, set):
+        return frozenset(data)
+    if not isinstance(data, dict | list | tuple):
+        return data
+    # post-order traversal: a node is frozen once all its values are
+    frozen: dict[int, Any] = {}
+    stack: list[tuple[Any, bool]] = [(data, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in frozen:
+            continue
+        values = node.values() if isinstance(node, dict) else node
+        if not children_done:
+            stack.append((node, True))
+            stack.extend(
+                (val, False) for val in values if isinstance(val, dict | list | tuple)
+            )
+            continue
+        items = tuple(
+            frozen[id(val)]
+            if isinstance(val, dict | list | tuple)
+            else frozenset(val)
+            if isinstance(val, set)
+            else val
+            for val in values
+        )
+        if isinstance(node, dict):
+            value: Any = FrozenConfig(_layout(tuple(node)), items)
+        else:
+            value = FrozenList(items)
+        _cache_hash(value)
+        if pool is not None:
+            value = pool.setdefault(value, value)
+        frozen[id(node)] = value
+    return frozen[id(data)]
+
+
+def thaw(data: Any) -> Any:
+    """
+    Mutable copy of a frozen config, made of dicts and lists.
+    """
+    if not isinstance(data, FrozenConfig | FrozenList):
+        return data
+    root: Any = {} if isinstance(data, FrozenConfig) else [None] * len(data)
+    stack: list[tuple[Any, Any]] = [(data, root)]
+    while stack:
+        node, copy = stack.pop()
+        items = node.items() if isinstance(node, FrozenConfig) else enumerate(node)
+        for key, val in items:
+            if isinstance(val, FrozenConfig | FrozenList):
+                child: Any = {} if isinstance(val, FrozenConfig) else [None] * len(val)
+                stack.append((val, child))
+                val = child
+            copy[key] = val
+    return root
@@ -0,0 +1,392 @@
+from bisect import bisect_left
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
+from functools import partial
+from typing import Any
+
+from cfg_tools.plugins.interpolation import PathIndex, use_path_index
+from cfg_tools.template import PluginCall, Template, compile_template
+
+Execute = Callable[[str | None, str, Any], Any]
+
+
+class InterpolationCycleError(ValueError):
+    """
+    Raised when interpolations reference each other in a cycle.
+    `cycle` holds the dotted paths of the cycle, starting and ending with the
+    same path.
+    """
+
+    def __init__(self, cycle: list[str]):
+        self.cycle = cycle
+        super().__init__(f"Interpolation cycle detected: {' -> '.join(cycle)}")
+
+
+def is_template(val: Any) -> bool:
+    return isinstance(val, str) and "{" in val and "}" in val
+
+
+def _escape(part: str) -> str:
+    if "." in part or "\\" in part:
+        return part.replace("\\", "\\\\").replace(".", "\\.")
+    return part
+
+
+def join_path(parts: Iterable[str]) -> str:
+    """
+    Dotted path of the keys `parts`. The dots and backslashes of the keys are
+    escaped with a backslash, so that the key "a.b" does not have the same path
+    as the key "b" of the key "a".
+    Example:
+        join_path(["a.b", "c"]) == "a\\.b.c"
+    """
+    return ".".join(map(_escape, parts))
+
+
+def split_path(dotted: str) -> list[str]:
+    """
+    Keys of the dotted path `dotted`, the inverse of `join_path`.
+    """
+    if "\\" not in dotted:
+        return dotted.split(".")
+    parts: list[str] = []
+    part: list[str] = []
+    chars = iter(dotted)
+    for char in chars:
+        if char == "\\":
+            part.append(next(chars, ""))
+        elif char == ".":
+            parts.append("".join(part))
+            part = []
+        else:
+            part.append(char)
+    parts.append("".join(part))
+    return parts
+
+
+def _join(prefix: str, key: Any) -> str:
+    # dotted path of `key` below the dotted path `prefix`
+    part = _escape(str(key))
+    return f"{prefix}.{part}" if prefix else part
+
+
+def _dotted(frames: list[tuple[Any, int, str]], frame_idx: int, key: str) -> str:
+    parts = [key]
+    while frame_idx > 0:
+        _, frame_idx, frame_key = frames[frame_idx]
+        parts.append(frame_key)
+    return join_path(reversed(parts))
+
+
+def templated_containers(tree: Any) -> set[int]:
+    """
+    Returns the ids of the dicts and lists of `tree` that hold a templated value
+    somewhere below them.
+    """
+    nodes: list[tuple[Any, int]] = []
+    has_template: list[bool] = []
+    stack: list[tuple[Any, int]] = [(tree, -1)]
+    while stack:
+        node, parent = stack.pop()
+        pos = len(nodes)
+        nodes.append((node, parent))
+        has_template.append(False)
+        for val in node.values() if isinstance(node, dict) else node:
+            if isinstance(val, dict | list):
+                stack.append((val, pos))
+            elif not has_template[pos] and is_template(val):
+                has_template[pos] = True
+
+    # children always come after their parent
+    for pos in range(len(nodes) - 1, 0, -1):
+        if has_template[pos]:
+            has_template[nodes[pos][1]] = True
+    return {
+        id(node) for (node, _), flag in zip(nodes, has_template, strict=True) if flag
+    }
+
+
+def copy_tree(
+    tree: Any,
+    on_template: Callable[[Any, Any, Callable[[], str]], None] | None = None,
+    share: bool = False,
+) -> Any:
+    """
+    Copy the dicts and lists of `tree`. `on_template(container, key, dotted)` is
+    called for every templated string of the copy, where `dotted()` computes
+    its dotted path.
+    With `share`, only the containers leading to templated values are copied
+    and the other subtrees are returned by reference.
+    """
+    if not isinstance(tree, dict | list):
+        return tree
+
+    templated = templated_containers(tree) if share else set()
+    if share and id(tree) not in templated:
+        return tree
+
+    root: Any = {} if isinstance(tree, dict) else [None] * len(tree)
+    # frames hold (container copy, parent frame index, key in parent) so that
+    # dotted paths are only built for templated values.
+    frames: list[tuple[Any, int, str]] = [(root, 0, "")]
+    stack: list[tuple[Any, int]] = [(tree, 0)]
+    while stack:
+        src, frame_idx = stack.pop()
+        dst = frames[frame_idx][0]
+        items = src.items() if isinstance(src, dict) else enumerate(src)
+        for key, val in items:
+            if isinstance(val, dict | list):
+                if share and id(val) not in templated:
+                    dst[key] = val
+                    continue
+                child: Any = {} if isinstance(val, dict) else [None] * len(val)
+                dst[key] = child
+                frames.append((child, frame_idx, str(key)))
+                stack.append((val, len(frames) - 1))
+                continue
+            dst[key] = val
+            if on_template is not None and is_template(val):
+                on_template(dst, key, partial(_dotted, frames, frame_idx, str(key)))
+    return root
+
+
+def _key(container: Any, part: str) -> Any:
+    # key of `container` whose dotted form is `part`
+    if isinstance(container, list):
+        return int(part)
+    if part in container:
+        return part
+    return next(key for key in container if str(key) == part)
+
+
+def copy_paths(
+    tree: Any,
+    paths: Iterable[str],
+    on_template: Callable[[Any, Any, Callable[[], str]], None] | None = None,
+) -> Any:
+    """
+    Copy the dicts and lists leading to the templated values at the dotted
+    `paths` of `tree`, and return the other subtrees by reference.
+    `on_template` is called like in `copy_tree`, for these values only.
+    """
+    root = list(tree) if isinstance(tree, list) else dict(tree)
+    copied = {id(root)}
+    for dotted in paths:
+        node = root
+        parts = split_path(dotted)
+        for part in parts[:-1]:
+            key = _key(node, part)
+            child = node[key]
+            if id(child) not in copied:
+                child = list(child) if isinstance(child, list) else dict(child)
+                node[key] = child
+                copied.add(id(child))
+            node = child
+        if on_template is not None:
+            on_template(node, _key(node, parts[-1]), partial(str, dotted))
+    return root
+
+
+def _lookup(node: Any, part: str) -> tuple[bool, Any]:
+    if isinstance(node, Mapping):
+        if part in node:
+            return True, node[part]
+    elif isinstance(node, list) and part.isdigit() and int(part) < len(node):
+        return True, node[int(part)]
+    return False, None
+
+
+class DependencyGraph:
+    """
+    Resolves the templates of `data`, following chained interpolations.
+
+    Interpolations are edges between dotted paths (see `join_path`). A
+    templated value is only rendered once all the values it references (and
+    all templated values below them) are resolved, so each value is computed
+    exactly once and sees fully resolved data. Resolved values are written in
+    `root`, a copy of `data`. Without `copy`, `root` shares the subtrees of
+    `data` that do not hold any templated value. If the dotted `paths` of all
+    the templated values are known, they are given to avoid walking `data` (as
+    without `copy`).
+    """
+
+    def __init__(
+        self,
+        data: Any,
+        execute: Execute,
+        reference_plugins: Collection[str | None] = (None, "interpolate"),
+        copy: bool = True,
+        paths: Iterable[str] | None = None,
+    ):
+        self.data = data
+        self.execute = execute
+        self.reference_plugins = reference_plugins
+        self.templates: dict[str, tuple[Any, Any, Template]] = {}
+        self.resolved: set[str] = set()
+        # rendered templates, in a topological order
+        self.order: list[str] = []
+        # references whose dependencies are resolved
+        self._looked_up: set[str] = set()
+        if paths is None:
+            self.root = copy_tree(data, self._register, share=not copy)
+        else:
+            self.root = copy_paths(data, paths, self._register)
+        self.index = PathIndex(self.root)
+        self._sorted_templates = sorted(self.templates)
+
+    def _register(self, container: Any, key: Any, dotted: Callable[[], str]):
+        self.templates[dotted()] = (container, key, compile_template(container[key]))
+
+    def references(self, template: Template) -> Iterator[str]:
+        for call in template.segments:
+            if isinstance(call, PluginCall) and call.plugin in self.reference_plugins:
+                yield call.key
+
+    def dependencies(self, reference: str) -> list[str]:
+        """
+        Templated values that must be resolved before `reference` can be
+        looked up: the ones at or below `reference`, and the ones above it that
+        are expected to resolve into a container.
+        """
+        deps: list[str] = []
+        node = self.root
+        parts = reference.split(".")
+        if "\\" in reference:
+            # the keys of a reference never hold a dot, but can hold a backslash
+            reference = join_path(parts)
+        for idx, part in enumerate(parts[:-1]):
+            found, node = _lookup(node, part)
+            if not found:
+                break
+            if is_template(node):
+                ancestor = join_path(parts[: idx + 1])
+                if ancestor in self.templates and ancestor not in self.resolved:
+                    deps.append(ancestor)
+                break
+
+        sorted_templates = self._sorted_templates
+        if reference in self.templates:
+            deps.append(reference)
+        prefix = reference + "."
+        idx = bisect_left(sorted_templates, prefix)
+        while idx < len(sorted_templates) and sorted_templates[idx].startswith(prefix):
+            deps.append(sorted_templates[idx])
+            idx += 1
+        return deps
+
+    def _template_dependencies(self, template: Template) -> list[str]:
+        deps: list[str] = []
+        for reference in self.references(template):
+            deps.extend(self.dependencies(reference))
+        return deps
+
+    def dependents(self) -> dict[str, list[str]]:
+        """
+        Templated values that directly depend on each templated value. Must be
+        called before resolving anything.
+        """
+        dependents: dict[str, list[str]] = {dotted: [] for dotted in self.templates}
+        for dotted, (_, _, template) in self.templates.items():
+            for dep in self._template_dependencies(template):
+                dependents[dep].append(dotted)
+        return dependents
+
+    def _resolve_dependencies(self, deps: list[str], origin: str | None = None):
+        # iterative depth-first search, each node is rendered after all of its
+        # dependencies, which gives a topological order.
+        path: list[str] = [] if origin is None else [origin]
+        in_progress: dict[str, int] = {} if origin is None else {origin: 0}
+        stack: list[tuple[str | None, Iterator[str]]] = [(origin, iter(deps))]
+        while stack:
+            node, node_deps = stack[-1]
+            for dep in node_deps:
+                if dep in self.resolved:
+                    continue
+                if dep in in_progress:
+                    raise InterpolationCycleError(path[in_progress[dep] :] + [dep])
+                in_progress[dep] = len(path)
+                path.append(dep)
+                template = self.templates[dep][2]
+                stack.append((dep, iter(self._template_dependencies(template))))
+                break
+            else:
+                stack.pop()
+                if node is not None and node != origin:
+                    path.pop()
+                    del in_progress[node]
+                    self._render_value(node)
+
+    def _render_value(self, dotted: str):
+        template = self.templates[dotted][2]
+        self.set_resolved(dotted, template.render(self.root, self.execute))
+        self.order.append(dotted)
+
+    def set_resolved(self, dotted: str, value: Any):
+        """
+        Use `value` as the resolved value of the templated value at `dotted`
+        instead of rendering it.
+        """
+        container, key, _ = self.templates[dotted]
+        container[key] = value
+        if "\\" in dotted:
+            parts = split_path(dotted)
+            # values below a key holding a dot cannot be interpolated
+            if not any("." in part for part in parts):
+                self.index.set(".".join(parts), value)
+        else:
+            self.index.set(dotted, value)
+        self.resolved.add(dotted)
+
+    def resolve(self, dotted: str) -> Any:
+        """
+        Resolve the templated value at `dotted` with all its dependencies.
+        """
+        container, key, template = self.templates[dotted]
+        if dotted not in self.resolved:
+            with use_path_index(self.index):
+                self._resolve_dependencies(
+                    self._template_dependencies(template), origin=dotted
+                )
+                self._render_value(dotted)
+        return container[key]
+
+    def resolve_many(self, dotted: Iterable[str]):
+        """
+        Resolve the templated values at the dotted paths of `dotted` with all
+        their dependencies.
+        """
+        with use_path_index(self.index):
+            self._resolve_dependencies(list(dotted))
+
+    def resolve_all(self) -> Any:
+        """
+        Resolve every templated value and return the resolved copy of the data.
+        """
+        with use_path_index(self.index):
+            self._resolve_dependencies(list(self.templates))
+        return self.root
+
+    def render(self, template: Template) -> Any:
+        """
+        Render a template that is not part of the data against the resolved
+        data.
+        """
+        with use_path_index(self.index):
+            self._resolve_dependencies(self._template_dependencies(template))
+            return template.render(self.root, self.execute)
+
+    def render_many(self, templates: Iterable[Template]) -> list[Any]:
+        """
+        Render many templates that are not part of the data, like `render`. The
+        dependencies of each reference are only looked up once, for all the
+        templates.
+        """
+        rendered: list[Any] = []
+        looked_up = self._looked_up
+        with use_path_index(self.index):
+            for template in templates:
+                for reference in self.references(template):
+                    if reference not in looked_up:
+                        self._resolve_dependencies(self.dependencies(reference))
+                        looked_up.add(reference)
+                rendered.append(template.render(self.root, self.execute))
+        return rendered
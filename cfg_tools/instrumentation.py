@@ -0,0 +1,193 @@
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Literal
+
+EventKind = Literal["stage", "plugin", "cache"]
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    """
+    A measurement sent to the hooks. `name` is the stage, plugin or cache name,
+    `key` the file or plugin key (if any). Cache events have a `hit` and no
+    duration.
+    """
+
+    kind: EventKind
+    name: str
+    key: str | None = None
+    duration: float = 0.0
+    hit: bool | None = None
+
+
+Hook = Callable[[Event], None]
+
+# Checked before any measurement, so that nothing is measured without hooks.
+_hooks: list[Hook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Hook) -> Hook:
+    """
+    Call `hook(event)` for every measurement, from any thread, until it is
+    removed with `remove_hook`.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook: Hook):
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def emit(event: Event):
+    for hook in list(_hooks):
+        hook(event)
+
+
+@contextmanager
+def stage(name: str, key: str | None = None) -> Iterator[None]:
+    """
+    Measure the duration of the block. Callers on hot paths should check
+    `_hooks` first, to avoid the context manager when nothing is collected.
+    """
+    if not _hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit(Event("stage", name, key, time.perf_counter() - start))
+
+
+def record_plugin(plugin: str, key: str, start: float):
+    emit(Event("plugin", plugin, key, time.perf_counter() - start))
+
+
+def record_cache(name: str, hit: bool, key: str | None = None):
+    emit(Event("cache", name, key, hit=hit))
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class ResolutionStats:
+    """
+    Timings and call counts per stage, per plugin and per (plugin, key), and the
+    hit rates of the caches. It can be used as a hook.
+    """
+
+    stages: dict[str, Timing] = field(default_factory=dict)
+    plugins: dict[str, Timing] = field(default_factory=dict)
+    keys: dict[tuple[str, str], Timing] = field(default_factory=dict)
+    caches: dict[str, CacheStats] = field(default_factory=dict)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def __call__(self, event: Event):
+        with self._lock:
+            if event.kind == "stage":
+                self.stages.setdefault(event.name, Timing()).add(event.duration)
+            elif event.kind == "plugin":
+                self.plugins.setdefault(event.name, Timing()).add(event.duration)
+                key = (event.name, event.key or "")
+                self.keys.setdefault(key, Timing()).add(event.duration)
+            else:
+                cache = self.caches.setdefault(event.name, CacheStats())
+                if event.hit:
+                    cache.hits += 1
+                else:
+                    cache.misses += 1
+
+    def slowest_keys(self, top: int = 10) -> list[tuple[tuple[str, str], Timing]]:
+        return sorted(self.keys.items(), key=lambda item: -item[1].total)[:top]
+
+    def print_report(self, top: int = 10):
+        """
+        Print the stages, plugins and keys ranked by total time, and the caches.
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        def timings(title: str, items: list[tuple[str, Timing]]) -> Table:
+            table = Table(title=title)
+            for column in ["name", "calls", "total (ms)", "mean (ms)", "max (ms)"]:
+                table.add_column(
+                    column, justify="left" if column == "name" else "right"
+                )
+            for name, timing in sorted(items, key=lambda item: -item[1].total):
+                table.add_row(
+                    name,
+                    str(timing.count),
+                    f"{timing.total * 1e3:.3f}",
+                    f"{timing.mean * 1e3:.3f}",
+                    f"{timing.max * 1e3:.3f}",
+                )
+            return table
+
+        console = Console()
+        console.print(timings("Stages", list(self.stages.items())))
+        console.print(timings("Plugins", list(self.plugins.items())))
+        console.print(
+            timings(
+                f"Slowest keys (top {top})",
+                [(f"{plugin}:{key}", t) for (plugin, key), t in self.slowest_keys(top)],
+            )
+        )
+        caches = Table(title="Caches")
+        for column in ["cache", "hits", "misses", "hit rate"]:
+            caches.add_column(column, justify="left" if column == "cache" else "right")
+        for name, cache in sorted(self.caches.items()):
+            caches.add_row(
+                name, str(cache.hits), str(cache.misses), f"{cache.hit_rate:.1%}"
+            )
+        console.print(caches)
+
+
+@contextmanager
+def collect_stats() -> Iterator[ResolutionStats]:
+    """
+    Collect the measurements made in the block.
+    Example:
+        with collect_stats() as stats:
+            config = Config.model_validate(load_config_files(path, files)[0])
+        stats.print_report()
+    """
+    stats = ResolutionStats()
+    add_hook(stats)
+    try:
+        yield stats
+    finally:
+        remove_hook(stats)
@@ -0,0 +1,152 @@
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from cfg_tools.utils import iter_config_files, merge_layers, parse_args
+
+
+class LayeredConfig(Mapping[Any, Any]):
+    """
+    Read-only deep merge of config layers, given from the lowest to the highest
+    priority. Lookups check the layers in priority order, with the same rules as
+    `merge_dicts`: dicts are merged, any other value replaces the values of the
+    lower layers. Nothing is copied until `to_dict` is called.
+    Example:
+        config = LayeredConfig(
+            [{"a": {"b": 1, "c": 3}}, {"a": {"b": 2}}], names=["default", "cli"]
+        )
+        config["a"]["c"]  # 3
+        config.source("a.b")  # "cli"
+        config.to_dict()  # {"a": {"b": 2, "c": 3}}
+    """
+
+    def __init__(
+        self,
+        layers: Sequence[Mapping[Any, Any] | None],
+        names: Sequence[str] | None = None,
+    ):
+        if names is None:
+            names = [f"layer{k}" for k in range(len(layers))]
+        if len(names) != len(layers):
+            raise ValueError("There should be as many names as layers.")
+        self.layers: list[tuple[str, Mapping[Any, Any]]] = [
+            (name, layer)
+            for name, layer in zip(names, layers, strict=True)
+            if layer is not None
+        ]
+        self._children: dict[Any, Any] = {}
+
+    def _providers(self, key: Any) -> list[tuple[str, Any]]:
+        # layers providing the value of key, from the highest priority
+        providers: list[tuple[str, Any]] = []
+        for name, layer in reversed(self.layers):
+            if key not in layer:
+                continue
+            val = layer[key]
+            if not isinstance(val, Mapping):
+                if not providers:
+                    providers.append((name, val))
+                break
+            providers.append((name, val))
+        return providers
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self._children:
+            return self._children[key]
+        providers = self._providers(key)
+        if not providers:
+            raise KeyError(key)
+        name, val = providers[0]
+        if isinstance(val, Mapping):
+            providers.reverse()
+            val = LayeredConfig(
+                [layer for _, layer in providers], [name for name, _ in providers]
+            )
+            self._children[key] = val
+        return val
+
+    def __iter__(self) -> Iterator[Any]:
+        # same key order as merge_dicts
+        seen: dict[Any, None] = {}
+        for _, layer in self.layers:
+            seen.update(dict.fromkeys(layer))
+        return iter(seen)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        return any(key in layer for _, layer in self.layers)
+
+    def sources(self, dotted: str) -> list[str]:
+        """
+        Names of the layers providing the value at the dotted path, from the
+        highest priority. Dicts can be provided by several layers.
+        """
+        node: Any = self
+        parts = dotted.split(".")
+        for part in parts[:-1]:
+            node = node[part]
+            if not isinstance(node, LayeredConfig):
+                raise KeyError(f"{dotted} does not exist.")
+        if not isinstance(node, LayeredConfig):
+            raise KeyError(f"{dotted} does not exist.")
+        providers = node._providers(parts[-1])
+        if not providers:
+            raise KeyError(f"{dotted} does not exist.")
+        return [name for name, _ in providers]
+
+    def source(self, dotted: str) -> str:
+        """
+        Name of the layer with the highest priority providing the value at the
+        dotted path.
+        """
+        return self.sources(dotted)[0]
+
+    def with_layer(self, layer: Mapping[Any, Any], name: str) -> "LayeredConfig":
+        """
+        Returns a new config with `layer` on top of this one. The existing layers
+        are shared, so variants of a shared base are cheap to build.
+        """
+        return LayeredConfig(
+            [val for _, val in self.layers] + [layer],
+            [key for key, _ in self.layers] + [name],
+        )
+
+    def to_dict(self) -> dict[Any, Any]:
+        """
+        Merge the layers into a plain dict. Subtrees only defined in one layer are
+        shared with that layer.
+        """
+        return merge_layers(
+            [
+                layer if isinstance(layer, dict) else dict(layer)
+                for _, layer in self.layers
+            ]
+        )
+
+    def __repr__(self) -> str:
+        return f"LayeredConfig({[name for name, _ in self.layers]})"
+
+
+def load_config_layers(
+    path: str | Path,
+    load_files: list[str],
+    use_cli: bool = True,
+    argv: list[str] | None = None,
+    cache_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    use_processes: bool = False,
+) -> LayeredConfig:
+    """
+    Same as `load_config_files`, but returns the files (and the CLI arguments,
+    as the "cli" layer) as a `LayeredConfig` instead of merging them.
+    """
+    layers: list[Mapping[Any, Any] | None] = list(
+        iter_config_files(path, load_files, cache_dir, max_workers, use_processes)
+    )
+    names = list(load_files)
+    if use_cli:
+        layers.append(parse_args(argv))
+        names.append("cli")
+    return LayeredConfig(layers, names)
@@ -0,0 +1,182 @@
+from collections.abc import Collection, Iterator, Mapping, Sequence
+from typing import Any, overload
+
+from cfg_tools.graph import (
+    Execute,
+    InterpolationCycleError,
+    _join,
+    copy_tree,
+    is_template,
+    join_path,
+    split_path,
+)
+from cfg_tools.plugins.interpolation import _interpolate
+from cfg_tools.template import compile_template
+
+
+class LazyResolver:
+    """
+    Resolves the values of `data` on demand. Every resolved value is memoized
+    by its dotted path (see `join_path`), so it is only computed once.
+    """
+
+    def __init__(
+        self,
+        data: Any,
+        execute: Execute,
+        reference_plugins: Collection[str | None] = (None, "interpolate"),
+    ):
+        self.data = data
+        self.execute = execute
+        self.reference_plugins = reference_plugins
+        self.values: dict[str, Any] = {}
+        self._path: list[str] = []
+        self._in_progress: dict[str, int] = {}
+
+    def _execute(self, plugin: str | None, key: str, _) -> Any:
+        if plugin in self.reference_plugins:
+            return self.get(key)
+        return self.execute(plugin, key, self.data)
+
+    def render(self, dotted: str, raw: str) -> Any:
+        """
+        Resolve the templated value `raw` found at `dotted`.
+        """
+        if dotted in self.values:
+            return self.values[dotted]
+        if dotted in self._in_progress:
+            raise InterpolationCycleError(
+                self._path[self._in_progress[dotted] :] + [dotted]
+            )
+        self._in_progress[dotted] = len(self._path)
+        self._path.append(dotted)
+        try:
+            value = compile_template(raw).render(self.data, self._execute)
+        finally:
+            self._path.pop()
+            del self._in_progress[dotted]
+        self.values[dotted] = value
+        return value
+
+    def materialize(self, dotted: str, raw: Any) -> Any:
+        """
+        Returns a resolved copy of the subtree `raw` found at `dotted`.
+        """
+        if dotted in self.values:
+            return self.values[dotted]
+        if is_template(raw):
+            return self.render(dotted, raw)
+
+        def render(container: Any, key: Any, path):
+            full_path = f"{dotted}.{path()}" if dotted else path()
+            container[key] = self.render(full_path, container[key])
+
+        value = copy_tree(raw, render)
+        self.values[dotted] = value
+        return value
+
+    def get(self, dotted: str) -> Any:
+        """
+        Returns the resolved value at the reference `dotted`.
+        """
+        return self.get_parts(dotted.split("."), dotted)
+
+    def get_parts(self, parts: list[str], dotted: str) -> Any:
+        """
+        Returns the resolved value at the keys `parts`, named `dotted` in errors.
+        """
+        path = join_path(parts)
+        if path in self.values:
+            return self.values[path]
+
+        node = self.data
+        for idx, part in enumerate(parts[:-1]):
+            node = _interpolate([part], node, dotted)
+            if is_template(node):
+                # the rest of the path is looked up in the resolved value
+                resolved = self.render(join_path(parts[: idx + 1]), node)
+                value = _interpolate(parts[idx + 1 :], resolved, dotted)
+                self.values[path] = value
+                return value
+        return self.materialize(path, _interpolate(parts[-1:], node, dotted))
+
+
+def _view(value: Any, resolver: LazyResolver, dotted: str) -> Any:
+    if is_template(value):
+        return resolver.render(dotted, value)
+    if isinstance(value, dict):
+        return LazyConfig(value, resolver, dotted)
+    if isinstance(value, list):
+        return LazyList(value, resolver, dotted)
+    return value
+
+
+class _LazyView:
+    def __init__(self, data: Any, resolver: LazyResolver, prefix: str = ""):
+        self._data = data
+        self._resolver = resolver
+        self._prefix = prefix
+        self._children: dict[Any, Any] = {}
+
+    def _get(self, key: Any) -> Any:
+        if key in self._children:
+            return self._children[key]
+        value = _view(self._data[key], self._resolver, _join(self._prefix, key))
+        self._children[key] = value
+        return value
+
+    def resolve(self, path: str | None = None) -> Any:
+        """
+        Force the resolution of the subtree at the dotted `path` (relative to
+        this view), or of the whole view when no path is given, and return it as
+        plain dicts and lists.
+        """
+        if path is None:
+            return self._resolver.materialize(self._prefix, self._data)
+        parts = split_path(self._prefix) if self._prefix else []
+        return self._resolver.get_parts(parts + path.split("."), path)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+
+class LazyConfig(_LazyView, Mapping[Any, Any]):
+    """
+    Read-only mapping over raw config data. Templated values are only resolved
+    when they are first accessed, and then cached.
+    Example:
+        config = parse_lazy({"a": "#{b.c}", "b": {"c": 1}})
+        config["a"]  # only resolves "a" and "b.c"
+        config.resolve("b")  # {"c": 1}
+    """
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._get(key)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LazyList(_LazyView, Sequence[Any]):
+    """
+    Read-only sequence counterpart of `LazyConfig`.
+    """
+
+    @overload
+    def __getitem__(self, idx: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[Any]: ...
+
+    def __getitem__(self, idx: int | slice) -> Any:
+        if isinstance(idx, slice):
+            return [self._get(i) for i in range(*idx.indices(len(self._data)))]
+        if idx < 0:
+            idx += len(self._data)
+        return self._get(idx)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,4 +1,8 @@
 from cfg_tools.plugins.env import env_plugin
-from cfg_tools.plugins.interpolation import interpolate_plugin
+from cfg_tools.plugins.interpolation import (
+    PathIndex,
+    interpolate_plugin,
+    use_path_index,
+)
 
-__all__ = ["interpolate_plugin", "env_plugin"]
+__all__ = ["interpolate_plugin", "env_plugin", "PathIndex", "use_path_index"]
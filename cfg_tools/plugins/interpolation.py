@@ -1,11 +1,106 @@
-from collections.abc import Mapping, Sequence
+from collections.abc import Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Any
 
+_missing = object()
+
+
+class PathIndex:
+    """
+    Maps the dotted paths of `data` (e.g. "a.b.0") to their values.
+    The index is built lazily on the first lookup. Paths deeper than
+    `max_depth` are not indexed and are looked up by walking `data`.
+    """
+
+    def __init__(self, data: Any, max_depth: int = 64):
+        self.data = data
+        self.max_depth = max_depth
+        self._paths: dict[str, Any] | None = None
+
+    def _flatten(self, prefix: str, value: Any, depth: int, paths: dict[str, Any]):
+        stack = [(prefix, value, depth)]
+        while stack:
+            prefix, node, depth = stack.pop()
+            if depth >= self.max_depth:
+                continue
+            items: Iterator[tuple[Any, Any]]
+            if isinstance(node, Mapping):
+                # only str keys without dots can be interpolated in a mapping:
+                # "a.b" is the key "b" of the key "a"
+                items = (
+                    (k, v)
+                    for k, v in node.items()
+                    if isinstance(k, str) and "." not in k
+                )
+            elif isinstance(node, list):
+                items = enumerate(node)
+            else:
+                continue
+            for key, val in items:
+                path = f"{prefix}.{key}" if prefix else str(key)
+                paths[path] = val
+                if isinstance(val, Mapping | list):
+                    stack.append((path, val, depth + 1))
+
+    @property
+    def paths(self) -> dict[str, Any]:
+        if self._paths is None:
+            self._paths = {}
+            self._flatten("", self.data, 0, self._paths)
+        return self._paths
+
+    def get(self, dotlist: str) -> Any:
+        """
+        Returns the value at `dotlist`, or `_missing` when it is not indexed.
+        """
+        return self.paths.get(dotlist, _missing)
+
+    def set(self, dotlist: str, value: Any):
+        """
+        Update the index after the value at `dotlist`, which must not hold
+        any indexed children yet, was replaced by `value` in `data`.
+        """
+        if self._paths is None:
+            return
+        depth = dotlist.count(".") + 1
+        if depth > self.max_depth:
+            return
+        self._paths[dotlist] = value
+        self._flatten(dotlist, value, depth, self._paths)
+
+    def invalidate(self):
+        """
+        Drop the index. It will be rebuilt on the next lookup.
+        """
+        self._paths = None
+
+
+_path_index: ContextVar[PathIndex | None] = ContextVar("path_index", default=None)
+
+
+@contextmanager
+def use_path_index(index: PathIndex):
+    """
+    Use `index` for the interpolations of `index.data` in this context.
+    """
+    token = _path_index.set(index)
+    try:
+        yield index
+    finally:
+        _path_index.reset(token)
+
 
 def interpolate_plugin(
     dotlist: str,
     data: Any,
 ) -> Any:
+    index = _path_index.get()
+    # top-level keys are as fast to look up directly
+    if index is not None and index.data is data and "." in dotlist:
+        value = index.get(dotlist)
+        if value is not _missing:
+            return value
     return _interpolate(dotlist.split("."), data, dotlist)
 
 
@@ -17,17 +112,15 @@ def _interpolate(
     if len(dotlist) == 0:
         raise KeyError(f"{full_key} cannot be interpolated because does not exist.")
 
-    key = dotlist[0]
-    if isinstance(data, list) and not dotlist[0].isdigit():
-        raise KeyError(f"{dotlist[0]} should be an int when data is a sequence")
-
-    if len(dotlist) == 1 and isinstance(data, Mapping):
-        return data[key]
-    elif len(dotlist) == 1 and isinstance(data, Sequence):
-        return data[int(key)]
+    last = len(dotlist) - 1
+    for idx, key in enumerate(dotlist):
+        if isinstance(data, list) and not key.isdigit():
+            raise KeyError(f"{key} should be an int when data is a sequence")
 
-    elif isinstance(data, Mapping):
-        return _interpolate(dotlist[1:], data[key], full_key)
-    elif isinstance(data, list):
-        return _interpolate(dotlist[1:], data[int(key)], full_key)
-    raise ValueError("Provided data cannot be interpolated")
+        if isinstance(data, Mapping):
+            data = data[key]
+        elif idx == last and isinstance(data, Sequence) or isinstance(data, list):
+            data = data[int(key)]
+        else:
+            raise ValueError("Provided data cannot be interpolated")
+    return data
@@ -0,0 +1,285 @@
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from cfg_tools.data_parser import current_resolver, validate_interpolated
+from cfg_tools.graph import DependencyGraph, _join, _key, join_path, split_path
+from cfg_tools.utils import load_yaml_file, merge_layers, parse_args
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+def _related(path: str, other: str) -> bool:
+    """
+    Whether one of the dotted paths is equal to or contains the other.
+    """
+    return (
+        not path
+        or not other
+        or path == other
+        or other.startswith(path + ".")
+        or path.startswith(other + ".")
+    )
+
+
+@dataclass
+class ConfigDiff:
+    """
+    Dotted paths that were added, removed or changed between two configs.
+    """
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+
+    @property
+    def paths(self) -> list[str]:
+        return sorted(self.added + self.removed + self.changed)
+
+    def affects(self, path: str) -> bool:
+        """
+        Whether the value at the dotted `path` (or anything below it) changed.
+        An empty path matches any change.
+        """
+        return any(_related(path, other) for other in self.paths)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_trees(old: Any, new: Any) -> ConfigDiff:
+    """
+    Compare two configs made of dicts and lists. Subtrees that are the same
+    object are not visited.
+    """
+    diff = ConfigDiff()
+    stack: list[tuple[str, Any, Any]] = [("", old, new)]
+    while stack:
+        prefix, a, b = stack.pop()
+        if a is b:
+            continue
+        if isinstance(a, dict) and isinstance(b, dict):
+            diff.removed.extend(_join(prefix, k) for k in a if k not in b)
+            for k, val in b.items():
+                if k not in a:
+                    diff.added.append(_join(prefix, k))
+                else:
+                    stack.append((_join(prefix, k), a[k], val))
+        elif isinstance(a, list) and isinstance(b, list):
+            for idx in range(len(b), len(a)):
+                diff.removed.append(_join(prefix, idx))
+            for idx in range(len(a), len(b)):
+                diff.added.append(_join(prefix, idx))
+            for idx in range(min(len(a), len(b))):
+                stack.append((_join(prefix, idx), a[idx], b[idx]))
+        elif type(a) is not type(b) or a != b:
+            diff.changed.append(prefix)
+    diff.added.sort()
+    diff.removed.sort()
+    diff.changed.sort()
+    return diff
+
+
+def _touched(dotted: str, touched: list[str]) -> bool:
+    if touched and touched[0] == "":
+        # the root changed
+        return True
+    # touched is sorted, so the paths below `dotted` are contiguous
+    idx = bisect_left(touched, dotted)
+    if idx < len(touched) and (
+        touched[idx] == dotted or touched[idx].startswith(dotted + ".")
+    ):
+        return True
+    parts = split_path(dotted)
+    for end in range(1, len(parts)):
+        ancestor = join_path(parts[:end])
+        idx = bisect_left(touched, ancestor)
+        if idx < len(touched) and touched[idx] == ancestor:
+            return True
+    return False
+
+
+def _get_path(data: Any, dotted: str) -> Any:
+    # the keys of `data` can be ints, unlike the parts of `dotted`
+    for part in split_path(dotted):
+        data = data[_key(data, part)]
+    return data
+
+
+def resolve_incremental(
+    raw: Any, previous: Any, touched: list[str]
+) -> tuple[Any, set[str]]:
+    """
+    Resolve the templates of `raw`, reusing the values of `previous` (the
+    resolved config of a former version of `raw`) for the templates that do not
+    depend, even indirectly, on the sorted dotted paths of `touched`.
+    Returns the resolved config and the templates that were rendered again.
+    """
+    graph = DependencyGraph(raw, current_resolver()._execute_template_call, copy=False)
+    dependents = graph.dependents()
+    affected: set[str] = set()
+    for dotted, (_, _, template) in graph.templates.items():
+        if _touched(dotted, touched) or any(
+            _touched(join_path(reference.split(".")), touched)
+            for reference in graph.references(template)
+        ):
+            affected.add(dotted)
+
+    stack = list(affected)
+    while stack:
+        for dependent in dependents[stack.pop()]:
+            if dependent not in affected:
+                affected.add(dependent)
+                stack.append(dependent)
+
+    for dotted in graph.templates:
+        if dotted not in affected:
+            graph.set_resolved(dotted, _get_path(previous, dotted))
+    return graph.resolve_all(), affected
+
+
+Callback = Callable[[ConfigDiff, Any], None]
+
+
+class ConfigReloader(Generic[Model]):
+    """
+    Keeps a config loaded from `load_files` (relative to `path`) up to date.
+    `poll` checks the modification times of the files, only reads again the ones
+    that changed, re-renders the templates that depend on the changed values
+    and validates the config with `model` (if given).
+    Example:
+        reloader = ConfigReloader("config", ["default.yaml", "local.yaml"], Config)
+        reloader.subscribe("training.lr", lambda diff, config: print(config))
+        reloader.start(interval=1.0)
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        load_files: list[str],
+        model: type[Model] | None = None,
+        use_cli: bool = True,
+        argv: list[str] | None = None,
+        cache_dir: str | Path | None = None,
+    ):
+        config_path = Path(path)
+        if not config_path.is_dir():
+            raise FileNotFoundError(f"Config path {config_path} does not exist.")
+        self.files = [config_path / file for file in load_files]
+        self.model = model
+        self.cache_dir = cache_dir
+        self.cli_config: dict[str, Any] = parse_args(argv) if use_cli else {}
+
+        self._stats: dict[Path, tuple[int, int]] = {}
+        self._layers: dict[Path, Any] = {}
+        self._subscribers: list[tuple[str, Callback]] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+        layers, stats = self._read_changed_files()
+        self._layers.update(layers)
+        self._stats.update(stats)
+        self.raw = self._merged()
+        self.resolved, _ = resolve_incremental(self.raw, None, [""])
+        self.config: Model | dict[str, Any] = self._validate(self.resolved)
+
+    def _read_changed_files(
+        self,
+    ) -> tuple[dict[Path, Any], dict[Path, tuple[int, int]]]:
+        layers: dict[Path, Any] = {}
+        stats: dict[Path, tuple[int, int]] = {}
+        for path_file in self.files:
+            if not path_file.is_file():
+                raise FileNotFoundError(f"Config file {path_file} does not exist.")
+            stat = path_file.stat()
+            key = (stat.st_mtime_ns, stat.st_size)
+            if self._stats.get(path_file) != key:
+                layers[path_file] = load_yaml_file(path_file, self.cache_dir)
+                stats[path_file] = key
+        return layers, stats
+
+    def _merged(self, layers: dict[Path, Any] | None = None) -> dict[str, Any]:
+        layers = self._layers if layers is None else {**self._layers, **layers}
+        return merge_layers(
+            [layers[path_file] for path_file in self.files] + [self.cli_config]
+        )
+
+    def _validate(self, resolved: dict[str, Any]) -> Model | dict[str, Any]:
+        if self.model is None:
+            return resolved
+        return validate_interpolated(self.model, resolved)
+
+    def subscribe(self, path: str, callback: Callback) -> Callback:
+        """
+        Call `callback(diff, config)` after a reload changing the value at the
+        dotted `path` or below it. An empty path subscribes to every change.
+        """
+        self._subscribers.append((path, callback))
+        return callback
+
+    def unsubscribe(self, callback: Callback):
+        self._subscribers = [
+            (path, cb) for path, cb in self._subscribers if cb is not callback
+        ]
+
+    def poll(self) -> ConfigDiff | None:
+        """
+        Reload the files that changed since the last poll. Returns the diff of
+        the resolved config, or None if no file changed.
+        """
+        with self._lock:
+            layers, stats = self._read_changed_files()
+            if not layers:
+                return None
+            raw = self._merged(layers)
+            touched = diff_trees(self.raw, raw).paths
+            resolved, _ = resolve_incremental(raw, self.resolved, touched)
+            diff = diff_trees(self.resolved, resolved)
+            config = self._validate(resolved)
+            # only keep the new files once the config is valid, so that a
+            # failed reload is attempted again at the next poll
+            self._layers.update(layers)
+            self._stats.update(stats)
+            self.raw, self.resolved, self.config = raw, resolved, config
+
+        for path, callback in self._subscribers:
+            if diff.affects(path):
+                callback(diff, config)
+        return diff
+
+    def start(
+        self,
+        interval: float = 1.0,
+        on_error: Callable[[Exception], None] | None = None,
+    ):
+        """
+        Poll the files every `interval` seconds in a background thread.
+        Errors raised while reloading (e.g. an invalid file) are passed to
+        `on_error` and the previous config is kept.
+        """
+        if self._thread is not None:
+            raise RuntimeError("reloader already started")
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+
+        self._thread = threading.Thread(target=watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
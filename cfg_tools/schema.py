@@ -0,0 +1,203 @@
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Annotated, Any, get_args, get_origin
+
+from pydantic import AliasChoices, AliasPath, BaseModel
+from pydantic.fields import FieldInfo
+
+from cfg_tools.graph import _dotted, _lookup, is_template, join_path, split_path
+from cfg_tools.template import PluginCall, compile_template
+
+
+@dataclass
+class ModelPlan:
+    """
+    Where the templated values of a model's data can be: `fields` maps the keys
+    of the data to the plan of their value (None to skip the value, SCAN to
+    visit all of it), and `extra` is the plan of the keys that are not fields.
+    """
+
+    fields: dict[str, "Plan"] = field(default_factory=dict)
+    extra: "Plan" = None
+
+    @property
+    def scans_all(self) -> bool:
+        return self.extra is SCAN and all(plan is SCAN for plan in self.fields.values())
+
+
+class _Scan:
+    def __repr__(self) -> str:
+        return "SCAN"
+
+
+SCAN = _Scan()
+Plan = ModelPlan | _Scan | None
+
+
+def _model_type(annotation: Any) -> type[BaseModel] | None:
+    if get_origin(annotation) is Annotated:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def _field_keys(name: str, info: FieldInfo) -> set[str]:
+    """
+    Keys of the data that can hold the value of a field: its name and the
+    first key of each of its aliases.
+    """
+    keys = {name}
+    for alias in (info.alias, info.validation_alias):
+        choices = alias.choices if isinstance(alias, AliasChoices) else [alias]
+        for choice in choices:
+            key = choice.path[0] if isinstance(choice, AliasPath) else choice
+            if isinstance(key, str):
+                keys.add(key)
+    return keys
+
+
+def _rewrites_data(model: type[BaseModel]) -> bool:
+    """
+    Whether `model` has before or wrap validators (other than the one of
+    `ParsedModel`), that can move values to other keys before validation.
+    """
+    validators = model.__pydantic_decorators__.model_validators.values()
+    return any(
+        validator.info.mode in ("before", "wrap")
+        and validator.cls_var_name != "interpolate_variables"
+        for validator in validators
+    )
+
+
+@cache
+def interpolation_plan(model: type[BaseModel]) -> ModelPlan:
+    """
+    Plan of the data of `model`, computed once per class. Extra keys are only
+    visited if the model keeps them. Values of the other fields are always
+    visited, even numeric ones in strict mode: a template that is the whole
+    string (e.g. "#{a}") resolves to the referenced value, not to a string.
+    All the data is visited if a model validator can rewrite it.
+    """
+    if _rewrites_data(model):
+        return ModelPlan(extra=SCAN)
+    plan = ModelPlan()
+    # a recursive model refers to its own plan, that is being filled
+    _in_progress[model] = plan
+    try:
+        for name, info in model.model_fields.items():
+            sub_model = _model_type(info.annotation)
+            if sub_model is not None:
+                field_plan: Plan = _in_progress.get(sub_model) or interpolation_plan(
+                    sub_model
+                )
+            else:
+                field_plan = SCAN
+            for key in _field_keys(name, info):
+                plan.fields[key] = field_plan
+        if model.model_config.get("extra") == "allow":
+            plan.extra = SCAN
+    finally:
+        del _in_progress[model]
+    return plan
+
+
+_in_progress: dict[type[BaseModel], ModelPlan] = {}
+
+
+def templated_paths(data: Any, plan: Plan) -> list[str]:
+    """
+    Dotted paths of the templated values of `data` found where `plan` says
+    they can be.
+    """
+    if plan is None:
+        return []
+    if is_template(data):
+        return [""]
+    paths: list[str] = []
+    # like in copy_tree, dotted paths are only built for templated values
+    frames: list[tuple[Any, int, str]] = [(data, 0, "")]
+    stack: list[tuple[Any, Plan, int]] = [(data, plan, 0)]
+    while stack:
+        node, node_plan, frame_idx = stack.pop()
+        if isinstance(node, dict):
+            items: Any = node.items()
+        elif node_plan is SCAN and isinstance(node, list):
+            items = enumerate(node)
+        else:
+            continue
+        model_plan = node_plan if isinstance(node_plan, ModelPlan) else None
+        for key, val in items:
+            val_plan = node_plan
+            if model_plan is not None:
+                val_plan = model_plan.fields.get(key, model_plan.extra)
+                if val_plan is None:
+                    continue
+            if isinstance(val, dict | list):
+                frames.append((val, frame_idx, str(key)))
+                stack.append((val, val_plan, len(frames) - 1))
+            elif is_template(val):
+                paths.append(_dotted(frames, frame_idx, str(key)))
+    return paths
+
+
+def _unvisited_prefix(plan: Plan, parts: list[str]) -> int | None:
+    # length of the prefix of `parts` leading to a value that is not visited
+    # with `plan`, or None if the whole value is visited
+    node_plan = plan
+    for idx, part in enumerate(parts):
+        if node_plan is None:
+            return idx
+        if isinstance(node_plan, _Scan):
+            return None
+        node_plan = node_plan.fields.get(part, node_plan.extra)
+    if node_plan is None or (
+        isinstance(node_plan, ModelPlan) and not node_plan.scans_all
+    ):
+        return len(parts)
+    return None
+
+
+def _references(data: Any, dotted: str) -> Iterator[str]:
+    node = data
+    for part in split_path(dotted) if dotted else []:
+        _, node = _lookup(node, part)
+    for call in compile_template(node).segments:
+        if isinstance(call, PluginCall) and call.plugin in (None, "interpolate"):
+            yield call.key
+
+
+def with_referenced_paths(data: Any, plan: Plan, paths: list[str]) -> list[str]:
+    """
+    Add to the templated `paths` found with `templated_paths` the templated
+    values of the parts of `data` that were not visited but are referenced by
+    them, even indirectly.
+    """
+    found = dict.fromkeys(paths)
+    scanned: set[str] = set()
+    stack = list(paths)
+    while stack:
+        for reference in _references(data, stack.pop()):
+            parts = reference.split(".")
+            end = _unvisited_prefix(plan, parts)
+            if end is None:
+                continue
+            # scan the deepest existing value on the way to the reference
+            node, prefix = data, []
+            for part in parts[:end]:
+                exists, child = _lookup(node, part)
+                if not exists or is_template(node):
+                    break
+                node = child
+                prefix.append(part)
+            region = join_path(prefix)
+            if region in scanned:
+                continue
+            scanned.add(region)
+            for path in templated_paths(node, SCAN):
+                dotted = ".".join(part for part in (region, path) if part)
+                if dotted not in found:
+                    found[dotted] = None
+                    stack.append(dotted)
+    return list(found)
@@ -0,0 +1,432 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, overload
+
+if TYPE_CHECKING:
+    from multiprocessing.shared_memory import SharedMemory
+
+# Layout of the buffer: the header, then the encoded values. A value starts with
+# a one byte tag. Containers store the offsets of their items, and are written
+# after them, so that any value can be read without decoding the rest. Dicts
+# store the offsets of their keys and values in order, then the positions of
+# their items sorted by the encoded key, so that a key is found by a binary
+# search in the buffer.
+_MAGIC = b"CFGS"
+_VERSION = 2
+_header = struct.Struct("<4sBQ")  # magic, version, offset of the root
+_tag = struct.Struct("<c")
+_int = struct.Struct("<q")
+_float = struct.Struct("<d")
+_size = struct.Struct("<Q")
+
+_NONE, _TRUE, _FALSE = b"N", b"T", b"F"
+_INT, _FLOAT, _STR, _PICKLE = b"I", b"D", b"S", b"P"
+_DICT, _LIST = b"M", b"L"
+
+
+def _encode_scalar(buffer: bytearray, value: Any):
+    if value is None:
+        buffer += _NONE
+    elif value is True:
+        buffer += _TRUE
+    elif value is False:
+        buffer += _FALSE
+    elif type(value) is int and -(2**63) <= value < 2**63:
+        buffer += _INT + _int.pack(value)
+    elif type(value) is float:
+        buffer += _FLOAT + _float.pack(value)
+    elif type(value) is str:
+        data = value.encode()
+        buffer += _STR + _size.pack(len(data)) + data
+    else:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        buffer += _PICKLE + _size.pack(len(data)) + data
+
+
+def encode(data: Any) -> bytes:
+    """
+    Encode a tree of dicts, lists and scalars. Other values are pickled.
+    Subtrees shared in `data` are only written once.
+    """
+    buffer = bytearray(_header.size)
+    offsets: dict[int, int] = {}
+    # post-order traversal: a container is written once all its items are
+    stack: list[tuple[Any, bool]] = [(data, False)]
+    while stack:
+        node, children_done = stack.pop()
+        is_container = type(node) is dict or type(node) is list
+        if is_container and id(node) in offsets:
+            continue
+        if is_container and not children_done:
+            stack.append((node, True))
+            values = node.values() if type(node) is dict else node
+            stack.extend((val, False) for val in values)
+            continue
+
+        if type(node) is dict:
+            items: list[int] = []
+            keys: list[bytes] = []
+            for key, val in node.items():
+                start = len(buffer)
+                _encode_scalar(buffer, key)
+                keys.append(bytes(buffer[start:]))
+                items.append(start)
+                items.append(_offset(buffer, offsets, val))
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            offset = len(buffer)
+            buffer += _DICT + _size.pack(len(node))
+            buffer += struct.pack(f"<{len(items)}Q", *items)
+            buffer += struct.pack(f"<{len(order)}Q", *order)
+        elif type(node) is list:
+            items = [_offset(buffer, offsets, val) for val in node]
+            offset = len(buffer)
+            buffer += _LIST + _size.pack(len(node))
+            buffer += struct.pack(f"<{len(items)}Q", *items)
+        else:
+            continue
+        offsets[id(node)] = offset
+
+    root = _offset(buffer, offsets, data)
+    _header.pack_into(buffer, 0, _MAGIC, _VERSION, root)
+    return bytes(buffer)
+
+
+def _offset(buffer: bytearray, offsets: dict[int, int], value: Any) -> int:
+    if type(value) is dict or type(value) is list:
+        return offsets[id(value)]
+    offset = len(buffer)
+    _encode_scalar(buffer, value)
+    return offset
+
+
+def _buffer(shm: "SharedMemory") -> memoryview:
+    if shm.buf is None:
+        raise ValueError(f"shared memory {shm.name} is closed")
+    return shm.buf
+
+
+def _open_shared_memory(name: str) -> tuple[memoryview, Any]:
+    """
+    Map the shared memory block `name`, without registering it to the resource
+    tracker, that would destroy it when this process exits.
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    if sys.version_info >= (3, 13):
+        shm = SharedMemory(name=name, track=False)
+    else:
+        shm = SharedMemory(name=name)
+        if os.name != "nt":
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(f"/{shm.name}", "shared_memory")
+    return _buffer(shm), shm
+
+
+class SharedConfig:
+    """
+    Read-only config stored in shared memory (or in a memory-mapped file with
+    `path`), that any process can attach to. Values are only decoded when they
+    are accessed, so workers do not copy the config into their own memory.
+    Pickling a `SharedConfig` or one of its views only sends the name of the
+    buffer, so they can be given to the workers of a pool.
+    Example:
+        with SharedConfig.publish(parse_dict(config, config)) as shared:
+            with Pool(64) as pool:
+                pool.map(train, [shared.root] * 64)
+    """
+
+    def __init__(
+        self,
+        buffer: memoryview,
+        name: str | None = None,
+        path: str | None = None,
+        handle: Any = None,
+        owner: bool = False,
+    ):
+        magic, version, root = _header.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("not a shared config buffer")
+        self.buffer = buffer
+        self.name = name
+        self.path = path
+        self._root = root
+        self._root_view: Any = None
+        self._handle = handle
+        self._owner = owner
+
+    @classmethod
+    def publish(cls, data: Any, path: str | Path | None = None) -> "SharedConfig":
+        """
+        Copy `data` (e.g. the output of `parse_dict` or `model_dump`) into a new
+        shared memory block, or into the file at `path`. Call `unlink` (or use
+        the config as a context manager) once the workers are done.
+        """
+        encoded = encode(data)
+        if path is not None:
+            path = Path(path)
+            tmp_file = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_bytes(encoded)
+            os.replace(tmp_file, path)
+            return cls.attach(path=path, owner=True)
+        from multiprocessing.shared_memory import SharedMemory
+
+        shm = SharedMemory(create=True, size=len(encoded))
+        buffer = _buffer(shm)
+        buffer[: len(encoded)] = encoded
+        return cls(buffer, name=shm.name, handle=shm, owner=True)
+
+    @classmethod
+    def attach(
+        cls,
+        name: str | None = None,
+        path: str | Path | None = None,
+        owner: bool = False,
+    ) -> "SharedConfig":
+        """
+        Attach to the shared memory block `name` or to the file at `path`.
+        """
+        if path is not None:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(memoryview(mapped), path=str(path), handle=mapped, owner=owner)
+        if name is None:
+            raise ValueError("give the name or the path of the shared config")
+        buffer, handle = _open_shared_memory(name)
+        return cls(buffer, name=name, handle=handle, owner=owner)
+
+    @property
+    def root(self) -> Any:
+        if self._root_view is None:
+            self._root_view = self.value(self._root)
+        return self._root_view
+
+    def value(self, offset: int) -> Any:
+        """
+        Value at `offset`: a view for dicts and lists, the value otherwise.
+        """
+        (tag,) = _tag.unpack_from(self.buffer, offset)
+        if tag == _DICT:
+            return SharedMapping(self, offset)
+        if tag == _LIST:
+            return SharedList(self, offset)
+        return self._scalar(tag, offset + 1)
+
+    def _scalar(self, tag: bytes, offset: int) -> Any:
+        if tag == _INT:
+            return _int.unpack_from(self.buffer, offset)[0]
+        if tag == _FLOAT:
+            return _float.unpack_from(self.buffer, offset)[0]
+        if tag in (_STR, _PICKLE):
+            (size,) = _size.unpack_from(self.buffer, offset)
+            data = self.buffer[offset + 8 : offset + 8 + size]
+            return str(data, "utf-8") if tag == _STR else pickle.loads(data)
+        if tag == _NONE:
+            return None
+        return tag == _TRUE
+
+    def _length(self, offset: int) -> int:
+        return _size.unpack_from(self.buffer, offset + 1)[0]
+
+    def _item(self, offset: int, idx: int) -> int:
+        # idx-th offset stored by the container at `offset`
+        return _size.unpack_from(self.buffer, offset + 9 + 8 * idx)[0]
+
+    def _items(self, offset: int, count: int) -> tuple[int, ...]:
+        return struct.unpack_from(f"<{count}Q", self.buffer, offset + 9)
+
+    def _find(self, offset: int, size: int, key: Any) -> int | None:
+        """
+        Offset of the value of `key` in the dict at `offset`, found by a binary
+        search on the encoded keys, or None if the dict does not have it.
+        """
+        probe = bytearray()
+        _encode_scalar(probe, key)
+        buffer = self.buffer
+        end = len(probe)
+        low, high = 0, size
+        while low < high:
+            mid = (low + high) // 2
+            idx = self._item(offset, 2 * size + mid)
+            key_offset = self._item(offset, 2 * idx)
+            # encodings are self-delimiting, so a stored key differs from the
+            # probe within its first `end` bytes unless it is the same key
+            stored = buffer[key_offset : key_offset + end]
+            if stored == probe:
+                return self._item(offset, 2 * idx + 1)
+            if bytes(stored) < probe:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.root[key]
+
+    def close(self):
+        """
+        Detach from the buffer. Views can no longer be read.
+        """
+        self.buffer.release()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def unlink(self):
+        """
+        Close and destroy the buffer, once no worker needs it.
+        """
+        from multiprocessing.shared_memory import SharedMemory
+
+        if isinstance(self._handle, SharedMemory):
+            self._handle.unlink()
+        self.close()
+        if self.path is not None:
+            Path(self.path).unlink(missing_ok=True)
+
+    def __enter__(self) -> "SharedConfig":
+        return self
+
+    def __exit__(self, *_):
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+    def __reduce__(self):
+        return SharedConfig.attach, (self.name, self.path)
+
+
+# attached buffers of each process, so that the views sent to a worker share
+# one attachment
+_attached: dict[tuple[str | None, str | None], SharedConfig] = {}
+
+
+def _attach_view(name: str | None, path: str | None, offset: int) -> Any:
+    key = (name, path)
+    if key not in _attached:
+        _attached[key] = SharedConfig.attach(name, path)
+    return _attached[key].value(offset)
+
+
+def _materialize(value: Any) -> Any:
+    # copies the views with an explicit stack, for trees of any depth
+    if not isinstance(value, SharedMapping | SharedList):
+        return value
+    root = value._empty()
+    stack: list[tuple[SharedMapping | SharedList, Any]] = [(value, root)]
+    while stack:
+        view, copy = stack.pop()
+        for key, val in view._children():
+            if isinstance(val, SharedMapping | SharedList):
+                child = val._empty()
+                stack.append((val, child))
+                val = child
+            copy[key] = val
+    return root
+
+
+class _SharedView:
+    def __init__(self, config: SharedConfig, offset: int):
+        self._config = config
+        self._offset = offset
+        self._len = config._length(offset)
+
+    def __reduce__(self):
+        config = self._config
+        return _attach_view, (config.name, config.path, self._offset)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({_materialize(self)!r})"
+
+
+class SharedMapping(_SharedView, Mapping[Any, Any]):
+    """
+    Read-only mapping over a dict of a `SharedConfig`. Keys are looked up by
+    their encoding, so `1.0` or `True` do not find the key `1`.
+    """
+
+    def __getitem__(self, key: Any) -> Any:
+        offset = self._config._find(self._offset, self._len, key)
+        if offset is None:
+            raise KeyError(key)
+        return self._config.value(offset)
+
+    def __iter__(self) -> Iterator[Any]:
+        offsets = self._config._items(self._offset, 2 * self._len)
+        value = self._config.value
+        return (value(offsets[idx]) for idx in range(0, len(offsets), 2))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _empty(self) -> dict[Any, Any]:
+        return {}
+
+    def _children(self) -> Iterator[tuple[Any, Any]]:
+        offsets = self._config._items(self._offset, 2 * self._len)
+        value = self._config.value
+        return (
+            (value(offsets[idx]), value(offsets[idx + 1]))
+            for idx in range(0, len(offsets), 2)
+        )
+
+    def to_dict(self) -> dict[Any, Any]:
+        """
+        Copy of the dict in the memory of this process.
+        """
+        return _materialize(self)
+
+
+class SharedList(_SharedView, Sequence[Any]):
+    """
+    Read-only sequence over a list of a `SharedConfig`.
+    """
+
+    @overload
+    def __getitem__(self, idx: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[Any]: ...
+
+    def __getitem__(self, idx: int | slice) -> Any:
+        config = self._config
+        if isinstance(idx, slice):
+            return [
+                config.value(config._item(self._offset, pos))
+                for pos in range(self._len)[idx]
+            ]
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("list index out of range")
+        return config.value(config._item(self._offset, idx))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            val == other_val for val, other_val in zip(self, other, strict=True)
+        )
+
+    def _empty(self) -> list[Any]:
+        return [None] * len(self)
+
+    def _children(self) -> Iterator[tuple[Any, Any]]:
+        value = self._config.value
+        offsets = self._config._items(self._offset, self._len)
+        return enumerate(value(offset) for offset in offsets)
+
+    def to_list(self) -> list[Any]:
+        """
+        Copy of the list in the memory of this process.
+        """
+        return _materialize(self)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from cfg_tools.data_parser import registered_plugins
+from cfg_tools.instrumentation import Event, add_hook, remove_hook
+from cfg_tools.utils import load_config_files, parse_args, validate_and_fill_missing
+
+Model = TypeVar("Model", bound=BaseModel)
+
+SNAPSHOT_FORMAT = 1
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _qualname(obj: Any) -> str:
+    return f"{getattr(obj, '__module__', '')}:{getattr(obj, '__qualname__', obj)}"
+
+
+def fingerprint(
+    path: str | Path,
+    load_files: list[str],
+    cli_config: dict[str, Any],
+    model: type[BaseModel],
+) -> str:
+    """
+    Hash of everything the resolved config depends on, except the environment:
+    the content of the files, the CLI overrides, the registered plugins and the
+    model class.
+    """
+    config_path = Path(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{SNAPSHOT_FORMAT}:{sys.version_info[:2]}:{_qualname(model)}".encode())
+    for file in load_files:
+        h.update(file.encode())
+        h.update(_digest((config_path / file).read_bytes()).encode())
+    h.update(json.dumps(cli_config, sort_keys=True).encode())
+    for name, plugin in sorted(registered_plugins().items()):
+        h.update(f"{name}={_qualname(plugin.func)},{_qualname(plugin.batch)}".encode())
+    return h.hexdigest()
+
+
+def _env_digest(name: str) -> str | None:
+    # digests of the values, to never write secrets in the snapshot
+    value = os.environ.get(name)
+    return None if value is None else _digest(value.encode())
+
+
+@contextmanager
+def _record_env_reads() -> Iterator[set[str]]:
+    """
+    Names of the environment variables read by the `env` plugin in the block.
+    """
+    names: set[str] = set()
+
+    def hook(event: Event):
+        if event.name == "env" and event.kind in ("plugin", "cache") and event.key:
+            names.add(event.key.partition(",")[0])
+
+    add_hook(hook)
+    try:
+        yield names
+    finally:
+        remove_hook(hook)
+
+
+def save_snapshot(
+    snapshot_file: str | Path, config: BaseModel, fingerprint: str, env: set[str]
+):
+    """
+    Write the validated `config` to `snapshot_file`, with its `fingerprint` and
+    the environment variables it was resolved with.
+    """
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "fingerprint": fingerprint,
+        "env": {name: _env_digest(name) for name in sorted(env)},
+        "config": config,
+    }
+    snapshot_path = Path(snapshot_file)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    # write then rename so that concurrent processes never read a partial file
+    tmp_file = snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, snapshot_path)
+
+
+def load_snapshot(snapshot_file: str | Path, fingerprint: str) -> Any:
+    """
+    Returns the config of `snapshot_file` if it matches `fingerprint` and the
+    current environment, None otherwise.
+    """
+    try:
+        with open(snapshot_file, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("format") != SNAPSHOT_FORMAT
+        or snapshot.get("fingerprint") != fingerprint
+    ):
+        return None
+    for name, digest in snapshot["env"].items():
+        if _env_digest(name) != digest:
+            return None
+    return snapshot["config"]
+
+
+def load_config_snapshot(
+    path: str | Path,
+    load_files: list[str],
+    model: type[Model],
+    snapshot_file: str | Path,
+    use_cli: bool = True,
+    argv: list[str] | None = None,
+    cache_dir: str | Path | None = None,
+    fill_missing_file: str | None = None,
+) -> Model:
+    """
+    Returns the validated config of `load_files` (relative to `path`) and the
+    CLI arguments, from `snapshot_file` if it was saved with the same inputs.
+    Otherwise, the config is loaded, validated with `model` (a `ParsedModel` to
+    resolve the templates) and saved to `snapshot_file`. With
+    `fill_missing_file`, missing values are asked for and can be saved in this
+    file, like with `validate_and_fill_missing`.
+    Snapshots are pickles: only use snapshot files that you trust.
+    """
+    cli_config = parse_args(argv) if use_cli else {}
+    key = fingerprint(path, load_files, cli_config, model)
+    config = load_snapshot(snapshot_file, key)
+    if isinstance(config, model):
+        return config
+
+    with _record_env_reads() as env:
+        config_dict, _ = load_config_files(
+            path, load_files, use_cli=use_cli, argv=argv, cache_dir=cache_dir
+        )
+        if fill_missing_file is None:
+            config = model.model_validate(config_dict)
+        else:
+            config = validate_and_fill_missing(
+                config_dict, model, Path(path), fill_missing_file
+            )
+            # the missing values may have been saved in one of the files
+            key = fingerprint(path, load_files, cli_config, model)
+    save_snapshot(snapshot_file, config, key, env)
+    return config
@@ -0,0 +1,226 @@
+from collections.abc import Collection, Iterator
+from pathlib import Path
+from typing import Any
+
+import yaml
+from pydantic import BaseModel
+from yaml.events import (
+    AliasEvent,
+    CollectionEndEvent,
+    CollectionStartEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+from cfg_tools.instrumentation import stage
+from cfg_tools.schema import interpolation_plan
+from cfg_tools.utils import merge_dicts
+
+# libyaml's C loader is much faster than the pure python one.
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def model_sections(model: type[BaseModel]) -> set[str] | None:
+    """
+    Top-level keys used by `model`, or None if it keeps extra keys.
+    """
+    plan = interpolation_plan(model)
+    if plan.extra is not None:
+        return None
+    return set(plan.fields)
+
+
+def _compose(loader: Any, anchors: dict[str, Node], event: Any = None) -> Node:
+    """
+    Compose the node starting at `event` (by default, the next event), like
+    yaml's Composer but without recursion.
+    """
+    # open collections, with the pending key of mappings
+    stack: list[tuple[Node, list[Node]]] = []
+    resolve = loader.resolve
+    while True:
+        if event is None:
+            event = loader.get_event()
+        kind = type(event)
+        if kind is ScalarEvent:
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(
+                tag, event.value, event.start_mark, event.end_mark, style=event.style
+            )
+            if event.anchor is not None:
+                anchors[event.anchor] = node
+        elif kind is SequenceStartEvent or kind is MappingStartEvent:
+            node_cls = SequenceNode if kind is SequenceStartEvent else MappingNode
+            tag = event.tag
+            if tag is None or tag == "!":
+                tag = resolve(node_cls, None, event.implicit)
+            collection = node_cls(
+                tag, [], event.start_mark, None, flow_style=event.flow_style
+            )
+            if event.anchor is not None:
+                anchors[event.anchor] = collection
+            stack.append((collection, []))
+            event = None
+            continue
+        elif kind is SequenceEndEvent or kind is MappingEndEvent:
+            node = stack.pop()[0]
+            node.end_mark = event.end_mark
+        elif kind is AliasEvent:
+            if event.anchor not in anchors:
+                raise yaml.composer.ComposerError(
+                    None,
+                    None,
+                    f"found undefined alias {event.anchor}",
+                    event.start_mark,
+                )
+            node = anchors[event.anchor]
+        else:
+            raise yaml.composer.ComposerError(
+                None, None, f"unexpected event {event}", event.start_mark
+            )
+
+        event = None
+        if not stack:
+            return node
+        parent, pending = stack[-1]
+        if type(parent) is SequenceNode:
+            parent.value.append(node)
+        elif pending:
+            parent.value.append((pending.pop(), node))
+        else:
+            pending.append(node)
+
+
+def _skip(loader: Any, anchors: dict[str, Node]):
+    """
+    Skip the node starting at the next event without building it, except for
+    the anchored nodes that later values could refer to.
+    """
+    depth = 0
+    while True:
+        event = loader.get_event()
+        if isinstance(event, CollectionEndEvent):
+            depth -= 1
+        elif isinstance(event, AliasEvent):
+            pass
+        elif event.anchor is not None:
+            _compose(loader, anchors, event)
+        elif isinstance(event, CollectionStartEvent):
+            depth += 1
+        if depth == 0:
+            return
+
+
+_MERGE_TAG = "tag:yaml.org,2002:merge"
+
+
+def _merge(merged: dict[Any, Any], value: Any):
+    """
+    Add the keys of the value of a merge key to `merged`: a mapping, or a
+    sequence of mappings where the first ones take precedence.
+    """
+    mappings = value if isinstance(value, list) else [value]
+    for mapping in reversed(mappings):
+        if not isinstance(mapping, dict):
+            raise yaml.constructor.ConstructorError(
+                None, None, f"expected a mapping for merging, but found {mapping!r}"
+            )
+        merged.update(mapping)
+
+
+def iter_yaml_sections(
+    path: str | Path, sections: Collection[str] | None = None
+) -> Iterator[tuple[Any, Any]]:
+    """
+    Read the yaml file at `path` as a stream of events and yield its top-level
+    (key, value) pairs one at a time. The values of the keys that are not in
+    `sections` are skipped without building them. If the file does not hold a
+    mapping, its content is yielded with a None key.
+    Like with `yaml.safe_load`, a duplicated key keeps its last value, so the
+    caller must let later pairs replace earlier ones. The keys of top-level
+    merge keys (`<<: *defaults`) are yielded last, unless they are set
+    explicitly.
+    """
+    with open(path, "rb") as f:
+        loader = SafeLoader(f)
+        try:
+            loader.get_event()  # stream start
+            if loader.check_event(yaml.StreamEndEvent):
+                return
+            loader.get_event()  # document start
+            anchors: dict[str, Node] = {}
+            if not loader.check_event(MappingStartEvent):
+                yield None, loader.construct_document(_compose(loader, anchors))
+                return
+            loader.get_event()
+            explicit: set[Any] = set()
+            merged: dict[Any, Any] = {}
+            while not loader.check_event(MappingEndEvent):
+                key_node = _compose(loader, anchors)
+                if key_node.tag == _MERGE_TAG:
+                    _merge(merged, loader.construct_document(_compose(loader, anchors)))
+                    continue
+                key = loader.construct_document(key_node)
+                explicit.add(key)
+                if sections is not None and key not in sections:
+                    _skip(loader, anchors)
+                    continue
+                yield key, loader.construct_document(_compose(loader, anchors))
+            for key, value in merged.items():
+                if key not in explicit and (sections is None or key in sections):
+                    yield key, value
+        finally:
+            loader.dispose()
+
+
+def _referenced_sections(data: Any) -> set[Any]:
+    """
+    Top-level keys referenced by the interpolations of the templates of `data`.
+    """
+    from cfg_tools.data_parser import current_resolver
+    from cfg_tools.graph import DependencyGraph
+
+    graph = DependencyGraph(data, current_resolver()._execute_template_call, copy=False)
+    return {
+        reference.split(".", 1)[0]
+        for _, _, template in graph.templates.values()
+        for reference in graph.references(template)
+    }
+
+
+def load_yaml_sections(
+    paths: list[Path], sections: Collection[Any] | None = None, extra: Any = None
+) -> dict[Any, Any]:
+    """
+    Merge the yaml files at `paths` in order, reading them with
+    `iter_yaml_sections`. Besides `sections`, the sections referenced by the
+    templates of the loaded ones (or of `extra`, e.g. the CLI arguments) are
+    loaded too, even indirectly: the files are read again for them.
+    """
+    config: dict[Any, Any] = {}
+    loaded: set[Any] = set()
+    wanted = None if sections is None else set(sections)
+    while wanted is None or wanted:
+        for path in paths:
+            with stage("load_yaml", str(path)):
+                # a duplicated key of a file replaces its former value
+                file_sections: dict[Any, Any] = {}
+                for key, value in iter_yaml_sections(path, wanted):
+                    if key is None:
+                        # not a mapping: read whole, on the first pass
+                        if not loaded:
+                            merge_dicts(config, value)
+                    else:
+                        file_sections[key] = value
+                merge_dicts(config, file_sections)
+        if wanted is None:
+            break
+        loaded |= wanted
+        wanted = _referenced_sections([config, extra]) - loaded
+    return config
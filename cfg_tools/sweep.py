@@ -0,0 +1,244 @@
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from itertools import product
+from typing import Any, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from cfg_tools.data_parser import current_resolver, validate_interpolated
+from cfg_tools.graph import DependencyGraph, _key, is_template, join_path, split_path
+from cfg_tools.reload import resolve_incremental
+from cfg_tools.utils import merge_layers, parse_args
+
+Model = TypeVar("Model", bound=BaseModel)
+
+Overrides = Sequence[str] | Mapping[str, Any]
+
+
+def grid(params: Mapping[str, Iterable[Any]]) -> Iterator[list[str]]:
+    """
+    Cartesian product of the values of each dotted path, as lists of overrides
+    in `parse_args` syntax.
+    Example:
+        list(grid({"lr": [0.1, 0.01], "model.depth": [2]}))
+        # [["lr=0.1", "model.depth=2"], ["lr=0.01", "model.depth=2"]]
+    """
+    keys = list(params)
+    for values in product(*(params[key] for key in keys)):
+        yield [f"{key}={val}" for key, val in zip(keys, values, strict=True)]
+
+
+def _flatten(overrides: Mapping[str, Any]) -> list[tuple[list[str], Any]]:
+    leaves: list[tuple[list[str], Any]] = []
+    stack: list[tuple[list[str], Mapping[str, Any]]] = [([], overrides)]
+    while stack:
+        parts, node = stack.pop()
+        for key, val in node.items():
+            if isinstance(val, Mapping):
+                stack.append((parts + [key], val))
+            else:
+                leaves.append((parts + [key], val))
+    return leaves
+
+
+def _child(node: Any, part: Any) -> Any:
+    return node[int(part)] if isinstance(node, list) else node[part]
+
+
+def _set_child(node: Any, part: Any, value: Any):
+    if isinstance(node, list):
+        node[int(part)] = value
+    else:
+        node[part] = value
+
+
+def _set_path(root: Any, parts: Sequence[Any], value: Any, owned: set[int]):
+    # copy-on-write: only the containers along the path are copied
+    node = root
+    for part in parts[:-1]:
+        if isinstance(node, dict) and part not in node:
+            child: Any = {}
+        else:
+            child = _child(node, part)
+            if id(child) in owned:
+                node = child
+                continue
+            child = list(child) if isinstance(child, list) else dict(child)
+        _set_child(node, part, child)
+        owned.add(id(child))
+        node = child
+    _set_child(node, parts[-1], value)
+
+
+class Sweep(Generic[Model]):
+    """
+    Materializes many variants of the raw config `base`, each with its own
+    overrides. The base is resolved once, and a variant only re-renders the
+    templates that depend on its overrides. Variants share the subtrees that
+    they do not change with each other, so treat them as read-only.
+    Example:
+        base, _ = load_config_files("config", ["default.yaml"], use_cli=False)
+        sweep = Sweep(base, Config)
+        for config in sweep.variants(grid({"lr": [0.1, 0.01], "seed": range(10)})):
+            submit(config)
+    """
+
+    def __init__(self, base: dict[str, Any], model: type[Model] | None = None):
+        self.base = base
+        self.model = model
+        graph = DependencyGraph(base, current_resolver()._execute_template_call)
+        self.templates = graph.templates
+        self.dependents = graph.dependents()
+        self.resolved: dict[str, Any] = graph.resolve_all()
+        self.order = {dotted: idx for idx, dotted in enumerate(graph.order)}
+
+        # templates referencing each dotted path
+        self.referencing: dict[str, list[str]] = {}
+        for dotted, (_, _, template) in self.templates.items():
+            for reference in graph.references(template):
+                path = join_path(reference.split("."))
+                self.referencing.setdefault(path, []).append(dotted)
+        self._sorted_references = sorted(self.referencing)
+        self._affected: dict[tuple[str, ...], list[str]] = {}
+        self._keys: dict[str, list[Any]] = {}
+
+    def _template_keys(self, dotted: str) -> list[Any]:
+        # keys of the templated value at `dotted`, which can be ints in dicts
+        keys = self._keys.get(dotted)
+        if keys is None:
+            keys, node = [], self.base
+            for part in split_path(dotted):
+                key = _key(node, part)
+                keys.append(key)
+                node = node[key]
+            self._keys[dotted] = keys
+        return keys
+
+    def _referencing(self, touched: str) -> Iterator[str]:
+        # templates referencing `touched`, one of its parents or children
+        parts = split_path(touched)
+        for end in range(1, len(parts) + 1):
+            yield from self.referencing.get(join_path(parts[:end]), [])
+        prefix = touched + "."
+        references = self._sorted_references
+        idx = bisect_left(references, prefix)
+        while idx < len(references) and references[idx].startswith(prefix):
+            yield from self.referencing[references[idx]]
+            idx += 1
+
+    def affected(self, touched: Sequence[str]) -> list[str]:
+        """
+        Templates to render again when the values at the dotted paths of
+        `touched` change, in the order they must be rendered.
+        """
+        key = tuple(sorted(touched))
+        if key in self._affected:
+            return self._affected[key]
+        affected: set[str] = set()
+        stack: list[str] = []
+        for path in key:
+            stack.extend(self._referencing(path))
+            if path in self.templates:
+                # overridden template: its dependents change
+                stack.extend(self.dependents[path])
+        while stack:
+            dotted = stack.pop()
+            if dotted not in affected:
+                affected.add(dotted)
+                stack.extend(self.dependents[dotted])
+        ordered = sorted(affected.difference(key), key=self.order.__getitem__)
+        self._affected[key] = ordered
+        return ordered
+
+    def _fast_path(self, leaves: list[tuple[list[str], Any]]) -> bool:
+        # overrides that only replace (or add) leaves of dicts holding no template
+        for parts, val in leaves:
+            if is_template(val):
+                return False
+            node: Any = self.base
+            for part in parts[:-1]:
+                if not isinstance(node, dict):
+                    return False
+                if part not in node:
+                    break
+                node = node[part]
+            else:
+                if not isinstance(node, dict):
+                    return False
+                if isinstance(node.get(parts[-1]), dict | list):
+                    return False
+        return True
+
+    def resolve(self, overrides: Overrides) -> dict[str, Any]:
+        """
+        Resolved config of the variant with `overrides`, given in `parse_args`
+        syntax or as a (nested) dict.
+        """
+        if not isinstance(overrides, Mapping):
+            overrides = parse_args(list(overrides))
+        leaves = _flatten(overrides)
+        touched = [join_path(parts) for parts, _ in leaves]
+        if not self._fast_path(leaves):
+            raw = merge_layers([self.base, dict(overrides)])
+            resolved, _ = resolve_incremental(raw, self.resolved, sorted(touched))
+            return resolved
+
+        variant = dict(self.resolved)
+        owned = {id(variant)}
+        for parts, val in leaves:
+            _set_path(variant, parts, val, owned)
+        affected = self.affected(touched)
+        if not affected:
+            return variant
+        templates = [self.templates[dotted][2] for dotted in affected]
+        execute = current_resolver()._prefetch(templates, variant)
+        for dotted, template in zip(affected, templates, strict=True):
+            keys = self._template_keys(dotted)
+            _set_path(variant, keys, template.render(variant, execute), owned)
+        return variant
+
+    def _validate(self, resolved: dict[str, Any]) -> Model | dict[str, Any]:
+        if self.model is None:
+            return resolved
+        return validate_interpolated(self.model, resolved)
+
+    def variants(
+        self, overrides: Iterable[Overrides], max_workers: int | None = None
+    ) -> Iterator[Model | dict[str, Any]]:
+        """
+        Lazily yield the variants of each set of overrides, in order, validated
+        with the model if there is one. With `max_workers`, the validation runs
+        in a process pool (the model must then be importable by the workers).
+        """
+        if max_workers is None or self.model is None:
+            for variant_overrides in overrides:
+                yield self._validate(self.resolve(variant_overrides))
+            return
+
+        from concurrent.futures import Future, ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers) as executor:
+            # bounded number of variants in flight, to stay lazy
+            pending: deque[Future[Any]] = deque()
+            for variant_overrides in overrides:
+                resolved = self.resolve(variant_overrides)
+                pending.append(
+                    executor.submit(validate_interpolated, self.model, resolved)
+                )
+                if len(pending) >= 4 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def sweep(
+    base: dict[str, Any],
+    overrides: Iterable[Overrides],
+    model: type[Model] | None = None,
+    max_workers: int | None = None,
+) -> Iterator[Model | dict[str, Any]]:
+    """
+    Shortcut for `Sweep(base, model).variants(overrides, max_workers)`.
+    """
+    return Sweep(base, model).variants(overrides, max_workers)
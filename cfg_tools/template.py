@@ -0,0 +1,178 @@
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+TEMPLATE_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class PluginCall:
+    """
+    A `#{plugin:key}` occurrence in a template.
+    `plugin` is None when no plugin name was given and the default plugin
+    should be used.
+    """
+
+    plugin: str | None
+    key: str
+
+
+Segment = str | PluginCall
+
+
+@dataclass(frozen=True, slots=True)
+class Template:
+    """
+    A query tokenized into a flat tuple of literal strings and plugin calls.
+    Templates are immutable and can be shared between calls and threads.
+    """
+
+    segments: tuple[Segment, ...]
+
+    @property
+    def calls(self) -> tuple[PluginCall, ...]:
+        return tuple(seg for seg in self.segments if isinstance(seg, PluginCall))
+
+    @property
+    def is_literal(self) -> bool:
+        return not any(isinstance(seg, PluginCall) for seg in self.segments)
+
+    def render(
+        self,
+        data: Any,
+        execute: Callable[[str | None, str, Any], Any],
+    ) -> Any:
+        """
+        Render the template. `execute(plugin, key, data)` is called for every
+        plugin call. When the template is made of a single plugin call, its
+        result is returned as is, otherwise all segments are joined as str.
+        """
+        segments = self.segments
+        if len(segments) == 1:
+            seg = segments[0]
+            if isinstance(seg, PluginCall):
+                return execute(seg.plugin, seg.key, data)
+            return seg
+
+        parts: list[str] = []
+        for seg in segments:
+            if isinstance(seg, PluginCall):
+                parts.append(str(execute(seg.plugin, seg.key, data)))
+            else:
+                parts.append(seg)
+        return "".join(parts)
+
+
+_literal_chars = re.compile(r"[^\\#]+")
+_key_chars = re.compile(r"[^\\:}]+")
+_plain_call = re.compile(r"#\{([^}]*)\}")
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _plugin_call(plugin: str | None, key: str) -> PluginCall:
+    # templates that differ by their literals share their calls
+    return PluginCall(plugin, key)
+
+
+def _tokenize_plain(query: str) -> tuple[Segment, ...]:
+    # without backslashes, the calls are the `#{...}` up to the first "}"
+    segments: list[Segment] = []
+    start = 0
+    for match in _plain_call.finditer(query):
+        if match.start() > start:
+            segments.append(query[start : match.start()])
+        plugin, sep, key = match.group(1).partition(":")
+        segments.append(
+            _plugin_call(plugin, key) if sep else _plugin_call(None, plugin)
+        )
+        start = match.end()
+    if start < len(query) or not segments:
+        segments.append(query[start:])
+    return tuple(segments)
+
+
+def _tokenize(query: str) -> tuple[Segment, ...]:
+    if "\\" not in query:
+        return _tokenize_plain(query)
+    return _tokenize_escaped(query)
+
+
+def _tokenize_escaped(query: str) -> tuple[Segment, ...]:
+    segments: list[Segment] = []
+    literal: list[str] = []
+    key: list[str] = []
+    plugin: str | None = None
+    in_interpolation = False
+    is_escaped = False
+    start = 0
+
+    idx = 0
+    length = len(query)
+    while idx < length:
+        if not is_escaped:
+            # consume runs of letters without special meaning at once.
+            chars = _key_chars if in_interpolation else _literal_chars
+            match = chars.match(query, idx)
+            if match is not None:
+                (key if in_interpolation else literal).append(match.group())
+                idx = match.end()
+                continue
+        letter = query[idx]
+        if in_interpolation:
+            if is_escaped:
+                # only "}" can be escaped inside of an interpolation, other
+                # escaped letters keep their backslash.
+                if letter != "}":
+                    key.append("\\")
+                key.append(letter)
+                is_escaped = False
+            elif letter == "\\":
+                is_escaped = True
+            elif letter == ":" and plugin is None:
+                plugin = "".join(key)
+                key = []
+            elif letter == "}":
+                if literal:
+                    segments.append("".join(literal))
+                    literal = []
+                segments.append(_plugin_call(plugin, "".join(key)))
+                in_interpolation = False
+            else:
+                key.append(letter)
+        elif is_escaped:
+            if letter == "\\" or letter == "#":
+                literal.append(letter)
+            else:
+                literal.append("\\" + letter)
+            is_escaped = False
+        elif letter == "\\":
+            is_escaped = True
+        elif letter == "#" and query.startswith("{", idx + 1):
+            in_interpolation = True
+            plugin = None
+            key = []
+            start = idx
+            idx += 1
+        else:
+            literal.append(letter)
+        idx += 1
+
+    if in_interpolation:
+        # unterminated interpolations are kept as is.
+        literal.append(query[start:])
+    elif is_escaped:
+        literal.append("\\")
+    if literal or not segments:
+        segments.append("".join(literal))
+    return tuple(segments)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(query: str) -> Template:
+    """
+    Tokenize a query once into a `Template`. Compiled templates are kept in a
+    bounded LRU cache keyed by the query string.
+    """
+    return Template(_tokenize(query))
@@ -1,12 +1,18 @@
+import hashlib
+import os
+import pickle
 import sys
+from collections.abc import Collection, Iterator
+from itertools import repeat
 from pathlib import Path
 from typing import Any, TypeVar
 
-import yaml
 from pydantic import BaseModel, ValidationError
-from pydantic_core import InitErrorDetails
-from rich import print as rprint
-from ruamel.yaml import YAML
+
+from cfg_tools.instrumentation import _hooks, record_cache, stage
+
+# yaml, rich and ruamel.yaml are imported by the functions using them, so that
+# `import cfg_tools` stays fast for the programs that only parse templates
 
 
 def parse_args(argv: list[str] | None = None) -> dict[str, Any]:
@@ -46,51 +52,224 @@ def merge_dicts(a: dict[str, Any], b: dict[str, Any] | None):
     """
     if b is None:
         return
-    for k in b:
-        if k in a:
-            if isinstance(a[k], dict) and isinstance(b[k], dict):
-                merge_dicts(a[k], b[k])
+    stack: list[tuple[dict[str, Any], dict[str, Any]]] = [(a, b)]
+    while stack:
+        dst, src = stack.pop()
+        for k, val in src.items():
+            cur = dst.get(k)
+            if isinstance(cur, dict) and isinstance(val, dict):
+                stack.append((cur, val))
             else:
-                a[k] = b[k]
-        else:
-            a[k] = b[k]
+                dst[k] = val
 
 
-def load_config_files(
-    path: str | Path,
-    load_files: list[str],
-    use_cli: bool = True,
-    argv: list[str] | None = None,
-) -> tuple[dict[str, Any], dict[str, Any]]:
+def merge_layers(layers: list[dict[str, Any] | None]) -> dict[str, Any]:
+    """
+    Deep merge `layers` in order into a new dict, like successive calls to
+    `merge_dicts`, but without modifying the layers. Subtrees that are only
+    defined in one layer are shared with that layer.
+    Example:
+        merged = merge_layers([{"a": {"b": 1, "c": 3}}, {"a": {"b": 2}}])
+        assert merged == {"a": {"b": 2, "c": 3}}
+    """
+    merged: dict[str, Any] = {}
+    # dicts created by the merge, that can be updated in place
+    owned = {id(merged)}
+    for layer in layers:
+        if layer is None:
+            continue
+        stack: list[tuple[dict[str, Any], dict[str, Any]]] = [(merged, layer)]
+        while stack:
+            dst, src = stack.pop()
+            for k, val in src.items():
+                cur = dst.get(k)
+                if isinstance(cur, dict) and isinstance(val, dict):
+                    if id(cur) not in owned:
+                        cur = dict(cur)
+                        dst[k] = cur
+                        owned.add(id(cur))
+                    stack.append((cur, val))
+                else:
+                    dst[k] = val
+    return merged
+
+
+def load_yaml_file(path: str | Path, cache_dir: str | Path | None = None) -> Any:
+    """
+    Load a yaml file, with libyaml's loader when it is available.
+    If `cache_dir` is given, the parsed content is pickled in that folder, keyed
+    by the path, size, modification time and content hash of the file, so an
+    unchanged file is never parsed twice. Only use a cache folder that you trust.
+    """
+    path = Path(path)
+    with stage("load_yaml", str(path)):
+        return _load_yaml_file(path, cache_dir)
+
+
+def _parse_yaml(content: bytes) -> Any:
+    import yaml
+
+    from cfg_tools.streaming import SafeLoader
+
+    return yaml.load(content, Loader=SafeLoader)
+
+
+def _load_yaml_file(path: Path, cache_dir: str | Path | None) -> Any:
+    stat = path.stat()
+    content = path.read_bytes()
+    if cache_dir is None:
+        return _parse_yaml(content)
+
+    cache_path = Path(cache_dir)
+    digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    key = f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{digest}"
+    cache_file = cache_path / f"{hashlib.blake2b(key.encode()).hexdigest()}.pickle"
+    try:
+        with open(cache_file, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        if _hooks:
+            record_cache("yaml_files", False, str(path))
+    else:
+        if _hooks:
+            record_cache("yaml_files", True, str(path))
+        return data
+
+    data = _parse_yaml(content)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    # write then rename so that concurrent processes never read a partial file.
+    # The temporary file is unique, so threads writing the same entry do not
+    # share it.
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(
+        dir=cache_path, prefix=f"{cache_file.stem}.", suffix=".tmp", delete=False
+    ) as tmp_file:
+        try:
+            pickle.dump(data, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    os.replace(tmp_file.name, cache_file)
+    return data
+
+
+def _config_paths(path: str | Path, load_files: list[str]) -> list[Path]:
     config_path = Path(path)
     if not config_path.is_dir():
         raise FileNotFoundError(f"Config path {config_path} does not exist.")
 
-    config_dict: dict[str, Any] = {}
+    path_files: list[Path] = []
     for file in load_files:
         path_file = config_path / file
         if not path_file.is_file():
             raise FileNotFoundError(f"Config file {path_file} does not exist.")
-        with open(path_file) as f:
-            merge_dicts(config_dict, yaml.safe_load(f))
+        path_files.append(path_file)
+    return path_files
+
+
+def iter_config_files(
+    path: str | Path,
+    load_files: list[str],
+    cache_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    use_processes: bool = False,
+) -> Iterator[Any]:
+    """
+    Load `load_files` (relative to `path`) and yield their content in order.
+    All files are checked for existence before any of them is read.
+    With `max_workers`, files are read and parsed concurrently in a thread pool
+    (or a process pool with `use_processes`, better suited for very large
+    files).
+    """
+    path_files = _config_paths(path, load_files)
+    if max_workers is None or len(path_files) < 2:
+        for path_file in path_files:
+            yield load_yaml_file(path_file, cache_dir)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers) as executor:
+        # map yields the results in the order of the files
+        yield from executor.map(
+            load_yaml_file, path_files, repeat(cache_dir, len(path_files))
+        )
+
 
+def load_config_files(
+    path: str | Path,
+    load_files: list[str],
+    use_cli: bool = True,
+    argv: list[str] | None = None,
+    cache_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    use_processes: bool = False,
+    streaming: bool = False,
+    sections: Collection[str] | type[BaseModel] | None = None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Load and merge `load_files` (relative to `path`) in order, then the CLI
+    arguments. See `iter_config_files` for `cache_dir`, `max_workers` and
+    `use_processes`.
+    With `streaming`, files are read as yaml events and built one top-level
+    section at a time, so the yaml nodes of a whole file are never held in
+    memory.
+    `sections` (top-level keys, or a model to use the keys of its fields)
+    implies `streaming`: the other sections of the files are skipped without
+    being built, unless the templates of the kept sections (or of the CLI
+    arguments) reference them.
+    Streaming reads the files one after the other, without the parse cache:
+    `cache_dir`, `max_workers` and `use_processes` then raise a ValueError.
+    """
     cli_config: dict[str, Any] = {}
     if use_cli:
         cli_config = parse_args(argv)
-        merge_dicts(config_dict, cli_config)
+    config_dict: dict[str, Any] = {}
+    if streaming or sections is not None:
+        if cache_dir is not None or max_workers is not None or use_processes:
+            raise ValueError(
+                "cache_dir, max_workers and use_processes cannot be used with "
+                "streaming or sections"
+            )
+        from cfg_tools.streaming import load_yaml_sections, model_sections
+
+        if isinstance(sections, type):
+            sections = model_sections(sections)
+        paths = _config_paths(path, load_files)
+        config_dict = load_yaml_sections(paths, sections, cli_config)
+    else:
+        contents = iter_config_files(
+            path, load_files, cache_dir, max_workers, use_processes
+        )
+        for content in contents:
+            with stage("merge"):
+                merge_dicts(config_dict, content)
+
+    if use_cli:
+        with stage("merge"):
+            merge_dicts(config_dict, cli_config)
     return config_dict, cli_config
 
 
 def make_missing_dict(loc: list[str | int], val: Any) -> Any:
-    if not len(loc):
-        return val
-    if isinstance(loc[0], str):
-        return {loc[0]: make_missing_dict(loc[1:], val)}
-    elif loc[0] == 0:
-        return [make_missing_dict(loc[1:], val)]
+    # built from the value up, a location that cannot be created gives None
+    for key in reversed(loc):
+        if isinstance(key, str):
+            val = {key: val}
+        elif key == 0:
+            val = [val]
+        else:
+            val = None
+    return val
 
 
 def set_config_dynamically(e: ValidationError, config_dict: dict[str, Any]):
+    from pydantic_core import InitErrorDetails
+    from rich import print as rprint
+
     printed_header = False
     other_errors: list[InitErrorDetails] = []
     ask_should_save = False
@@ -137,6 +316,9 @@ def validate_and_fill_missing(
     conf_path: Path,
     target_file: str,
 ) -> Model:
+    from rich import print as rprint
+    from ruamel.yaml import YAML
+
     local_yaml = YAML()
     target_file_path = conf_path / target_file
     for _ in range(2):
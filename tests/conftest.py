@@ -0,0 +1,28 @@
+from collections.abc import Iterator
+
+import pytest
+
+from cfg_tools import Resolver
+
+
+@pytest.fixture
+def calls() -> list[str]:
+    # keys given to the "count" plugin of the resolver fixture, in order
+    return []
+
+
+@pytest.fixture
+def resolver(calls: list[str]) -> Iterator[Resolver]:
+    """
+    Fresh resolver, current for the whole test, with a "count" plugin that
+    records its keys in `calls` and returns them.
+    """
+    resolver = Resolver()
+
+    @resolver.register_plugin("count")
+    def plugin_count(key: str, _) -> str:
+        calls.append(key)
+        return key
+
+    with resolver.use():
+        yield resolver
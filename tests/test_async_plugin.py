@@ -0,0 +1,74 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+
+from cfg_tools import (
+    parse_dict,
+    parse_dict_async,
+    parse_list_async,
+    parse_str,
+    parse_str_async,
+    register_plugin,
+)
+
+running = 0
+max_running = 0
+
+
+@register_plugin("remote")
+async def plugin_remote(key: str, _) -> str:
+    global running, max_running
+    running += 1
+    max_running = max(max_running, running)
+    try:
+        await asyncio.sleep(1.0 if key == "slow" else 0.05)
+    finally:
+        running -= 1
+    return f"remote_{key}"
+
+
+def reset():
+    global max_running
+    max_running = 0
+
+
+def test_async_plugin_concurrent():
+    reset()
+    data: dict[str, Any] = {f"k{k}": f"#{{remote:{k}}}" for k in range(10)}
+    data["ref"] = "#{k1}"
+    start = time.perf_counter()
+    parsed = asyncio.run(parse_dict_async(data, data))
+    assert time.perf_counter() - start < 0.4
+    assert parsed["k3"] == "remote_3"
+    assert parsed["ref"] == "remote_1"
+    assert max_running == 10
+
+
+def test_async_plugin_concurrency_limit():
+    reset()
+    queries = [f"#{{remote:{k}}}" for k in range(6)]
+    parsed = asyncio.run(parse_list_async(queries, {}, concurrency=2))
+    assert parsed == [f"remote_{k}" for k in range(6)]
+    assert max_running == 2
+
+
+def test_async_plugin_timeout():
+    with pytest.raises(TimeoutError):
+        asyncio.run(parse_str_async("#{remote:slow}", {}, timeout=0.1))
+
+
+def test_async_plugin_sync_api():
+    reset()
+    assert parse_str("#{remote:a}/#{remote:b}", {}) == "remote_a/remote_b"
+    assert max_running == 2
+    data = {"a": "#{remote:a}", "b": "#{a}"}
+    assert parse_dict(data, data) == {"a": "remote_a", "b": "remote_a"}
+
+
+def test_async_plugin_sync_api_in_running_loop():
+    async def main():
+        return parse_str("#{remote:a}", {})
+
+    assert asyncio.run(main()) == "remote_a"
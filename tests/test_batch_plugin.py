@@ -0,0 +1,56 @@
+from typing import Any
+
+from cfg_tools import parse_dict, parse_list, parse_str, register_plugin
+
+batches: list[list[str]] = []
+
+
+def secrets_batch(keys: list[str], _) -> dict[str, str]:
+    batches.append(keys)
+    return {key: f"secret_{key}" for key in keys}
+
+
+@register_plugin("secret", batch=secrets_batch)
+def plugin_secret(key: str, _) -> str:
+    raise AssertionError("the batch implementation should be used")
+
+
+def test_batch_plugin_dict():
+    batches.clear()
+    data: dict[str, Any] = {
+        "a": "#{secret:foo}",
+        "b": {"c": "#{secret:bar}/#{secret:foo}", "d": ["#{secret:baz}"]},
+        "e": "#{b.c}",
+    }
+    parsed = parse_dict(data, data)
+    assert parsed["b"]["c"] == "secret_bar/secret_foo"
+    assert parsed["e"] == "secret_bar/secret_foo"
+    assert parsed["b"]["d"] == ["secret_baz"]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == ["bar", "baz", "foo"]
+
+
+def test_batch_plugin_other_queries():
+    batches.clear()
+    data = {"a": "#{secret:foo}"}
+    assert parse_list(["#{a}", "#{secret:foo}", "#{secret:bar}"], data) == [
+        "secret_foo",
+        "secret_foo",
+        "secret_bar",
+    ]
+    assert len(batches) == 1
+
+
+def test_batch_plugin_str():
+    batches.clear()
+    assert parse_str("#{secret:a}#{secret:a}", {}) == "secret_asecret_a"
+    assert batches == [["a"]]
+
+
+@register_plugin("batch_list", batch=lambda keys, _: [k.upper() for k in keys])
+def plugin_batch_list(key: str, _) -> str:
+    return key.upper()
+
+
+def test_batch_plugin_sequence():
+    assert parse_str("#{batch_list:a} #{batch_list:b}", {}) == "A B"
@@ -0,0 +1,96 @@
+from typing import Any
+
+from pydantic import ConfigDict
+
+from cfg_tools import (
+    ParsedModel,
+    SharedConfig,
+    fingerprint_config,
+    freeze,
+    merge_dicts,
+    parse_dict,
+    parse_list,
+)
+from cfg_tools.utils import make_missing_dict
+
+# much deeper than the recursion limit
+DEPTH = 20_000
+
+
+def nested(leaf: Any, depth: int = DEPTH) -> dict[str, Any]:
+    root: dict[str, Any] = {}
+    node = root
+    for _ in range(depth):
+        node["a"] = {}
+        node = node["a"]
+    node["x"] = leaf
+    return root
+
+
+def leaf(config: Any, depth: int = DEPTH) -> Any:
+    for _ in range(depth):
+        config = config["a"]
+    return config["x"]
+
+
+def test_merge_dicts_deep():
+    config = nested(1)
+    merge_dicts(config, nested(2) | {"b": 3})
+    assert leaf(config) == 2
+    assert config["b"] == 3
+
+
+def test_make_missing_dict_deep():
+    loc: list[str | int] = ["a"] * DEPTH
+    loc.append("x")
+    assert leaf(make_missing_dict(loc, 1)) == 1
+    assert make_missing_dict(["a", 0, "b"], 1) == {"a": [{"b": 1}]}
+    assert make_missing_dict(["a", 1, "b"], 1) == {"a": None}
+
+
+def test_parse_deep():
+    data = nested("#{y}/x") | {"y": "#{z}", "z": "foo"}
+    assert leaf(parse_dict(data, data)) == "foo/x"
+
+    queries: list[Any] = ["#{z}"]
+    for _ in range(DEPTH):
+        queries = [queries]
+    parsed = parse_list(queries, data)
+    for _ in range(DEPTH + 1):
+        parsed = parsed[0]
+    assert parsed == "foo"
+
+
+def test_model_deep():
+    class Config(ParsedModel):
+        model_config = ConfigDict(extra="allow")
+
+    config = Config.model_validate(nested("#{y}") | {"y": 1})
+    assert leaf(config.model_extra) == 1
+
+
+def test_shared_deep():
+    with SharedConfig.publish(nested([1, {"b": 2}])) as shared:
+        assert leaf(shared.root.to_dict()) == [1, {"b": 2}]
+
+
+def test_fingerprint_deep():
+    fingerprint = fingerprint_config(nested(1))
+    dotted = ".".join(["a"] * DEPTH + ["x"])
+    updated = fingerprint.update(dotted, 2)
+    assert updated == fingerprint_config(nested(2))
+    assert fingerprint.diff(updated).changed == [dotted]
+
+
+def test_freeze_deep():
+    config = nested([1, [2]])
+    frozen, other = freeze(config), freeze(nested([1, [2]]))
+    assert hash(frozen) == hash(other)
+    assert frozen == other
+    assert frozen == config
+    assert frozen != freeze(nested([1, [3]]))
+    deep_list: Any = 1
+    for _ in range(DEPTH):
+        deep_list = [deep_list]
+    assert hash(freeze(deep_list)) == hash(freeze(deep_list))
+    assert freeze(deep_list) == deep_list
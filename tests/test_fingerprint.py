@@ -0,0 +1,98 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+from cfg_tools import ParsedModel, SharedConfig, fingerprint_config, freeze
+
+
+def test_fingerprint_key_order():
+    a = {"x": 1, "y": {"z": [1, "2", None], "w": 1.5}}
+    b = {"y": {"w": 1.5, "z": [1, "2", None]}, "x": 1}
+    assert fingerprint_config(a) == fingerprint_config(b)
+    assert fingerprint_config(a).hexdigest == fingerprint_config(freeze(b)).hexdigest
+    assert fingerprint_config({"x": 1}) != fingerprint_config({"x": "1"})
+    assert fingerprint_config({"x": [1, 2]}) != fingerprint_config({"x": [2, 1]})
+    assert fingerprint_config({"x": 1}) != fingerprint_config({1: 1})
+
+
+def test_fingerprint_subtrees():
+    a = fingerprint_config({"model": {"depth": 2}, "seed": 0})
+    b = fingerprint_config({"model": {"depth": 2}, "seed": 1})
+    assert a != b
+    assert a["model"] == b["model"]
+    assert a.get_path("model.depth") == fingerprint_config(2)
+
+
+def test_fingerprint_update():
+    config: dict[str, Any] = {"a": {"b": [1, {"c": 2}], "d": "x"}, "e": None}
+    fingerprint = fingerprint_config(config)
+    updated = fingerprint.update("a.b.1.c", 3).update("a.f", {"g": 1})
+    config["a"]["b"][1]["c"] = 3
+    config["a"]["f"] = {"g": 1}
+    assert updated == fingerprint_config(config)
+
+    removed = updated.remove("a.b.0").remove("e")
+    del config["a"]["b"][0]
+    del config["e"]
+    assert removed == fingerprint_config(config)
+    assert removed.update("a.b.1", 4) == fingerprint_config(
+        {"a": {"b": [{"c": 3}, 4], "d": "x", "f": {"g": 1}}}
+    )
+
+
+def test_fingerprint_diff():
+    old = fingerprint_config({"a": {"b": 1, "c": [1, 2]}, "d": 1, "e": {}})
+    new = fingerprint_config({"a": {"b": 2, "c": [1]}, "d": 1, "e": 1, "f": 0})
+    diff = old.diff(new)
+    assert diff.changed == ["a.b", "e"]
+    assert diff.removed == ["a.c.1"]
+    assert diff.added == ["f"]
+    assert not diff.affects("d")
+    assert not old.diff(old)
+
+
+class Config(ParsedModel):
+    name: str
+    tags: set[str]
+
+
+def test_fingerprint_model():
+    config = Config.model_validate({"name": "#{base}", "tags": ["b", "a"], "base": "x"})
+    assert fingerprint_config(config) == fingerprint_config(
+        {"tags": {"a", "b"}, "name": "x"}
+    )
+
+
+def test_fingerprint_shared():
+    data = {"a": [{"b": 1}, {"b": 1}], "c": "d"}
+    with SharedConfig.publish(data) as shared:
+        assert fingerprint_config(shared.root) == fingerprint_config(data)
+
+
+def test_fingerprint_shared_distinct_siblings():
+    data = {
+        "a": [{"b": idx} for idx in range(50)],
+        "c": [{"b": 100 + idx} for idx in range(50)],
+    }
+    with SharedConfig.publish(data) as shared:
+        fingerprint = fingerprint_config(shared.root)
+        assert fingerprint == fingerprint_config(data)
+        assert fingerprint["a"] != fingerprint["c"]
+
+
+class Item(BaseModel):
+    x: int
+
+
+def test_fingerprint_nested_models():
+    data = {
+        "m1": [Item(x=1), Item(x=2)],
+        "m2": [Item(x=3), Item(x=4)],
+        "m3": {"i": Item(x=5)},
+    }
+    dumped = {
+        "m1": [{"x": 1}, {"x": 2}],
+        "m2": [{"x": 3}, {"x": 4}],
+        "m3": {"i": {"x": 5}},
+    }
+    assert fingerprint_config(data) == fingerprint_config(dumped)
@@ -0,0 +1,56 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from cfg_tools import FrozenConfig, FrozenList, freeze, parse_dict, thaw
+
+
+def make_data() -> dict[str, Any]:
+    return {"a": {"b": [1, {"c": "#{x}"}], "s": {1, 2}}, "x": "y"}
+
+
+def test_freeze():
+    data = make_data()
+    config = freeze(parse_dict(data, data))
+    assert isinstance(config, FrozenConfig)
+    assert isinstance(config.a.b, FrozenList)
+    assert config.a.b[1].c == config["a"]["b"][1]["c"] == "y"
+    assert config.get_path("a.b.1.c") == "y"
+    assert config.a.s == frozenset({1, 2})
+    assert thaw(config) == {"a": {"b": [1, {"c": "y"}], "s": {1, 2}}, "x": "y"}
+    with pytest.raises(AttributeError):
+        _ = config.missing
+    with pytest.raises(AttributeError):
+        config.x = "z"  # type: ignore[misc]
+
+
+def test_frozen_equality_and_hash():
+    config = freeze(make_data())
+    other = freeze(make_data())
+    assert config == other
+    assert hash(config) == hash(other)
+    assert {config: 1}[other] == 1
+    assert config == make_data()
+
+    # same keys in another order
+    reordered = freeze({"x": "y", "a": make_data()["a"]})
+    assert reordered == config
+    assert hash(reordered) == hash(config)
+    assert freeze({"x": "z", "a": make_data()["a"]}) != config
+
+
+def test_frozen_shared_keys_and_pool():
+    pool: dict[Any, Any] = {}
+    configs = [freeze({"a": {"b": 1}, "seed": seed}, pool) for seed in range(3)]
+    assert configs[0]._layout is configs[1]._layout
+    assert configs[0].a is configs[2].a
+
+
+def test_frozen_pickle_and_threads():
+    config = freeze(make_data())
+    assert pickle.loads(pickle.dumps(config)) == config
+    with ThreadPoolExecutor(4) as executor:
+        hashes = set(executor.map(lambda _: hash(freeze(make_data())), range(8)))
+    assert hashes == {hash(config)}
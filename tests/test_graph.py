@@ -0,0 +1,97 @@
+from typing import Any
+
+import pytest
+
+from cfg_tools import InterpolationCycleError, ParsedModel, Resolver, parse_dict
+from cfg_tools.graph import join_path, split_path
+
+
+def test_chained_interpolation():
+    data = {"a": "#{b}/x", "b": "#{root}/y", "root": "/data"}
+    assert parse_dict(data, data) == {"a": "/data/y/x", "b": "/data/y", "root": "/data"}
+
+
+def test_chained_interpolation_other_queries():
+    data = {"b": "#{root}/y", "root": "/data"}
+    assert parse_dict({"a": "#{b}/x"}, data) == {"a": "/data/y/x"}
+
+
+def test_chained_interpolation_subtree():
+    data = {"a": "#{b}", "b": {"c": "#{d}", "e": ["#{d}"]}, "d": 1}
+    parsed = parse_dict(data, data)
+    assert parsed["a"] == {"c": 1, "e": [1]}
+
+
+def test_chained_interpolation_through_template():
+    data = {"a": "#{b.c}", "b": "#{d}", "d": {"c": "#{e}"}, "e": "foo"}
+    assert parse_dict(data, data)["a"] == "foo"
+
+
+def test_resolved_once(resolver: Resolver, calls: list[str]):
+    data = {"a": "#{c}#{c}", "b": "#{c}", "c": "#{count:foo}"}
+    assert resolver.parse_dict(data, data) == {"a": "foofoo", "b": "foo", "c": "foo"}
+    assert calls == ["foo"]
+
+
+def test_cycle():
+    data = {"a": "#{b}", "b": {"c": "#{d}"}, "d": "#{a}"}
+    with pytest.raises(InterpolationCycleError) as e:
+        parse_dict(data, data)
+    assert e.value.cycle == ["a", "b.c", "d", "a"]
+
+
+def test_self_reference():
+    data = {"a": "x#{a}"}
+    with pytest.raises(InterpolationCycleError) as e:
+        parse_dict(data, data)
+    assert e.value.cycle == ["a", "a"]
+
+
+def test_parsed_model_chain():
+    class Config(ParsedModel):
+        a: str
+        b: str
+        root: str
+
+    config = Config.model_validate({"a": "#{b}/x", "b": "#{root}/y", "root": "/r"})
+    assert config.a == "/r/y/x"
+
+
+def test_parse_dict_copy():
+    data: dict[str, Any] = {"a": {"b": "#{c}"}, "table": {"d": [1, 2]}, "c": 1}
+    parsed = parse_dict(data, data)
+    assert parsed == {"a": {"b": 1}, "table": {"d": [1, 2]}, "c": 1}
+    assert parsed["table"] is not data["table"]
+    assert parsed["table"]["d"] is not data["table"]["d"]
+
+
+def test_parse_dict_share():
+    data: dict[str, Any] = {
+        "a": {"b": "#{c}", "e": {"f": 2}},
+        "table": {"d": [1, 2]},
+        "c": 1,
+    }
+    parsed = parse_dict(data, data, copy=False)
+    assert parsed == {"a": {"b": 1, "e": {"f": 2}}, "table": {"d": [1, 2]}, "c": 1}
+    assert data["a"]["b"] == "#{c}"
+    assert parsed["table"] is data["table"]
+    assert parsed["a"] is not data["a"]
+    assert parsed["a"]["e"] is data["a"]["e"]
+
+
+def test_parse_dict_share_no_template():
+    data = {"a": {"b": 1}}
+    assert parse_dict(data, data, copy=False) is data
+
+
+def test_dotted_key():
+    data: dict[str, Any] = {"a.b": "#{x}", "a": {"b": "#{y}"}, "x": 1, "y": 2}
+    assert parse_dict(data, data) == {"a.b": 1, "a": {"b": 2}, "x": 1, "y": 2}
+    data = {"a.b": "#{x}", "a": {"b": "#{y}"}, "x": 1, "y": 2, "z": "#{a.b}"}
+    assert parse_dict(data, data)["z"] == 2
+
+
+def test_join_path():
+    assert join_path(["a.b", "c\\d", "e"]) == "a\\.b.c\\\\d.e"
+    assert split_path(join_path(["a.b", "c\\d", "e"])) == ["a.b", "c\\d", "e"]
+    assert split_path("a.b") == ["a", "b"]
@@ -0,0 +1,57 @@
+import importlib.metadata
+import subprocess
+import sys
+
+# loaded by the functions that need them, never by `import cfg_tools`
+DEFERRED = [
+    "yaml",
+    "rich",
+    "ruamel.yaml",
+    "asyncio",
+    "concurrent.futures",
+    "multiprocessing.shared_memory",
+    # optional features
+    "cfg_tools.fingerprint",
+    "cfg_tools.frozen",
+    "cfg_tools.layers",
+    "cfg_tools.reload",
+    "cfg_tools.shared",
+    "cfg_tools.snapshot",
+    "cfg_tools.streaming",
+    "cfg_tools.sweep",
+]
+
+
+def test_import_defers_heavy_modules():
+    code = (
+        "import sys, cfg_tools\n"
+        "print(','.join(m for m in sys.argv[1:] if m in sys.modules))\n"
+        "print('__version__' in vars(cfg_tools))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, *DEFERRED],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split("\n")[:2] == ["", "False"]
+
+
+def test_version():
+    import cfg_tools
+
+    assert cfg_tools.__version__ == importlib.metadata.version("cfg-tools")
+    assert "__version__" in vars(cfg_tools)
+
+
+def test_lazy_names():
+    code = (
+        "import sys, cfg_tools\n"
+        "from cfg_tools import Sweep, sweep\n"
+        "print(callable(sweep), 'cfg_tools.sweep' in sys.modules)\n"
+        "print(cfg_tools.SharedConfig.__name__, 'cfg_tools.frozen' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split("\n")[:2] == ["True True", "SharedConfig False"]
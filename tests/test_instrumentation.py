@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from cfg_tools import (
+    Event,
+    PureCache,
+    add_hook,
+    collect_stats,
+    instrumentation,
+    invalidate_plugin_cache,
+    load_config_files,
+    parse_dict,
+    register_plugin,
+    remove_hook,
+)
+from cfg_tools.__main__ import main
+
+
+@register_plugin("stats_pure", cache=PureCache())
+def plugin_stats_pure(key: str, _) -> str:
+    return key
+
+
+def test_collect_stats(tmp_path: Path):
+    (tmp_path / "default.yaml").write_text("a: '#{stats_pure:x}'\nb: '#{a}/#{a}'\n")
+    (tmp_path / "local.yaml").write_text("c: '#{stats_pure:x}'\n")
+    invalidate_plugin_cache("stats_pure")
+    with collect_stats() as stats:
+        config, _ = load_config_files(
+            tmp_path, ["default.yaml", "local.yaml"], use_cli=False
+        )
+        assert parse_dict(config, config) == {"a": "x", "b": "x/x", "c": "x"}
+
+    assert stats.stages["load_yaml"].count == 2
+    assert stats.stages["merge"].count == 2
+    assert stats.stages["render"].count == 1
+    assert stats.plugins["stats_pure"].count == 1
+    assert stats.keys[("stats_pure", "x")].count == 1
+    assert stats.caches["stats_pure"].hits == 1
+    assert stats.caches["stats_pure"].misses == 1
+    assert stats.caches["stats_pure"].hit_rate == 0.5
+    assert not instrumentation._hooks
+
+
+def test_hooks():
+    events: list[Event] = []
+    add_hook(events.append)
+    try:
+        parse_dict({"a": "#{env:CFG_TOOLS_HOOK,foo}"}, {})
+    finally:
+        remove_hook(events.append)
+    parse_dict({"a": "#{env:CFG_TOOLS_HOOK,foo}"}, {})
+    plugin_events = [event for event in events if event.kind == "plugin"]
+    assert [(event.name, event.key) for event in plugin_events] == [
+        ("env", "CFG_TOOLS_HOOK,foo")
+    ]
+
+
+def test_profile_command(tmp_path: Path, capsys):
+    (tmp_path / "default.yaml").write_text("a: 1\nb: '#{a}'\n")
+    main(["profile", str(tmp_path), "default.yaml", "--repeat", "2"])
+    output = capsys.readouterr().out
+    assert "Stages" in output
+    assert "load_yaml" in output
+    assert "interpolate:a" in output
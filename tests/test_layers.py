@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from cfg_tools import LayeredConfig, load_config_files, load_config_layers
+
+
+def test_layered_config():
+    base = {"a": {"b": 1, "c": 3}, "d": [1, 2], "e": {"f": 1}}
+    override = {"a": {"b": 2}, "e": 1, "g": 2}
+    config = LayeredConfig([base, None, override], names=["base", "none", "over"])
+    assert config["a"]["b"] == 2
+    assert config["a"]["c"] == 3
+    assert config["e"] == 1
+    assert list(config) == ["a", "d", "e", "g"]
+    assert len(config["a"]) == 2
+    assert "g" in config
+    with pytest.raises(KeyError):
+        config["h"]
+
+    assert config.to_dict() == {"a": {"b": 2, "c": 3}, "d": [1, 2], "e": 1, "g": 2}
+    assert config["a"].to_dict() == {"b": 2, "c": 3}
+    # layers are untouched
+    assert base == {"a": {"b": 1, "c": 3}, "d": [1, 2], "e": {"f": 1}}
+
+
+def test_layered_config_sources():
+    config = LayeredConfig(
+        [{"a": {"b": 1, "c": 3}, "d": 1}, {"a": {"b": 2}}], names=["default", "cli"]
+    )
+    assert config.source("a.b") == "cli"
+    assert config.source("a.c") == "default"
+    assert config.sources("a") == ["cli", "default"]
+    assert config.source("d") == "default"
+    with pytest.raises(KeyError):
+        config.source("a.e")
+
+
+def test_layered_config_shadowed_dict():
+    config = LayeredConfig([{"a": {"b": 1}}, {"a": 1}, {"a": {"c": 2}}])
+    assert config["a"].to_dict() == {"c": 2}
+    assert config.sources("a") == ["layer2"]
+
+
+def test_with_layer():
+    base = LayeredConfig([{"a": {"b": 1, "c": 3}}], names=["base"])
+    variant = base.with_layer({"a": {"b": 2}}, "variant")
+    assert variant["a"]["b"] == 2
+    assert base["a"]["b"] == 1
+
+
+def test_load_config_layers(tmp_path: Path):
+    (tmp_path / "default.yaml").write_text("a:\n  b: 1\n  c: foo\n")
+    (tmp_path / "local.yaml").write_text("a:\n  b: 2\n")
+    files = ["default.yaml", "local.yaml"]
+    config = load_config_layers(tmp_path, files, argv=["a.c=bar"])
+    assert config.source("a.b") == "local.yaml"
+    assert config.source("a.c") == "cli"
+    assert config.to_dict() == load_config_files(tmp_path, files, argv=["a.c=bar"])[0]
@@ -0,0 +1,71 @@
+import pytest
+
+from cfg_tools import (
+    InterpolationCycleError,
+    LazyConfig,
+    LazyList,
+    Resolver,
+    parse_lazy,
+)
+
+
+def test_lazy_access(resolver: Resolver, calls: list[str]):
+    data = {
+        "a": "#{b.c}/x",
+        "b": {"c": "#{count:foo}"},
+        "d": "#{count:bar}",
+        "e": ["#{a}", 1],
+    }
+    config = resolver.parse_lazy(data)
+    assert isinstance(config, LazyConfig)
+    assert config["a"] == "foo/x"
+    assert calls == ["foo"]
+    assert config["b"]["c"] == "foo"
+    assert config["a"] == "foo/x"
+    assert calls == ["foo"]
+    assert isinstance(config["e"], LazyList)
+    assert list(config["e"]) == ["foo/x", 1]
+    assert calls == ["foo"]
+
+
+def test_lazy_resolve_subtree():
+    data = {"a": {"b": ["#{c}", {"d": "#{c}"}]}, "c": "foo"}
+    config = parse_lazy(data)
+    assert config.resolve("a.b") == ["foo", {"d": "foo"}]
+    assert config["a"].resolve() == {"b": ["foo", {"d": "foo"}]}
+    assert config.resolve() == {"a": {"b": ["foo", {"d": "foo"}]}, "c": "foo"}
+
+
+def test_lazy_through_template():
+    data = {"a": "#{b.c}", "b": "#{d}", "d": {"c": "#{e}"}, "e": "foo"}
+    assert parse_lazy(data)["a"] == "foo"
+
+
+def test_lazy_does_not_copy():
+    table = list(range(10))
+    config = parse_lazy({"table": table})
+    assert config["table"]._data is table
+
+
+def test_lazy_cycle():
+    config = parse_lazy({"a": "#{b}", "b": {"c": "#{a}"}})
+    with pytest.raises(InterpolationCycleError) as e:
+        config["a"]
+    assert e.value.cycle == ["a", "b.c", "a"]
+
+
+def test_lazy_missing():
+    config = parse_lazy({"a": "#{b}"})
+    with pytest.raises(KeyError):
+        config["a"]
+
+
+def test_lazy_dotted_key():
+    data = {"a.b": "#{x}", "a": {"b": "#{y}"}, "x": 1, "y": 2}
+    config = parse_lazy(data)
+    assert config["a"]["b"] == 2
+    assert config["a.b"] == 1
+    config = parse_lazy(data)
+    assert config["a.b"] == 1
+    assert config.resolve("a.b") == 2
+    assert config.resolve() == {"a.b": 1, "a": {"b": 2}, "x": 1, "y": 2}
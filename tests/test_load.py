@@ -0,0 +1,157 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pydantic import BaseModel
+
+from cfg_tools import ParsedModel, load_config_files
+from cfg_tools.utils import load_yaml_file
+
+
+def write_configs(path: Path):
+    (path / "default.yaml").write_text("a:\n  b: 1\n  c: foo\nd: [1, 2]\n")
+    (path / "local.yaml").write_text("a:\n  b: 2\n")
+
+
+def test_load_config_files(tmp_path: Path):
+    write_configs(tmp_path)
+    config, cli_config = load_config_files(
+        tmp_path, ["default.yaml", "local.yaml"], argv=["a.c=bar"]
+    )
+    assert config == {"a": {"b": 2, "c": "bar"}, "d": [1, 2]}
+    assert cli_config == {"a": {"c": "bar"}}
+
+
+def test_load_config_files_missing(tmp_path: Path):
+    write_configs(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        load_config_files(tmp_path, ["default.yaml", "missing.yaml"], use_cli=False)
+
+
+def test_load_yaml_cache(tmp_path: Path):
+    write_configs(tmp_path)
+    cache_dir = tmp_path / "cache"
+    path = tmp_path / "local.yaml"
+    assert load_yaml_file(path, cache_dir) == {"a": {"b": 2}}
+    (cache_file,) = cache_dir.glob("*.pickle")
+
+    # the cached content is used as long as the file does not change
+    with open(cache_file, "wb") as f:
+        pickle.dump({"cached": True}, f)
+    assert load_yaml_file(path, cache_dir) == {"cached": True}
+
+    path.write_text("a:\n  b: 3\n")
+    assert load_yaml_file(path, cache_dir) == {"a": {"b": 3}}
+    assert len(list(cache_dir.glob("*.pickle"))) == 2
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_load_config_files_concurrent(tmp_path: Path, use_processes: bool):
+    files = []
+    for k in range(8):
+        (tmp_path / f"{k}.yaml").write_text(f"a:\n  b: {k}\n  c{k}: {k}\nd{k}: {k}\n")
+        files.append(f"{k}.yaml")
+    expected, _ = load_config_files(tmp_path, files, use_cli=False)
+    config, _ = load_config_files(
+        tmp_path, files, use_cli=False, max_workers=4, use_processes=use_processes
+    )
+    assert config == expected
+    assert list(config["a"]) == list(expected["a"])
+    assert config["a"]["b"] == 7
+
+
+def test_load_yaml_cache_threads(tmp_path: Path):
+    write_configs(tmp_path)
+    cache_dir = tmp_path / "cache"
+    files = ["local.yaml"] * 16
+    # the threads write the same cache entry at the same time
+    with ThreadPoolExecutor(16) as pool:
+        contents = list(
+            pool.map(
+                load_yaml_file, [tmp_path / name for name in files], [cache_dir] * 16
+            )
+        )
+    assert contents == [{"a": {"b": 2}}] * 16
+    assert [path.suffix for path in cache_dir.iterdir()] == [".pickle"]
+
+
+def test_load_config_files_missing_before_io(tmp_path: Path, monkeypatch):
+    write_configs(tmp_path)
+    loaded: list[Path] = []
+    monkeypatch.setattr(
+        "cfg_tools.utils.load_yaml_file", lambda path, _: loaded.append(path)
+    )
+    with pytest.raises(FileNotFoundError):
+        load_config_files(
+            tmp_path, ["default.yaml", "missing.yaml"], use_cli=False, max_workers=2
+        )
+    assert loaded == []
+
+
+def test_load_config_files_streaming(tmp_path: Path):
+    write_configs(tmp_path)
+    (tmp_path / "data.yaml").write_text(
+        "base: &base {x: 1, y: [a, b]}\n"
+        "a:\n  <<: *base\n  c: 1.5\n"
+        "d: [true, null, 2021-01-01]\n"
+        "manifest:\n  - {path: f0, size: 1}\n  - {path: f1, size: *base}\n"
+    )
+    # top-level merge keys, and a duplicated key that keeps its last value
+    (tmp_path / "merge.yaml").write_text(
+        "defaults: &d {x: 1, y: [a], z: {k: 1}}\n"
+        "y: [b]\n"
+        "<<: [*d, {w: 2, x: 3}]\n"
+        "dup: {a: 1, b: 2}\n"
+        "dup: {a: 3}\n"
+    )
+    files = ["default.yaml", "local.yaml", "data.yaml", "merge.yaml"]
+    expected, _ = load_config_files(tmp_path, files, use_cli=False)
+    assert expected["dup"] == {"a": 3}
+    assert (expected["x"], expected["y"], expected["w"]) == (1, ["b"], 2)
+    config, _ = load_config_files(tmp_path, files, use_cli=False, streaming=True)
+    assert config == expected
+
+    # skipped sections are not built, but their anchors can still be used
+    config, _ = load_config_files(tmp_path, files, use_cli=False, sections={"a"})
+    assert config == {"a": expected["a"]}
+
+
+def test_load_config_files_model_sections(tmp_path: Path):
+    class A(BaseModel):
+        b: int
+        c: Any
+
+    class Config(BaseModel):
+        a: A
+
+    write_configs(tmp_path)
+    config, _ = load_config_files(
+        tmp_path, ["default.yaml", "local.yaml"], argv=["d=bar"], sections=Config
+    )
+    assert config == {"a": {"b": 2, "c": "foo"}, "d": "bar"}
+
+
+def test_load_config_files_referenced_sections(tmp_path: Path):
+    class Config(ParsedModel):
+        path: str
+
+    (tmp_path / "default.yaml").write_text(
+        "path: '#{defaults.root}/x'\n"
+        "defaults: {root: '#{base.dir}'}\n"
+        "base: {dir: /data}\n"
+        "data: [1, 2]\n"
+    )
+    (tmp_path / "local.yaml").write_text("base: {dir: /other}\n")
+    config, _ = load_config_files(
+        tmp_path,
+        ["default.yaml", "local.yaml"],
+        argv=["cli=#{data.0}"],
+        sections=Config,
+    )
+    assert "data" in config
+    assert config["base"] == {"dir": "/other"}
+    assert Config.model_validate(config).path == "/other/x"
+    with pytest.raises(ValueError):
+        load_config_files(tmp_path, ["default.yaml"], sections=Config, max_workers=2)
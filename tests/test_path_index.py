@@ -0,0 +1,65 @@
+from typing import Any
+
+import pytest
+
+from cfg_tools.plugins import PathIndex, interpolate_plugin, use_path_index
+
+
+def test_path_index():
+    data: dict[Any, Any] = {"a": {"b": ["foo", {"c": "bar"}]}, 1: "int key"}
+    index = PathIndex(data)
+    assert index.paths == {
+        "a": data["a"],
+        "a.b": data["a"]["b"],
+        "a.b.0": "foo",
+        "a.b.1": {"c": "bar"},
+        "a.b.1.c": "bar",
+    }
+
+
+def test_path_index_max_depth():
+    data = {"a": {"b": {"c": "foo"}}}
+    index = PathIndex(data, max_depth=2)
+    assert "a.b" in index.paths
+    assert "a.b.c" not in index.paths
+    with use_path_index(index):
+        assert interpolate_plugin("a.b.c", data) == "foo"
+
+
+def test_interpolate_uses_index():
+    data = {"a": {"b": "foo"}}
+    index = PathIndex(data)
+    with use_path_index(index):
+        assert interpolate_plugin("a.b", data) == "foo"
+        data["a"]["b"] = "bar"
+        assert interpolate_plugin("a.b", data) == "foo"
+        index.invalidate()
+        assert interpolate_plugin("a.b", data) == "bar"
+    data["a"]["b"] = "baz"
+    assert interpolate_plugin("a.b", data) == "baz"
+
+
+def test_path_index_set():
+    data: dict[str, Any] = {"a": {"b": "#{c}"}, "c": {"d": 1}}
+    index = PathIndex(data)
+    assert index.get("a.b") == "#{c}"
+    data["a"]["b"] = data["c"]
+    index.set("a.b", data["c"])
+    assert index.get("a.b.d") == 1
+
+
+def test_interpolate_index_errors():
+    data = {"a": ["foo"]}
+    with use_path_index(PathIndex(data)):
+        with pytest.raises(IndexError):
+            interpolate_plugin("a.1", data)
+        with pytest.raises(KeyError):
+            interpolate_plugin("a.b", data)
+
+
+def test_path_index_dotted_key():
+    data = {"a.b": "literal", "a": {"b": "nested"}}
+    index = PathIndex(data)
+    assert index.get("a.b") == "nested"
+    with use_path_index(index):
+        assert interpolate_plugin("a.b", data) == "nested"
@@ -0,0 +1,87 @@
+import os
+from typing import Any
+
+from cfg_tools import (
+    LRUCache,
+    PureCache,
+    Resolver,
+    TTLCache,
+    invalidate_plugin_cache,
+    parse_dict,
+    parse_str,
+    set_plugin_cache,
+)
+
+
+def register_upper(resolver: Resolver, calls: list[str], cache: PureCache | None):
+    @resolver.register_plugin("upper", cache=cache)
+    def plugin_upper(key: str, _) -> str:
+        calls.append(key)
+        return key.upper()
+
+
+def test_pure_cache(resolver: Resolver, calls: list[str]):
+    register_upper(resolver, calls, PureCache())
+    data = {"a": "#{upper:x}", "b": "#{upper:x}/#{upper:y}"}
+    assert parse_dict(data, data) == {"a": "X", "b": "X/Y"}
+    assert parse_str("#{upper:x}", {}) == "X"
+    assert calls == ["x", "y"]
+    invalidate_plugin_cache("upper")
+    assert parse_str("#{upper:x}", {}) == "X"
+    assert calls == ["x", "y", "x"]
+
+
+def test_lru_cache_batch(resolver: Resolver, calls: list[str]):
+    def batch_upper(keys: list[str], _) -> list[str]:
+        calls.extend(keys)
+        return [key.upper() for key in keys]
+
+    @resolver.register_plugin("upper", batch=batch_upper, cache=LRUCache(maxsize=2))
+    def plugin_upper(key: str, _) -> str:
+        raise AssertionError("the batch implementation should be used")
+
+    assert parse_str("#{upper:a}#{upper:b}", {}) == "AB"
+    assert parse_str("#{upper:a}#{upper:c}", {}) == "AC"
+    # only the missing key is requested, and "b" was evicted
+    assert calls == ["a", "b", "c"]
+    assert parse_str("#{upper:b}", {}) == "B"
+    assert calls == ["a", "b", "c", "b"]
+
+
+def test_ttl_cache(resolver: Resolver, calls: list[str]):
+    now = [0.0]
+
+    @resolver.register_plugin("ttl", cache=TTLCache(10, clock=lambda: now[0]))
+    def plugin_ttl(key: str, _) -> str:
+        calls.append(key)
+        return f"{key}_{now[0]}"
+
+    assert parse_str("#{ttl:a}", {}) == "a_0.0"
+    now[0] = 5.0
+    assert parse_str("#{ttl:a}", {}) == "a_0.0"
+    now[0] = 10.0
+    assert parse_str("#{ttl:a}", {}) == "a_10.0"
+    assert calls == ["a", "a"]
+
+
+def test_env_cache_per_parse():
+    os.environ["CFG_TOOLS_CACHE"] = "1"
+    assert parse_str("#{env:CFG_TOOLS_CACHE}", {}) == "1"
+    os.environ["CFG_TOOLS_CACHE"] = "2"
+    assert parse_str("#{env:CFG_TOOLS_CACHE}", {}) == "2"
+
+
+def test_interpolate_cache_per_data():
+    data: dict[str, Any] = {"a": 1}
+    assert parse_str("#{a}", data) == 1
+    data["a"] = 2
+    assert parse_str("#{a}", data) == 2
+    assert parse_str("#{a}", {"a": 3}) == 3
+
+
+def test_set_plugin_cache(resolver: Resolver, calls: list[str]):
+    register_upper(resolver, calls, PureCache())
+    set_plugin_cache("upper", None)
+    parse_str("#{upper:z}", {})
+    parse_str("#{upper:z}", {})
+    assert calls == ["z", "z"]
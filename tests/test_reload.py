@@ -0,0 +1,69 @@
+import os
+from pathlib import Path
+
+from cfg_tools import ParsedModel, Resolver
+from cfg_tools.reload import ConfigReloader, diff_trees
+
+
+class Config(ParsedModel):
+    root: str
+    path: str
+    name: str
+    lr: float
+
+
+def write(path: Path, content: str):
+    path.write_text(content)
+    # make sure the modification time changes, whatever the fs resolution
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_diff_trees():
+    diff = diff_trees(
+        {"a": {"b": 1, "c": [1, 2]}, "d": 1}, {"a": {"b": 2, "c": [1]}, "e": 1}
+    )
+    assert diff.added == ["e"]
+    assert diff.removed == ["a.c.1", "d"]
+    assert diff.changed == ["a.b"]
+    assert diff.affects("a")
+    assert diff.affects("a.c.1.x")
+    assert not diff.affects("f")
+
+
+def test_reload(tmp_path: Path, resolver: Resolver, calls: list[str]):
+    # the reloader resolves with the current resolver
+    write(
+        tmp_path / "default.yaml",
+        "root: /data\npath: '#{root}/x'\nname: '#{count:foo}'\nlr: 0.1\n",
+    )
+    write(tmp_path / "local.yaml", "lr: 0.2\n")
+    reloader = ConfigReloader(
+        tmp_path, ["default.yaml", "local.yaml"], Config, use_cli=False
+    )
+    assert isinstance(reloader.config, Config)
+    assert reloader.config.lr == 0.2
+    assert calls == ["foo"]
+
+    changes = []
+    reloader.subscribe("path", lambda diff, config: changes.append(config.path))
+    reloader.subscribe("lr", lambda diff, config: changes.append(config.lr))
+    assert reloader.poll() is None
+
+    write(tmp_path / "local.yaml", "lr: 0.2\nroot: /other\n")
+    diff = reloader.poll()
+    assert diff is not None
+    assert diff.changed == ["path", "root"]
+    assert reloader.config.path == "/other/x"
+    assert changes == ["/other/x"]
+    # templates that do not depend on the change are not rendered again
+    assert calls == ["foo"]
+
+
+def test_reload_int_keys(tmp_path: Path):
+    write(tmp_path / "default.yaml", "x: v\na: {1: '#{x}'}\nlr: 0.1\n")
+    reloader: ConfigReloader = ConfigReloader(tmp_path, ["default.yaml"], use_cli=False)
+    assert reloader.config["a"] == {1: "v"}
+    write(tmp_path / "default.yaml", "x: v\na: {1: '#{x}'}\nlr: 0.2\n")
+    assert reloader.poll() is not None
+    assert reloader.config == {"x": "v", "a": {1: "v"}, "lr": 0.2}
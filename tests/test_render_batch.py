@@ -0,0 +1,79 @@
+from itertools import count, islice
+from typing import Any
+
+from cfg_tools import parse_list, register_plugin, render_batch, render_each
+from cfg_tools.data_parser import BATCH_RENDER_THRESHOLD, default_resolver
+
+batches: list[list[str]] = []
+
+
+def shard_batch(keys: list[str], _) -> dict[str, str]:
+    batches.append(keys)
+    return {key: f"s3://{key}" for key in keys}
+
+
+@register_plugin("shard", batch=shard_batch)
+def plugin_shard(key: str, _) -> str:
+    raise AssertionError("the batch implementation should be used")
+
+
+def test_render_batch():
+    data = {"root": "/data/#{name}", "name": "imagenet", "split": "train"}
+    queries: list[Any] = [
+        "#{root}/#{split}/part-0",
+        "no template",
+        "\\#{root}",
+        3,
+        "#{name}",
+    ]
+    assert list(render_batch(queries, data, chunk_size=2)) == [
+        "/data/imagenet/train/part-0",
+        "no template",
+        "#{root}",
+        3,
+        "imagenet",
+    ]
+
+
+def test_render_batch_lazy():
+    data = {"root": "/data"}
+    queries = (f"#{{root}}/part-{idx}" for idx in count())
+    assert list(islice(render_batch(queries, data), 3)) == [
+        "/data/part-0",
+        "/data/part-1",
+        "/data/part-2",
+    ]
+
+
+def test_render_batch_prefetch():
+    batches.clear()
+    data = {"bucket": "#{shard:bucket}"}
+    queries = ["#{bucket}/a", "#{shard:a}", "#{shard:b}", "#{shard:a}", "#{shard:c}"]
+    assert list(render_batch(queries, data, chunk_size=3)) == [
+        "s3://bucket/a",
+        "s3://a",
+        "s3://b",
+        "s3://a",
+        "s3://c",
+    ]
+    # one batch per chunk, without the keys already fetched
+    assert batches == [["bucket", "a", "b"], ["c"]]
+
+
+def test_parse_list_batch():
+    data = {"root": "#{base}/data", "base": "/mnt", "n": 1}
+    queries = [f"#{{root}}/#{{n}}/{idx}" for idx in range(BATCH_RENDER_THRESHOLD)]
+    queries.append("#{n}")
+    expected = default_resolver._parse_tree(queries, data, True)
+    assert parse_list(queries, data) == expected
+    assert expected[-1] == 1
+
+
+def test_render_each():
+    contexts = ({"split": split, "idx": idx} for split in ["a", "b"] for idx in [0, 1])
+    assert list(render_each("#{split}-#{idx}", contexts)) == [
+        "a-0",
+        "a-1",
+        "b-0",
+        "b-1",
+    ]
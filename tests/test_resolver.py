@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cfg_tools import (
+    ParsedModel,
+    PureCache,
+    Resolver,
+    current_resolver,
+    parse_dict,
+    parse_str,
+)
+
+
+def tenant_resolver(tenant: str) -> Resolver:
+    resolver = Resolver()
+
+    @resolver.register_plugin("tenant")
+    def plugin_tenant(key: str, _) -> str:
+        return f"{tenant}-{key}"
+
+    return resolver
+
+
+def test_resolver_plugins_are_isolated():
+    first, second = tenant_resolver("a"), tenant_resolver("b")
+    assert first.parse_str("#{tenant:db}", {}) == "a-db"
+    assert second.parse_str("#{tenant:db}", {}) == "b-db"
+    with pytest.raises(KeyError):
+        parse_str("#{tenant:db}", {})
+
+
+def test_resolver_threads():
+    resolvers = [tenant_resolver(str(idx)) for idx in range(8)]
+    data = {"a": "#{tenant:db}", "b": "#{a}/#{c}", "c": "x"}
+
+    def resolve(idx: int) -> dict:
+        return resolvers[idx % 8].parse_dict(data, data)
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(resolve, range(400)))
+    for idx, result in enumerate(results):
+        assert result == {"a": f"{idx % 8}-db", "b": f"{idx % 8}-db/x", "c": "x"}
+
+
+def test_resolver_copy():
+    resolver = Resolver()
+    calls: list[str] = []
+    lock = threading.Lock()
+
+    @resolver.register_plugin("copy_count", cache=PureCache())
+    def plugin_copy_count(key: str, _) -> str:
+        with lock:
+            calls.append(key)
+        return key
+
+    resolver.parse_str("#{copy_count:a}", {})
+    copy = resolver.copy()
+    copy.parse_str("#{copy_count:a}", {})
+    resolver.parse_str("#{copy_count:a}", {})
+    assert calls == ["a", "a"]
+
+    copy.register_plugin("copy_only")(lambda key, _: key)
+    assert "copy_only" not in resolver.registered_plugins()
+
+
+class Config(ParsedModel):
+    name: str
+
+
+def test_resolver_use():
+    resolver = tenant_resolver("c")
+    assert current_resolver() is not resolver
+    with resolver.use():
+        assert current_resolver() is resolver
+        assert parse_dict({"a": "#{tenant:db}"}, {}) == {"a": "c-db"}
+    assert resolver.validate(Config, {"name": "#{tenant:db}"}).name == "c-db"
+    assert current_resolver() is not resolver
+
+
+def test_resolver_default_plugin():
+    resolver = tenant_resolver("d")
+    resolver.default_plugin = "tenant"
+    assert resolver.parse_str("#{db}", {}) == "d-db"
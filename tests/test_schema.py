@@ -0,0 +1,186 @@
+from typing import Any
+
+import pytest
+from pydantic import (
+    AliasChoices,
+    AliasPath,
+    BaseModel,
+    ConfigDict,
+    Field,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
+
+from cfg_tools import ParsedModel, Resolver
+from cfg_tools.schema import SCAN, interpolation_plan, templated_paths
+
+
+class Inner(ParsedModel):
+    name: str
+    size: int
+
+
+class Outer(ParsedModel):
+    inner: Inner
+    values: list[float]
+    strict_values: list[float] = Field(strict=True)
+    tags: dict[str, Any]
+
+
+class StrictConfig(ParsedModel):
+    model_config = ConfigDict(strict=True)
+
+    lr: float
+    name: str
+
+
+class ExtraConfig(ParsedModel):
+    model_config = ConfigDict(extra="allow")
+
+    name: str
+
+
+def test_interpolation_plan():
+    plan = interpolation_plan(Outer)
+    assert plan is interpolation_plan(Outer)
+    assert plan.fields["inner"] is interpolation_plan(Inner)
+    assert plan.fields["values"] is SCAN
+    assert plan.fields["strict_values"] is SCAN
+    assert plan.extra is None
+    assert interpolation_plan(StrictConfig).fields == {"lr": SCAN, "name": SCAN}
+    assert interpolation_plan(ExtraConfig).extra is SCAN
+
+
+def test_templated_paths():
+    data = {
+        "inner": {"name": "#{a}", "size": 1},
+        "strict_values": ["#{b}"],
+        "tags": {"x": ["#{c}"]},
+        "unknown": "#{d}",
+    }
+    assert sorted(templated_paths(data, interpolation_plan(Outer))) == [
+        "inner.name",
+        "strict_values.0",
+        "tags.x.0",
+    ]
+
+
+def test_parsed_model_skips_extras(resolver: Resolver, calls: list[str]):
+    config = resolver.validate(
+        Outer,
+        {
+            "inner": {"name": "#{defaults.name}", "size": "#{defaults.size}"},
+            "values": [1.0],
+            "strict_values": [2.0],
+            "tags": {},
+            "defaults": {"name": "#{count:foo}", "size": 3},
+            "unused": "#{count:unused}",
+        },
+    )
+    assert config.inner == Inner(name="foo", size=3)
+    # only the extra values that are referenced are resolved
+    assert calls == ["foo"]
+
+
+class StrictInts(ParsedModel, strict=True):
+    a: int
+    b: int
+
+
+def test_parsed_model_strict_numeric():
+    config = StrictConfig.model_validate({"lr": 0.1, "name": "lr-#{lr}"})
+    assert config.name == "lr-0.1"
+    # a whole-string template resolves to the referenced number
+    config = StrictConfig.model_validate({"lr": "#{other}", "other": 0.1, "name": "a"})
+    assert config.lr == 0.1
+    assert StrictInts.model_validate({"a": 1, "b": "#{a}"}).b == 1
+    with pytest.raises(ValidationError):
+        StrictConfig.model_validate({"lr": "#{other}/2", "other": 0.1, "name": "a"})
+
+
+def test_nested_parsed_model_not_interpolated_again():
+    config = Outer.model_validate(
+        {
+            "inner": {"name": "\\#{literal}", "size": 1},
+            "values": [],
+            "strict_values": [],
+            "tags": {},
+        }
+    )
+    assert config.inner.name == "#{literal}"
+    # validated alone, the inner model is still interpolated
+    assert Inner.model_validate({"name": "n#{size}", "size": 2}).name == "n2"
+
+
+class Recursive(ParsedModel):
+    name: str
+    child: "Recursive | None" = None
+
+
+def test_recursive_model():
+    config = Recursive.model_validate(
+        {"name": "a", "child": {"name": "#{name}/b", "child": None}}
+    )
+    assert config.child is not None
+    assert config.child.name == "a/b"
+
+
+class PlainParent(BaseModel):
+    inner: Inner
+    other: str
+
+
+def test_parsed_model_in_plain_model():
+    config = PlainParent.model_validate(
+        {"inner": {"name": "n#{size}", "size": 1}, "other": "#{x}"}
+    )
+    assert config.inner.name == "n1"
+    assert config.other == "#{x}"
+
+
+class AliasConfig(ParsedModel):
+    x: str = Field(validation_alias=AliasChoices("x_path", "x"))
+    y: str = Field(validation_alias=AliasPath("paths", 0))
+
+
+def test_parsed_model_aliases():
+    config = AliasConfig.model_validate(
+        {"x": "#{root}/p", "paths": ["#{root}/q"], "root": "r"}
+    )
+    assert (config.x, config.y) == ("r/p", "r/q")
+    assert interpolation_plan(AliasConfig).fields.keys() == {
+        "x",
+        "x_path",
+        "y",
+        "paths",
+    }
+
+
+class RenamedConfig(ParsedModel):
+    x: str
+
+    @model_validator(mode="before")
+    @classmethod
+    def rename(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "old_x" in data:
+            data = {**data, "x": data.pop("old_x")}
+        return data
+
+
+def test_parsed_model_before_validator():
+    config = RenamedConfig.model_validate({"old_x": "#{root}/p", "root": "r"})
+    assert config.x == "r/p"
+
+
+class Wrapper(ParsedModel):
+    inner: Any
+
+    @field_validator("inner")
+    @classmethod
+    def build_inner(cls, value: Any) -> Inner:
+        return Inner.model_validate({"name": "n#{size}", "size": value})
+
+
+def test_nested_parsed_model_from_validator():
+    assert Wrapper.model_validate({"inner": 2}).inner == Inner(name="n2", size=2)
@@ -0,0 +1,92 @@
+import pickle
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cfg_tools import ParsedModel, SharedConfig, SharedList, SharedMapping, parse_dict
+
+
+def make_config() -> dict[str, Any]:
+    data: dict[str, Any] = {
+        "name": "run",
+        "path": "#{root}/x",
+        "root": "/data",
+        "optim": {"lr": 0.1, "steps": 10**20, "betas": [0.9, 0.999], "on": True},
+        "layers": [{"size": 1}, {"size": 2}, None],
+        "paths": (Path("/a"), Path("/b")),
+    }
+    parsed: dict[Any, Any] = parse_dict(data, data)
+    parsed[1] = "int key"
+    return parsed
+
+
+def test_shared_config():
+    data = make_config()
+    with SharedConfig.publish(data) as shared:
+        root = shared.root
+        assert isinstance(root, SharedMapping)
+        assert root["path"] == "/data/x"
+        assert isinstance(root["optim"]["betas"], SharedList)
+        assert root["optim"]["betas"][1] == 0.999
+        assert root["optim"]["steps"] == 10**20
+        assert root["layers"][-1] is None
+        assert root["layers"][:2][1]["size"] == 2
+        assert root[1] == "int key"
+        assert list(root) == list(data)
+        assert root.to_dict() == data
+        assert root == data
+
+
+def test_shared_config_file(tmp_path: Path):
+    data = make_config()
+    path = tmp_path / "config.shared"
+    with SharedConfig.publish(data, path), SharedConfig.attach(path=path) as other:
+        assert other["optim"]["lr"] == 0.1
+    assert not path.exists()
+
+
+def test_shared_config_shares_subtrees():
+    sub = {"a": list(range(100))}
+    with SharedConfig.publish({"x": sub, "y": sub}) as shared:
+        assert shared.buffer.nbytes < 2 * 100 * (9 + 8)
+        assert shared["x"] == shared["y"] == sub
+
+
+class SharedModel(ParsedModel):
+    name: str
+    sizes: list[int]
+
+
+def test_shared_model_dump():
+    config = SharedModel.model_validate({"name": "n#{sizes.0}", "sizes": [1]})
+    with SharedConfig.publish(config.model_dump()) as shared:
+        assert SharedModel.model_validate(shared.root.to_dict()) == config
+
+
+def read_lr(optim: SharedMapping) -> float:
+    return optim["lr"]
+
+
+def test_shared_config_pickle_and_pool():
+    with SharedConfig.publish(make_config()) as shared:
+        optim = shared["optim"]
+        assert len(pickle.dumps(optim)) < 200
+        assert pickle.loads(pickle.dumps(optim)).to_dict() == optim.to_dict()
+        with get_context("spawn").Pool(2) as pool:
+            assert pool.map(read_lr, [optim] * 4) == [0.1] * 4
+
+
+def test_shared_config_lookup():
+    data: dict[Any, Any] = {f"k{idx}": idx for idx in range(1000)}
+    data.update({1: "int key", None: "none key", "": [1, 2, 3]})
+    with SharedConfig.publish(data) as shared:
+        assert shared.root is shared.root
+        assert all(shared[key] == val for key, val in data.items())
+        assert "k1000" not in shared.root
+        assert "1" not in shared.root
+        assert list(shared.root) == list(data)
+        assert shared[""][-1] == 3
+        with pytest.raises(IndexError):
+            shared[""][3]
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from cfg_tools import ParsedModel, load_config_snapshot
+from cfg_tools.snapshot import load_snapshot
+
+
+class SnapshotConfig(ParsedModel):
+    name: str
+    path: str
+    size: int
+
+
+def write_configs(path: Path):
+    (path / "default.yaml").write_text(
+        "name: '#{env:CFG_TOOLS_SNAPSHOT,default}'\nroot: /data\npath: '#{root}/x'\n"
+    )
+    (path / "local.yaml").write_text("size: 1\n")
+
+
+def load(path: Path, argv: list[str] | None = None) -> SnapshotConfig:
+    return load_config_snapshot(
+        path,
+        ["default.yaml", "local.yaml"],
+        SnapshotConfig,
+        path / "snapshot.pickle",
+        argv=argv or [],
+    )
+
+
+def test_snapshot(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    write_configs(tmp_path)
+    monkeypatch.setenv("CFG_TOOLS_SNAPSHOT", "foo")
+    config = load(tmp_path)
+    assert config == SnapshotConfig(name="foo", path="/data/x", size=1)
+    assert (tmp_path / "snapshot.pickle").is_file()
+
+    # the snapshot is used as long as the inputs are the same
+    mtime = (tmp_path / "snapshot.pickle").stat().st_mtime_ns
+    assert load(tmp_path) == config
+    assert (tmp_path / "snapshot.pickle").stat().st_mtime_ns == mtime
+
+
+def test_snapshot_invalidation(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    write_configs(tmp_path)
+    monkeypatch.setenv("CFG_TOOLS_SNAPSHOT", "foo")
+    load(tmp_path)
+
+    # environment variables read by the templates
+    monkeypatch.setenv("CFG_TOOLS_SNAPSHOT", "bar")
+    assert load(tmp_path).name == "bar"
+    # other variables do not invalidate the snapshot
+    mtime = (tmp_path / "snapshot.pickle").stat().st_mtime_ns
+    monkeypatch.setenv("CFG_TOOLS_OTHER", "bar")
+    assert load(tmp_path).name == "bar"
+    assert (tmp_path / "snapshot.pickle").stat().st_mtime_ns == mtime
+
+    # CLI
+    assert load(tmp_path, ["size=2"]).size == 2
+
+    # files
+    (tmp_path / "local.yaml").write_text("size: 3\n")
+    assert load(tmp_path).size == 3
+
+
+def test_load_snapshot_corrupted(tmp_path: Path):
+    (tmp_path / "snapshot.pickle").write_bytes(b"not a pickle")
+    assert load_snapshot(tmp_path / "snapshot.pickle", "key") is None
+    assert load_snapshot(tmp_path / "missing.pickle", "key") is None
@@ -0,0 +1,86 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+from cfg_tools import ParsedModel, Sweep, grid, merge_dicts, parse_dict, sweep
+
+
+class Optim(BaseModel):
+    lr: float
+    name: str
+
+
+class SweepConfig(ParsedModel):
+    optim: Optim
+    run: str
+    data: dict[str, Any]
+
+
+def make_base() -> dict[str, Any]:
+    return {
+        "optim": {"lr": 0.1, "name": "adam-#{optim.lr}"},
+        "run": "#{optim.name}/#{seed}",
+        "seed": 0,
+        "data": {"path": "/data", "train": "#{data.path}/train"},
+    }
+
+
+def expected(overrides: dict[str, Any]) -> dict[str, Any]:
+    raw = make_base()
+    merge_dicts(raw, overrides)
+    return parse_dict(raw, raw)
+
+
+def test_grid():
+    assert list(grid({"a": [1, 2], "b.c": ["x"]})) == [
+        ["a=1", "b.c=x"],
+        ["a=2", "b.c=x"],
+    ]
+
+
+def test_sweep_variants():
+    base = make_base()
+    variants = list(sweep(base, grid({"optim.lr": [0.01, 0.001], "seed": [1, 2]})))
+    assert len(variants) == 4
+    assert variants[0] == expected({"optim": {"lr": "0.01"}, "seed": "1"})
+    assert variants[3]["run"] == "adam-0.001/2"
+    # the base is not modified and unchanged subtrees are shared
+    assert base == make_base()
+    assert variants[0]["data"] is variants[1]["data"]
+
+
+def test_sweep_rerenders_dependents_only():
+    base_sweep: Sweep = Sweep(make_base())
+    assert base_sweep.affected(["seed"]) == ["run"]
+    assert base_sweep.affected(["optim.lr"]) == ["optim.name", "run"]
+    assert base_sweep.affected(["data.path"]) == ["data.train"]
+
+
+def test_sweep_fallback():
+    base_sweep: Sweep = Sweep(make_base())
+    # templated overrides and overrides of templates
+    overrides = {"seed": "#{optim.lr}", "data": {"train": "/other"}}
+    assert base_sweep.resolve(overrides) == expected(overrides)
+    # replacing a dict
+    assert base_sweep.resolve(["data=none"]) == expected({"data": "none"})
+
+
+def test_sweep_model():
+    (config,) = sweep(make_base(), [["optim.lr=0.5"]], SweepConfig)
+    assert isinstance(config, SweepConfig)
+    assert config.optim.lr == 0.5
+    assert config.run == "adam-0.5/0"
+
+
+def test_sweep_process_pool():
+    overrides = grid({"seed": range(5)})
+    configs = list(sweep(make_base(), overrides, SweepConfig, max_workers=2))
+    assert [config.run for config in configs if isinstance(config, SweepConfig)] == [
+        f"adam-0.1/{k}" for k in range(5)
+    ]
+
+
+def test_sweep_int_keys():
+    base: dict[Any, Any] = {"x": "v", "a": {1: "#{x}"}, "l": {"m": 1}}
+    assert Sweep(base).resolve({"l": "#{x}"}) == {"x": "v", "a": {1: "v"}, "l": "v"}
+    assert Sweep(base).resolve({"x": "w"}) == {"x": "w", "a": {1: "w"}, "l": {"m": 1}}
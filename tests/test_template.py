@@ -0,0 +1,51 @@
+from cfg_tools import compile_template, parse_str
+from cfg_tools.template import PluginCall, _tokenize_escaped, _tokenize_plain
+
+
+def test_compile_segments():
+    template = compile_template("foo #{a.b} bar #{env:HOME,/home}")
+    assert template.segments == (
+        "foo ",
+        PluginCall(None, "a.b"),
+        " bar ",
+        PluginCall("env", "HOME,/home"),
+    )
+
+
+def test_compile_cached():
+    assert compile_template("foo #{a}") is compile_template("foo #{a}")
+
+
+def test_long_query():
+    data = {"a": "baz"}
+    query = "x" * 5000 + "#{a}" + "y" * 5000
+    assert parse_str(query, data) == "x" * 5000 + "baz" + "y" * 5000
+
+
+def test_many_interpolations():
+    data = {"a": "b"}
+    assert parse_str("#{a}" * 2000, data) == "b" * 2000
+
+
+def test_non_str_joined():
+    data = {"a": 1}
+    assert parse_str("port #{a}", data) == "port 1"
+
+
+def test_lone_hash_kept():
+    data = {"a": "baz"}
+    assert parse_str("#foo #{a} ##", data) == "#foo baz ##"
+
+
+def test_unterminated_kept():
+    data = {"a": "baz"}
+    assert parse_str("#{a} #{b", data) == "baz #{b"
+
+
+def test_plain_tokenizer():
+    # queries without backslashes take a faster path, with the same segments
+    queries = ["", "#{a}#{b:c:d}", "x#{a#{b}}y", "#{a", "#{a} #{b", "#", "{#}"]
+    for query in queries:
+        assert _tokenize_plain(query) == _tokenize_escaped(query)
+    first, second = compile_template("#{a}/0"), compile_template("#{a}/1")
+    assert first.segments[0] is second.segments[0]